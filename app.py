@@ -1,24 +1,267 @@
-from flask import Flask, render_template, request, jsonify, Response, stream_with_context, send_file
+from flask import (Flask, Blueprint, Request, current_app, render_template, request, jsonify, Response,
+                   stream_with_context, send_file, url_for, g)
 from flask_cors import CORS
-from utils.gemini_helper import GeminiHelper
+from utils.gemini_helper import GeminiHelper, MINDMAP_PNG_WIDTH
 from utils.database_helper import DatabaseHelper
+from utils.pyq_index import PyqIndex
+from utils.mermaid_mindmap import MindmapError
+from utils.session_store import SessionStore, session_day, session_duration, week_start
+from utils.flashcard_deck import FlashcardDeck
+from utils.prefetcher import Prefetcher
+from utils.schedule_planner import hours_per_day_value
+from utils.content_cache import ContentCache
+from utils.compression import Compression
+from utils.asset_pipeline import AssetPipeline
+from utils.metrics import (REGISTRY, CONTENT_TYPE as METRICS_CONTENT_TYPE, HTTP_REQUEST_SECONDS,
+                           SSE_ACTIVE_STREAMS, SSE_STREAM_CHUNKS, SSE_STREAM_BYTES)
+from utils.tracing import tracer, timing_breakdown, server_timing_header
+import hashlib
 import json
-from datetime import datetime
-from io import BytesIO
+import os
+import threading
+import time
+from datetime import datetime, timedelta
 
-app = Flask(__name__)
-CORS(app)
+bp = Blueprint('main', __name__)
 
-# Initialize helpers
-gemini = GeminiHelper()
-db = DatabaseHelper()
+_helper_lock = threading.RLock()
 
-@app.route('/')
+def _get_helper(name, factory):
+    """Construct a shared helper on first use and keep it on the app"""
+    helper = current_app.extensions.get(name)
+    if helper is None:
+        with _helper_lock:
+            helper = current_app.extensions.get(name)
+            if helper is None:
+                helper = current_app.extensions[name] = factory()
+    return helper
+
+def _create_gemini():
+    gemini = GeminiHelper(retriever=get_retriever())
+    # Prompt module blocks are built from subject data, so drop them when it changes
+    get_db().add_reload_listener(lambda name: gemini.prompts.clear() if name == 'subjects' else None)
+    return gemini
+
+# Prebuilt by jobs/build_retrieval_index.py; built from the data files when missing
+RETRIEVAL_INDEX_PATH = os.getenv('RETRIEVAL_INDEX_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                      'database', 'retrieval_index.npz'))
+
+def get_retriever():
+    """Shared syllabus retriever, created on first use"""
+    def create():
+        # NumPy is only needed once chat is used
+        from utils.retrieval import Retriever
+        return Retriever(RETRIEVAL_INDEX_PATH, get_db())
+    return _get_helper('retriever', create)
+
+# Prebuilt by jobs/build_pyq_topics.py; built from the data files when missing
+PYQ_TOPICS_PATH = os.getenv('PYQ_TOPICS_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                            'database', 'pyq_topics.json'))
+
+def get_pyq_topics():
+    """Shared PYQ topic frequency index, created on first use"""
+    def create():
+        from utils.pyq_topics import PyqTopics
+        return PyqTopics(PYQ_TOPICS_PATH, get_db())
+    return _get_helper('pyq_topics', create)
+
+def get_gemini():
+    """Shared GeminiHelper, created on first use"""
+    return _get_helper('gemini', _create_gemini)
+
+# Exam types offered in the study content form
+EXAM_TYPES = ('internal1', 'internal2', 'internal3', 'semester')
+
+def get_prefetcher():
+    """Shared background prefetcher for study content, created on first use"""
+    return _get_helper('prefetcher', lambda: Prefetcher(get_gemini(), shared=get_gemini().cache.shared))
+
+def get_db():
+    """Shared DatabaseHelper, created on first use"""
+    return _get_helper('db', DatabaseHelper)
+
+# PYQ documents live one level up from study-assistant
+PYQ_DIR = os.getenv('PYQ_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'PYQ'))
+DOCX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+SESSIONS_DB = os.getenv('SESSIONS_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database', 'sessions.sqlite3'))
+MAX_USER_ID_LENGTH = 64
+
+def get_sessions_store():
+    """Shared Pomodoro session store, created on first use"""
+    return _get_helper('sessions', lambda: SessionStore(SESSIONS_DB))
+
+FLASHCARDS_DB = os.getenv('FLASHCARDS_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database', 'flashcards.sqlite3'))
+
+def get_flashcard_deck():
+    """Shared spaced-repetition flashcard store, created on first use"""
+    return _get_helper('flashcard_deck', lambda: FlashcardDeck(FLASHCARDS_DB))
+
+def session_user_id(value):
+    """Anonymous per-browser id sent by the client"""
+    value = (value or '').strip()
+    return value[:MAX_USER_ID_LENGTH] if value else 'anonymous'
+
+def get_pyq_index():
+    """Shared index of PYQ files, created on first use"""
+    return _get_helper('pyq_index', lambda: PyqIndex(PYQ_DIR))
+
+# Cache-Control policies for the read-only APIs; clients revalidate with the ETag after max-age
+SUBJECTS_CACHE_CONTROL = 'public, max-age=300'
+PYQS_CACHE_CONTROL = 'public, max-age=300'
+RESOURCES_CACHE_CONTROL = 'public, max-age=86400'
+# Always revalidated, so a new prompt or syllabus reaches cached clients on their next visit
+CONTENT_VERSION_CACHE_CONTROL = 'no-cache'
+PYQ_FILE_MAX_AGE = 86400
+# Content-addressed resources never change under the same URL
+IMMUTABLE_MAX_AGE = 31536000
+
+def get_response_cache():
+    """Serialized read-only API responses, keyed by route, arguments and data version"""
+    return _get_helper('response_cache', lambda: ContentCache(name='responses', max_entries=1024))
+
+def cached_json_response(key, build, cache_control):
+    """JSON response serialized once per key, answering If-None-Match with 304"""
+    cache = get_response_cache()
+    entry = cache.get(key)
+    if entry is None:
+        body = json.dumps(build(), separators=(',', ':')).encode('utf-8')
+        entry = (body, hashlib.sha256(body).hexdigest()[:32])
+        cache.set(key, entry)
+    body, etag = entry
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    return response.make_conditional(request)
+
+# Clients may force a traced request and get a timing breakdown back with this header
+DEBUG_TIMING_HEADER = 'X-Debug-Timing'
+
+def debug_timing_allowed():
+    return current_app.debug or os.getenv('TRACE_DEBUG_ENABLED', '').lower() in ('1', 'true', 'yes')
+
+@bp.before_app_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    debug = bool(request.headers.get(DEBUG_TIMING_HEADER)) and debug_timing_allowed()
+    g.trace_span = tracer.start_trace(f'{request.method} {route}', debug=debug,
+                                      **{'http.method': request.method, 'http.route': route})
+    g.trace_token = tracer.activate(g.trace_span)
+
+@bp.after_app_request
+def record_request_metrics(response):
+    start = g.get('request_start')
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_SECONDS.labels(route=route, method=request.method,
+                                    status=response.status_code).observe(time.perf_counter() - start)
+    span = g.get('trace_span')
+    if span is not None and span.trace is not None:
+        span.set_attribute('http.status_code', response.status_code)
+        response.headers['X-Trace-Id'] = span.trace.trace_id
+        if span.trace.debug:
+            response.headers['Server-Timing'] = server_timing_header(timing_breakdown(span))
+    return response
+
+@bp.teardown_app_request
+def end_request_trace(error=None):
+    # Runs after streamed bodies finish, so the root span covers the whole stream
+    span = g.pop('trace_span', None)
+    token = g.pop('trace_token', None)
+    if span is not None:
+        if error is not None:
+            span.record_error(error)
+        span.end()
+    if token is not None:
+        tracer.deactivate(token)
+
+def sse_response(route, events):
+    """Stream server-sent event frames, recording per-stream metrics and trace spans"""
+    root = g.get('trace_span')
+    
+    def instrumented():
+        active = SSE_ACTIVE_STREAMS.labels(route=route)
+        active.inc()
+        frames = 0
+        size = 0
+        try:
+            with tracer.span('sse.stream', parent=root, route=route) as span:
+                for frame in events:
+                    frames += 1
+                    # Frames are ASCII (json.dumps escapes non-ASCII), so length is byte count
+                    size += len(frame)
+                    yield frame
+                span.set_attribute('frames', frames)
+                span.set_attribute('bytes', size)
+            if root is not None and root.trace is not None and root.trace.debug:
+                yield f"data: {json.dumps({'timing': timing_breakdown(root)})}\n\n"
+        finally:
+            active.dec()
+            SSE_STREAM_CHUNKS.labels(route=route).observe(frames)
+            SSE_STREAM_BYTES.labels(route=route).observe(size)
+    
+    response = Response(stream_with_context(instrumented()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics"""
+    return Response(REGISTRY.render(), content_type=METRICS_CONTENT_TYPE)
+
+@bp.route('/')
 def index():
     """Main page"""
     return render_template('index.html')
 
-@app.route('/api/generate-study-content', methods=['POST'])
+@bp.route('/sw.js')
+def service_worker():
+    """Service worker, served from the root so it can control the whole app.
+
+    The asset version is prepended so a new build changes the worker's bytes, which makes browsers
+    install it and drop the shell cache holding the old fingerprinted assets.
+    """
+    with open(os.path.join(current_app.static_folder, 'js', 'sw.js'), 'r', encoding='utf-8') as f:
+        source = f.read()
+    version = current_app.extensions['assets'].version
+    response = Response(f"self.ASSET_VERSION = '{version}';\n{source}", mimetype='text/javascript')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.add_etag()
+    return response.make_conditional(request)
+
+@bp.route('/api/study-content-version', methods=['GET'])
+def study_content_version():
+    """Version of the generated study content for a subject and exam, for client-side caches"""
+    try:
+        subject_code = request.args.get('subject_code', '').upper()
+        exam_type = request.args.get('exam_type', 'semester')
+        db = get_db()
+        subject_info = db.get_subject_info(subject_code)
+        
+        if not subject_info:
+            return jsonify({
+                'success': False,
+                'error': f'Subject {subject_code} not found in database'
+            }), 404
+        
+        def build():
+            return {
+                'success': True,
+                'version': get_gemini().content_version(subject_code, exam_type, subject_info)
+            }
+        
+        key = ('study_content_version', subject_code, exam_type, db.data_version('subjects'))
+        return cached_json_response(key, build, CONTENT_VERSION_CACHE_CONTROL)
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@bp.route('/api/generate-study-content', methods=['POST'])
 def generate_study_content():
     """Generate study content (notes, flashcards, mindmap)"""
     try:
@@ -27,7 +270,7 @@ def generate_study_content():
         exam_type = data.get('exam_type', 'semester')
         
         # Get subject information
-        subject_info = db.get_subject_info(subject_code)
+        subject_info = get_db().get_subject_info(subject_code)
         
         if not subject_info:
             return jsonify({
@@ -36,8 +279,8 @@ def generate_study_content():
             }), 404
         
         # Generate all content types (non-streaming for flashcards and mindmap)
-        flashcards = gemini.generate_flashcards(subject_code, exam_type, subject_info)
-        mindmap = gemini.generate_mindmap(subject_code, exam_type, subject_info)
+        flashcards = get_gemini().generate_flashcards(subject_code, exam_type, subject_info)
+        mindmap = get_gemini().generate_mindmap(subject_code, exam_type, subject_info)
         
         return jsonify({
             'success': True,
@@ -57,7 +300,44 @@ def generate_study_content():
             'error': str(e)
         }), 500
 
-@app.route('/api/generate-mindmap-image', methods=['POST'])
+@bp.route('/api/prefetch', methods=['POST'])
+def prefetch_study_content():
+    """Start generating study content for a selected subject before it is requested"""
+    try:
+        data = request.get_json(force=True)
+        user_id = session_user_id(data.get('user_id'))
+        
+        if data.get('cancel'):
+            get_prefetcher().cancel(user_id)
+            return jsonify({'success': True, 'status': 'cancelled'})
+        
+        subject_code = data.get('subject_code', '').upper()
+        exam_type = data.get('exam_type', 'semester')
+        if exam_type not in EXAM_TYPES:
+            return jsonify({
+                'success': False,
+                'error': f'Unknown exam type {exam_type}'
+            }), 400
+        
+        subject_info = get_db().get_subject_info(subject_code)
+        if not subject_info:
+            # Partly typed codes are expected; just stop prefetching the previous selection
+            get_prefetcher().cancel(user_id)
+            return jsonify({
+                'success': False,
+                'error': f'Subject {subject_code} not found in database'
+            }), 404
+        
+        status = get_prefetcher().request(user_id, subject_code, exam_type, subject_info)
+        return jsonify({'success': True, 'status': status}), 202
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@bp.route('/api/generate-mindmap-image', methods=['POST'])
 def generate_mindmap_image():
     """Generate mind map as PNG image"""
     try:
@@ -70,22 +350,30 @@ def generate_mindmap_image():
                 'error': 'No mindmap code provided'
             }), 400
         
-        # Generate image using Playwright
-        image_data = gemini._mermaid_to_image(mindmap_code)
+        # Render the SVG once per distinct mind map; it is served from a content-addressed URL
+        try:
+            image_key = get_gemini().render_mindmap(mindmap_code)
+        except MindmapError as e:
+            return jsonify({
+                'success': False,
+                'error': f'Invalid mind map: {e}'
+            }), 400
         
-        if not image_data:
+        if not image_key:
             return jsonify({
                 'success': False,
                 'error': 'Failed to generate mindmap image'
             }), 500
         
-        # Return image as base64
-        import base64
-        image_base64 = base64.b64encode(image_data).decode('utf-8')
+        # PNGs are only rasterized when requested, at the requested width
+        if data.get('format') == 'png':
+            url = url_for('main.mindmap_png', key=image_key, width=data.get('width', MINDMAP_PNG_WIDTH))
+        else:
+            url = url_for('main.mindmap_svg', key=image_key)
         
         return jsonify({
             'success': True,
-            'image': f'data:image/png;base64,{image_base64}'
+            'url': url
         })
     
     except Exception as e:
@@ -95,35 +383,87 @@ def generate_mindmap_image():
             'error': str(e)
         }), 500
 
-@app.route('/api/download-pdf', methods=['POST'])
+@bp.route('/api/mindmap-image/<key>.svg', methods=['GET'])
+def mindmap_svg(key):
+    """Serve a rendered mind map as SVG; the URL changes whenever the image would"""
+    path = get_gemini().mindmap_svg_path(key)
+    if not path:
+        return jsonify({
+            'success': False,
+            'error': 'Mind map image not found'
+        }), 404
+    
+    with open(path, 'rb') as f:
+        response = Response(f.read(), mimetype='image/svg+xml')
+    response.set_etag(key)
+    response.cache_control.public = True
+    response.cache_control.max_age = IMMUTABLE_MAX_AGE
+    response.cache_control.immutable = True
+    return response.make_conditional(request)
+
+@bp.route('/api/mindmap-image/<key>.png', methods=['GET'])
+def mindmap_png(key):
+    """Serve a rendered mind map rasterized to PNG at ?width= pixels"""
+    try:
+        path = get_gemini().mindmap_png_path(key, request.args.get('width', MINDMAP_PNG_WIDTH, type=int))
+        if not path:
+            return jsonify({
+                'success': False,
+                'error': 'Mind map image not found'
+            }), 404
+        
+        response = send_file(path, mimetype='image/png', max_age=IMMUTABLE_MAX_AGE)
+        response.cache_control.immutable = True
+        return response
+    
+    except Exception as e:
+        print(f"Error rasterizing mindmap image: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@bp.route('/api/download-pdf', methods=['POST'])
 def download_pdf():
     """Generate and download PDF of study notes"""
     try:
-        data = request.json
-        notes = data.get('notes', '')
+        notes_file = request.files.get('notes')
+        if notes_file is not None:
+            # Multipart upload: notes are parsed line by line from the spooled upload
+            data = request.form
+            stream = notes_file.stream
+            stream.seek(0, os.SEEK_END)
+            has_notes = stream.tell() > 0
+            stream.seek(0)
+            notes_lines = (line.decode('utf-8', 'replace') for line in stream)
+        else:
+            data = request.get_json(force=True) or {}
+            notes = data.get('notes', '')
+            has_notes = bool(notes)
+            notes_lines = notes.split('\n')
         subject_name = data.get('subject_name', 'Study Notes')
         exam_type = data.get('exam_type', 'semester')
         subject_code = data.get('subject_code', '')
         mindmap = data.get('mindmap', None)  # Get mindmap code
         
-        if not notes:
+        if not has_notes:
             return jsonify({
                 'success': False,
                 'error': 'No notes provided'
             }), 400
         
-        # Generate PDF with mindmap
-        pdf_buffer = gemini.generate_pdf_from_notes(notes, subject_name, exam_type, mindmap)
+        # Generate PDF with mindmap into a spooled file, sent back in chunks
+        pdf_file = get_gemini().write_pdf_from_notes(notes_lines, subject_name, exam_type, mindmap)
         
-        if not pdf_buffer:
+        if not pdf_file:
             return jsonify({
                 'success': False,
                 'error': 'Failed to generate PDF'
             }), 500
         
-        # Create a BytesIO object
-        pdf_io = BytesIO(pdf_buffer)
-        pdf_io.seek(0)
+        pdf_file.seek(0, os.SEEK_END)
+        size = pdf_file.tell()
+        pdf_file.seek(0)
         
         # Generate filename
         exam_type_text = {
@@ -135,12 +475,14 @@ def download_pdf():
         
         filename = f"{subject_code}_{subject_name.replace(' ', '_')}_{exam_type_text}_Notes.pdf"
         
-        return send_file(
-            pdf_io,
+        response = send_file(
+            pdf_file,
             mimetype='application/pdf',
             as_attachment=True,
             download_name=filename
         )
+        response.content_length = size
+        return response
     
     except Exception as e:
         print(f"Error generating PDF: {str(e)}")
@@ -151,35 +493,52 @@ def download_pdf():
             'error': str(e)
         }), 500
 
-@app.route('/api/create-schedule', methods=['POST'])
+def schedule_subjects(subjects):
+    """Subject info for each comma-separated subject code or name; unknown names get no module list"""
+    db = get_db()
+    names = [name.strip() for name in subjects.split(',') if name.strip()]
+    return [db.find_subject(name) or {'code': None, 'name': name, 'modules': []} for name in names]
+
+@bp.route('/api/create-schedule', methods=['POST'])
 def create_schedule():
     """Create study schedule"""
     try:
         data = request.json
         subjects = data.get('subjects', '')
         exam_date = data.get('exam_date', '')
-        hours_per_day = data.get('hours_per_day', 4)
+        start_date = data.get('start_date') or datetime.now().date().isoformat()
+        # Without an explicit end date, study up to the day before the exam
+        end_date = data.get('end_date', '')
+        if not end_date and exam_date:
+            end_date = max(start_date, (datetime.strptime(exam_date, '%Y-%m-%d') - timedelta(days=1)).strftime('%Y-%m-%d'))
         
-        if not subjects or not exam_date:
+        if not subjects or not end_date:
             return jsonify({
                 'success': False,
                 'error': 'Please provide subjects and exam date'
             }), 400
         
-        schedule = gemini.create_study_schedule(subjects, exam_date, hours_per_day)
+        hours_per_day = hours_per_day_value(data.get('hours_per_day', 4))
+        
+        schedule = get_gemini().create_study_schedule(schedule_subjects(subjects), start_date, end_date, hours_per_day)
         
         return jsonify({
             'success': True,
             'schedule': schedule
         })
     
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
-@app.route('/api/get-pyqs', methods=['GET'])
+@bp.route('/api/get-pyqs', methods=['GET'])
 def get_pyqs():
     """Get previous year questions"""
     try:
@@ -192,14 +551,50 @@ def get_pyqs():
                 'error': 'Please provide subject code'
             }), 400
         
-        pyqs = db.get_pyqs_for_subject(subject_code, exam_type)
-        subject_info = db.get_subject_info(subject_code)
+        db = get_db()
+        
+        def build():
+            pyqs = db.get_pyqs_for_subject(subject_code, exam_type)
+            subject_info = db.get_subject_info(subject_code)
+            return {
+                'success': True,
+                'subject_name': subject_info['name'] if subject_info else subject_code,
+                'pyqs': pyqs
+            }
         
+        key = ('get_pyqs', subject_code, exam_type, db.data_version('subjects', 'pyqs'))
+        return cached_json_response(key, build, PYQS_CACHE_CONTROL)
+    
+    except Exception as e:
         return jsonify({
-            'success': True,
-            'subject_name': subject_info['name'] if subject_info else subject_code,
-            'pyqs': pyqs
-        })
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@bp.route('/api/pyq-topics', methods=['GET'])
+def get_pyq_topics_route():
+    """Most frequently asked topics in a subject's previous year questions"""
+    try:
+        subject_code = request.args.get('subject_code', '').upper()
+        
+        if not subject_code:
+            return jsonify({
+                'success': False,
+                'error': 'Please provide subject code'
+            }), 400
+        
+        topics = get_pyq_topics()
+        stats = topics.get(subject_code)
+        if stats is None:
+            return jsonify({
+                'success': False,
+                'error': f'No PYQs found for {subject_code}'
+            }), 404
+        
+        def build():
+            return dict(stats, success=True, subject_code=subject_code)
+        
+        return cached_json_response(('pyq_topics', subject_code, topics.version), build, PYQS_CACHE_CONTROL)
     
     except Exception as e:
         return jsonify({
@@ -207,40 +602,47 @@ def get_pyqs():
             'error': str(e)
         }), 500
 
-@app.route('/api/save-session', methods=['POST'])
+@bp.route('/api/save-session', methods=['POST'])
 def save_session():
     """Save pomodoro session"""
     try:
         data = request.json
-        session_data = {
-            'duration': data.get('duration', 25),
-            'timestamp': data.get('timestamp', datetime.now().isoformat()),
-            'subject': data.get('subject', 'General Study')
-        }
+        timestamp = data.get('timestamp', datetime.now().isoformat())
+        session_data = get_sessions_store().add(
+            user_id=session_user_id(data.get('user_id')),
+            subject=(data.get('subject') or 'General Study')[:200],
+            duration=session_duration(data.get('duration', 25)),
+            timestamp=timestamp,
+            day=session_day(timestamp, data.get('day'))
+        )
         
-        # In a real application, you would save this to a database
-        # For now, we'll just return success
         return jsonify({
             'success': True,
             'message': 'Session saved successfully',
             'session': session_data
         })
     
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
-@app.route('/api/get-sessions', methods=['GET'])
+@bp.route('/api/get-sessions', methods=['GET'])
 def get_sessions():
     """Get previous study sessions"""
     try:
-        # In a real application, you would fetch from database
-        # For now, return empty array
+        user_id = session_user_id(request.args.get('user_id'))
+        limit = min(request.args.get('limit', 10, type=int), 100)
+        
         return jsonify({
             'success': True,
-            'sessions': []
+            'sessions': get_sessions_store().recent_sessions(user_id, limit)
         })
     
     except Exception as e:
@@ -249,24 +651,145 @@ def get_sessions():
             'error': str(e)
         }), 500
 
-@app.route('/api/get-resources', methods=['GET'])
-def get_resources():
-    """Get additional resources"""
+@bp.route('/api/session-stats', methods=['GET'])
+def session_stats():
+    """Daily and weekly study minutes per subject, and the current streak"""
+    try:
+        user_id = session_user_id(request.args.get('user_id'))
+        today = session_day(datetime.now().isoformat(), request.args.get('today'))
+        days = min(request.args.get('days', 7, type=int), 366)
+        weeks = min(request.args.get('weeks', 8, type=int), 104)
+        today_date = datetime.fromisoformat(today).date()
+        store = get_sessions_store()
+        
+        return jsonify({
+            'success': True,
+            'daily': store.daily_totals(user_id, (today_date - timedelta(days=days - 1)).isoformat()),
+            'weekly': store.weekly_totals(user_id, week_start((today_date - timedelta(weeks=weeks - 1)).isoformat())),
+            'streak': store.streak(user_id, today)
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@bp.route('/api/flashcards/deck', methods=['POST'])
+def add_flashcards_to_deck():
+    """Add every flashcard for a subject and exam to the user's review deck"""
     try:
-        resources = db.get_study_resources()
+        data = request.json
+        user_id = session_user_id(data.get('user_id'))
+        subject_code = data.get('subject_code', '').upper()
+        exam_type = data.get('exam_type', 'semester')
+        
+        subject_info = get_db().get_subject_info(subject_code)
+        if not subject_info:
+            return jsonify({
+                'success': False,
+                'error': f'Subject {subject_code} not found'
+            }), 404
+        
+        # Cards come from the per-module flashcard cache, so this rarely calls the model
+        deck = get_flashcard_deck()
+        added = 0
+        for module, cards in get_gemini().module_flashcards(subject_code, exam_type, subject_info):
+            added += deck.add_cards(user_id, subject_code, module, cards)
+        
+        return jsonify({
+            'success': True,
+            'added': added,
+            'stats': deck.stats(user_id, subject_code)
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@bp.route('/api/flashcards/due', methods=['GET'])
+def due_flashcards():
+    """Next flashcards due for review in a user's deck"""
+    try:
+        user_id = session_user_id(request.args.get('user_id'))
+        subject_code = request.args.get('subject_code', '').upper()
+        limit = min(request.args.get('limit', 20, type=int), 100)
+        
+        if not subject_code:
+            return jsonify({
+                'success': False,
+                'error': 'Please provide subject code'
+            }), 400
+        
+        deck = get_flashcard_deck()
+        return jsonify({
+            'success': True,
+            'cards': deck.due_cards(user_id, subject_code, limit),
+            'stats': deck.stats(user_id, subject_code)
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@bp.route('/api/flashcards/review', methods=['POST'])
+def review_flashcards():
+    """Record a batch of flashcard reviews"""
+    try:
+        data = request.get_json(force=True)
+        user_id = session_user_id(data.get('user_id'))
+        subject_code = data.get('subject_code', '').upper()
+        reviews = data.get('reviews') or []
+        
+        if not subject_code or not isinstance(reviews, list):
+            return jsonify({
+                'success': False,
+                'error': 'Please provide subject code and reviews'
+            }), 400
+        
+        deck = get_flashcard_deck()
+        applied = deck.review(user_id, subject_code, reviews)
         
         return jsonify({
             'success': True,
-            'resources': resources
+            'applied': applied,
+            'stats': deck.stats(user_id, subject_code)
         })
     
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({
+            'success': False,
+            'error': f'Invalid review: {e}'
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@bp.route('/api/get-resources', methods=['GET'])
+def get_resources():
+    """Get additional resources"""
+    try:
+        def build():
+            return {
+                'success': True,
+                'resources': get_db().get_study_resources()
+            }
+        
+        return cached_json_response(('get_resources',), build, RESOURCES_CACHE_CONTROL)
+    
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
-@app.route('/api/chat', methods=['POST'])
+@bp.route('/api/chat', methods=['POST'])
 def chat():
     """Handle chat messages"""
     try:
@@ -281,10 +804,12 @@ def chat():
                 'error': 'Please provide a message'
             }), 400
         
+        subject_code = (data.get('subject_code') or '').upper() or None
+        
         if context:
-            response = gemini.answer_question(message, context)
+            response = get_gemini().answer_question(message, context, subject_code)
         else:
-            response = gemini.chat_response(message, chat_history)
+            response = get_gemini().chat_response(message, chat_history, subject_code=subject_code)
         
         return jsonify({
             'success': True,
@@ -297,7 +822,7 @@ def chat():
             'error': str(e)
         }), 500
 
-@app.route('/api/chat/stream', methods=['POST'])
+@bp.route('/api/chat/stream', methods=['POST'])
 def chat_stream():
     """Handle streaming chat messages"""
     try:
@@ -305,6 +830,7 @@ def chat_stream():
         message = data.get('message', '')
         context = data.get('context', '')
         chat_history = data.get('chat_history', '')
+        subject_code = (data.get('subject_code') or '').upper() or None
         
         if not message:
             return jsonify({
@@ -315,21 +841,16 @@ def chat_stream():
         def generate():
             try:
                 if context:
-                    # For now, answer_question doesn't support streaming
-                    # We can add it if needed
-                    response = gemini.answer_question(message, context)
-                    yield f"data: {json.dumps({'text': response, 'done': True})}\n\n"
+                    chunks = get_gemini().answer_question(message, context, subject_code, stream=True)
                 else:
-                    for chunk in gemini.chat_response(message, chat_history, stream=True):
-                        yield f"data: {json.dumps({'text': chunk})}\n\n"
-                    yield f"data: {json.dumps({'done': True})}\n\n"
+                    chunks = get_gemini().chat_response(message, chat_history, stream=True, subject_code=subject_code)
+                for chunk in chunks:
+                    yield f"data: {json.dumps({'text': chunk})}\n\n"
+                yield f"data: {json.dumps({'done': True})}\n\n"
             except Exception as e:
                 yield f"data: {json.dumps({'error': str(e)})}\n\n"
         
-        response = Response(stream_with_context(generate()), mimetype='text/event-stream')
-        response.headers['Cache-Control'] = 'no-cache'
-        response.headers['X-Accel-Buffering'] = 'no'
-        return response
+        return sse_response('chat_stream', generate())
     
     except Exception as e:
         return jsonify({
@@ -337,7 +858,7 @@ def chat_stream():
             'error': str(e)
         }), 500
 
-@app.route('/api/generate-notes/stream', methods=['POST'])
+@bp.route('/api/generate-notes/stream', methods=['POST'])
 def generate_notes_stream():
     """Generate study notes with streaming"""
     try:
@@ -346,7 +867,7 @@ def generate_notes_stream():
         exam_type = data.get('exam_type', 'semester')
         
         # Get subject information
-        subject_info = db.get_subject_info(subject_code)
+        subject_info = get_db().get_subject_info(subject_code)
         
         if not subject_info:
             return jsonify({
@@ -357,16 +878,13 @@ def generate_notes_stream():
         def generate():
             try:
                 yield f"data: {json.dumps({'subject_name': subject_info['name']})}\n\n"
-                for chunk in gemini.generate_study_notes(subject_code, exam_type, subject_info, stream=True):
+                for chunk in get_gemini().generate_study_notes(subject_code, exam_type, subject_info, stream=True):
                     yield f"data: {json.dumps({'text': chunk})}\n\n"
                 yield f"data: {json.dumps({'done': True})}\n\n"
             except Exception as e:
                 yield f"data: {json.dumps({'error': str(e)})}\n\n"
         
-        response = Response(stream_with_context(generate()), mimetype='text/event-stream')
-        response.headers['Cache-Control'] = 'no-cache'
-        response.headers['X-Accel-Buffering'] = 'no'
-        return response
+        return sse_response('generate_notes_stream', generate())
     
     except Exception as e:
         return jsonify({
@@ -374,7 +892,7 @@ def generate_notes_stream():
             'error': str(e)
         }), 500
 
-@app.route('/api/create-schedule/stream', methods=['POST'])
+@bp.route('/api/create-schedule/stream', methods=['POST'])
 def create_schedule_stream():
     """Create study schedule with streaming"""
     try:
@@ -382,7 +900,6 @@ def create_schedule_stream():
         subjects = data.get('subjects', '')
         start_date = data.get('start_date', '')
         end_date = data.get('end_date', '')
-        hours_per_day = data.get('hours_per_day', 2)
         
         if not subjects or not start_date or not end_date:
             return jsonify({
@@ -390,42 +907,47 @@ def create_schedule_stream():
                 'error': 'Please provide subjects, start date, and end date'
             }), 400
         
-        # Validate hours per day (minimum 2)
-        if hours_per_day < 2:
-            return jsonify({
-                'success': False,
-                'error': 'Minimum study hours is 2 hours per day'
-            }), 400
+        # Numbers from 2 to 16 only; a string would otherwise be repeated, not multiplied
+        hours_per_day = hours_per_day_value(data.get('hours_per_day', 2))
+        
+        # Plan up front so an invalid range is a 400, not an error inside the stream
+        days = get_gemini().create_study_schedule(schedule_subjects(subjects), start_date, end_date,
+                                                  hours_per_day, stream=True)
         
         def generate():
             try:
-                for chunk in gemini.create_study_schedule(subjects, start_date, end_date, hours_per_day, stream=True):
+                for chunk in days:
                     yield f"data: {json.dumps({'text': chunk})}\n\n"
                 yield f"data: {json.dumps({'done': True})}\n\n"
             except Exception as e:
                 yield f"data: {json.dumps({'error': str(e)})}\n\n"
         
-        response = Response(stream_with_context(generate()), mimetype='text/event-stream')
-        response.headers['Cache-Control'] = 'no-cache'
-        response.headers['X-Accel-Buffering'] = 'no'
-        return response
+        return sse_response('create_schedule_stream', generate())
     
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
-@app.route('/api/subjects', methods=['GET'])
+@bp.route('/api/subjects', methods=['GET'])
 def get_subjects():
     """Get all available subjects"""
     try:
-        subjects = db.get_all_subjects()
+        db = get_db()
         
-        return jsonify({
-            'success': True,
-            'subjects': subjects
-        })
+        def build():
+            return {
+                'success': True,
+                'subjects': db.get_all_subjects()
+            }
+        
+        return cached_json_response(('subjects', db.data_version('subjects')), build, SUBJECTS_CACHE_CONTROL)
     
     except Exception as e:
         return jsonify({
@@ -433,21 +955,15 @@ def get_subjects():
             'error': str(e)
         }), 500
 
-@app.route('/api/download-pyq/<subject_code>/<year>', methods=['GET'])
+@bp.route('/api/download-pyq/<subject_code>/<year>', methods=['GET'])
 def download_pyq(subject_code, year):
     """Download PYQ file for given subject code and year"""
     try:
-        import os
-        
         # Construct filename: subjectcode_year.docx
         filename = f"{subject_code}_{year}.docx"
+        file_path = get_pyq_index().find(subject_code, year)
         
-        # Path to PYQ directory (one level up from study-assistant)
-        pyq_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'PYQ')
-        file_path = os.path.join(pyq_dir, filename)
-        
-        # Check if file exists
-        if not os.path.exists(file_path):
+        if not file_path:
             return jsonify({
                 'success': False,
                 'error': f'PYQ not found for {subject_code} ({year})'
@@ -458,7 +974,8 @@ def download_pyq(subject_code, year):
             file_path,
             as_attachment=True,
             download_name=filename,
-            mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+            mimetype=DOCX_MIMETYPE,
+            max_age=PYQ_FILE_MAX_AGE
         )
     
     except Exception as e:
@@ -468,6 +985,91 @@ def download_pyq(subject_code, year):
             'error': str(e)
         }), 500
 
+@bp.route('/api/download-pyqs', methods=['GET'])
+def download_pyqs():
+    """Download every PYQ file matching the subjects, exam type and year range as one zip"""
+    try:
+        subject_codes = [code.strip().upper() for code in request.args.get('subject_code', '').split(',') if code.strip()]
+        exam_type = request.args.get('exam_type') or None
+        year_from = request.args.get('year_from', type=int)
+        year_to = request.args.get('year_to', type=int)
+        
+        if not subject_codes:
+            return jsonify({
+                'success': False,
+                'error': 'Please provide subject code'
+            }), 400
+        
+        files = get_pyq_index().select(subject_codes, exam_type, year_from, year_to)
+        if not files:
+            return jsonify({
+                'success': False,
+                'error': f"No PYQs found for {', '.join(subject_codes)}"
+            }), 404
+        
+        filename = f"{'_'.join(subject_codes)}_PYQs.zip"
+        response = Response(stream_with_context(PyqIndex.stream_zip(files)), mimetype='application/zip')
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response.headers['X-PYQ-Count'] = str(len(files))
+        return response
+    
+    except Exception as e:
+        print(f"Error downloading PYQs: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+# Request body limits in bytes; PDF export carries whole study notes, other APIs small JSON
+MAX_REQUEST_BYTES = int(os.getenv('MAX_REQUEST_BYTES', str(1024 * 1024)))
+PDF_MAX_REQUEST_BYTES = int(os.getenv('PDF_MAX_REQUEST_BYTES', str(8 * 1024 * 1024)))
+# Non-file multipart fields (such as the mind map code) are held in memory up to this size
+MAX_FORM_MEMORY_BYTES = int(os.getenv('MAX_FORM_MEMORY_BYTES', str(256 * 1024)))
+ENDPOINT_BODY_LIMITS = {'main.download_pdf': PDF_MAX_REQUEST_BYTES}
+
+class BoundedRequest(Request):
+    """Request whose body size limit depends on the endpoint"""
+    max_form_memory_size = MAX_FORM_MEMORY_BYTES
+    
+    @property
+    def max_content_length(self):
+        return ENDPOINT_BODY_LIMITS.get(self.endpoint, current_app.config['MAX_CONTENT_LENGTH'])
+
+@bp.before_app_request
+def reject_large_bodies():
+    """Refuse bodies over the endpoint's limit from their declared length, before any route reads them"""
+    limit = request.max_content_length
+    if limit is not None and request.content_length is not None and request.content_length > limit:
+        return request_too_large(None)
+
+@bp.app_errorhandler(413)
+def request_too_large(e):
+    """Oversized request bodies are rejected before they are read"""
+    return jsonify({
+        'success': False,
+        'error': 'Request body is too large'
+    }), 413
+
+def create_app():
+    """Create the Flask application; helpers are constructed lazily on first use"""
+    app = Flask(__name__)
+    app.request_class = BoundedRequest
+    app.config['MAX_CONTENT_LENGTH'] = MAX_REQUEST_BYTES
+    CORS(app)
+    Compression(app)
+    AssetPipeline(app)
+    app.register_blueprint(bp)
+    return app
+
+def preload_app(app):
+    """Load read-only data and compile templates, e.g. in the master process before workers fork"""
+    with app.app_context():
+        get_db().preload()
+        get_pyq_index().refresh()
+        app.jinja_env.get_template('index.html')
+
+app = create_app()
+
 if __name__ == '__main__':
     # Enable threading for proper streaming support
     app.run(debug=True, port=5000, threaded=True)
@@ -0,0 +1,90 @@
+"""Import-time benchmark for app startup.
+
+Measures, in fresh interpreters, how long it takes to import the app module,
+to create an app with create_app() and to serve the first request, and lists
+the slowest imports reported by `python -X importtime`. Heavy modules that
+should stay out of the startup path are flagged if they get imported.
+
+Usage:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --runs 10 --top 15
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules only needed by the PDF, mind map or Gemini paths
+DEFERRED_MODULES = ('reportlab', 'markdown', 'playwright', 'google.generativeai', 'pygments', 'numpy')
+
+STARTUP_SCRIPT = """
+import time, sys
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app()
+created = time.perf_counter()
+application.test_client().get('/api/subjects')
+served = time.perf_counter()
+heavy = sorted(m for m in sys.modules if m.split('.')[0] in {deferred} or m in {deferred})
+print(imported - start, created - imported, served - created, ','.join(heavy))
+"""
+
+
+def run_startup(env):
+    script = STARTUP_SCRIPT.format(deferred=repr(set(DEFERRED_MODULES)))
+    output = subprocess.check_output([sys.executable, '-c', script], cwd=ROOT, env=env, text=True,
+                                     stderr=subprocess.DEVNULL)
+    last = output.strip().splitlines()[-1].split(' ', 3)
+    return float(last[0]), float(last[1]), float(last[2]), [m for m in (last[3] if len(last) > 3 else '').split(',') if m]
+
+
+def slowest_imports(env, top):
+    """Modules imported directly by app, ranked by cumulative import time in microseconds"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=ROOT, env=env,
+                            capture_output=True, text=True)
+    children = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nesting is shown as two spaces per level after the separator's own space
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children.append((int(cumulative), name.strip()))
+        elif depth == 0:
+            # Children are listed before their parent
+            if name.strip() == 'app':
+                return sorted(children, reverse=True)[:top]
+            children = []
+    return []
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters to time')
+    parser.add_argument('--top', type=int, default=10, help='slowest imports to list')
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ, MODEL_BACKEND=os.environ.get('MODEL_BACKEND', 'fake'))
+    runs = [run_startup(env) for _ in range(args.runs)]
+    for label, index in (('import app', 0), ('create_app()', 1), ('first request', 2)):
+        values = [run[index] * 1000 for run in runs]
+        print(f"{label:<16} median {statistics.median(values):8.1f} ms   min {min(values):8.1f} ms")
+
+    print("\nSlowest imports made by app.py:")
+    for cumulative, name in slowest_imports(env, args.top):
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    heavy = runs[-1][3]
+    if heavy:
+        print(f"\nDeferred modules imported at startup: {', '.join(heavy)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,348 @@
+"""End-to-end load test for the Flask app against the fake model backend.
+
+Drives every route in app.py through the Flask test client from a pool of
+worker threads and reports throughput, latency percentiles, time to first
+SSE frame and memory use. No network access or Gemini API key is needed.
+
+Usage:
+    python benchmarks/loadtest.py --requests 200 --concurrency 8
+    python benchmarks/loadtest.py --routes notes_stream,download_pdf --json
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def write_fixture_subjects(path, count):
+    """Write a synthetic data.json with `count` subjects of six modules each"""
+    subjects = {}
+    for i in range(count):
+        code = f'LT{i:03d}'
+        subjects[code] = {
+            'title': f'Load Test Subject {i}',
+            'modules': [
+                {
+                    'module': f'Module: {m}',
+                    'name': f'Module {m} of subject {i}',
+                    'topics': [f'Topic {m}.{t}' for t in range(1, 6)]
+                }
+                for m in range(1, 7)
+            ]
+        }
+    with open(path, 'w') as f:
+        json.dump(subjects, f)
+    return list(subjects)
+
+
+# Smallest parts of a valid .docx: content types, package relationships and the document body
+DOCX_PARTS = {
+    '[Content_Types].xml': '<?xml version="1.0" encoding="UTF-8"?><Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                           '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                           '<Default Extension="xml" ContentType="application/xml"/>'
+                           '<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+                           '</Types>',
+    '_rels/.rels': '<?xml version="1.0" encoding="UTF-8"?><Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                   '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>'
+                   '</Relationships>',
+}
+PYQ_YEARS = (2022, 2023)
+# Scenarios that must find fixture data; a 404 means the fixture is wrong, not a result
+FIXTURE_SCENARIOS = ('get_pyqs', 'pyq_topics', 'download_pyq', 'download_pyqs', 'mindmap_svg', 'mindmap_png')
+
+
+def write_fixture_pyqs(directory, subject_codes):
+    """Write a small whole-year .docx paper per subject and year, so PYQ downloads find real files"""
+    os.makedirs(directory, exist_ok=True)
+    for code in subject_codes:
+        for year in PYQ_YEARS:
+            questions = ''.join(f'<w:p><w:r><w:t>Q{q}. Explain topic {q} of {code} ({year}).</w:t></w:r></w:p>'
+                                for q in range(1, 21))
+            with zipfile.ZipFile(os.path.join(directory, f'{code}_{year}.docx'), 'w', zipfile.ZIP_DEFLATED) as docx:
+                for name, xml in DOCX_PARTS.items():
+                    docx.writestr(name, xml)
+                docx.writestr('word/document.xml',
+                              '<?xml version="1.0" encoding="UTF-8"?><w:document xmlns:w='
+                              '"http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                              f'<w:body>{questions}</w:body></w:document>')
+
+
+def write_fixture_pyq_questions(path, subject_codes):
+    """Write a synthetic pyqs.json with a few past questions per subject, exam type and year"""
+    pyqs = {
+        code: {
+            exam_type: [
+                {'year': str(year), 'questions': [f'Explain Topic {m}.{t} of Module {m} with an example'
+                                                  for m in range(1, 7) for t in (1, 3)]}
+                for year in PYQ_YEARS
+            ]
+            for exam_type in ('internal1', 'semester')
+        }
+        for code in subject_codes
+    }
+    with open(path, 'w') as f:
+        json.dump(pyqs, f)
+
+
+def _png(width, height):
+    """A blank white PNG, so served PNG variants need no browser to rasterize"""
+    def chunk(kind, data):
+        return (len(data).to_bytes(4, 'big') + kind + data
+                + (zlib.crc32(kind + data) & 0xffffffff).to_bytes(4, 'big'))
+    rows = b''.join(b'\x00' + b'\xff' * 3 * width for _ in range(height))
+    header = width.to_bytes(4, 'big') + height.to_bytes(4, 'big') + bytes([8, 2, 0, 0, 0])
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(rows)) + chunk(b'IEND', b'')
+
+
+def write_fixture_mindmap_image(directory, with_mindmap):
+    """Store one rendered mind map and return its key, so the image routes serve a real file.
+
+    The PNG is only pre-stored without --with-mindmap; with it the first
+    request rasterizes the SVG through Playwright as in production.
+    """
+    from utils.gemini_helper import MINDMAP_PNG_WIDTH
+    from utils.image_store import ImageStore
+    store = ImageStore(directory)
+    key = ImageStore.key_for('loadtest mind map')
+    nodes = ''.join(f'<g><rect x="{40 + 160 * n}" y="80" width="140" height="40" rx="8" fill="#eef"/>'
+                    f'<text x="{110 + 160 * n}" y="105" text-anchor="middle">Module {n + 1}</text></g>'
+                    for n in range(6))
+    store.put(key, 'svg', ('<svg xmlns="http://www.w3.org/2000/svg" width="1000" height="200" '
+                           f'viewBox="0 0 1000 200">{nodes}</svg>').encode('utf-8'))
+    if not with_mindmap:
+        store.put(key, f'{MINDMAP_PNG_WIDTH}.png', _png(MINDMAP_PNG_WIDTH, 320))
+    return key
+
+
+def seed_flashcards(app, subject_codes, user_id):
+    """Add the first subject's cards to a deck and return their ids, for the review scenario"""
+    client = app.test_client()
+    client.post('/api/flashcards/deck', json={'user_id': user_id, 'subject_code': subject_codes[0],
+                                              'exam_type': 'semester'})
+    due = client.get(f'/api/flashcards/due?user_id={user_id}&subject_code={subject_codes[0]}&limit=100')
+    return [card['id'] for card in due.get_json().get('cards', [])]
+
+
+def build_scenarios(subject_codes, with_mindmap, mindmap_key, card_ids, flashcard_user):
+    """Request scenarios keyed by name: (method, path, json body or None, is_stream)"""
+    def subject(i):
+        return subject_codes[i % len(subject_codes)]
+
+    notes = '\n'.join(['# Notes', '## Section', '- **bold** point with `code`', '1. numbered item',
+                       'A regular paragraph of text with *italic* words.'] * 40)
+    mindmap = 'mindmap\n  root((Subject))\n    Module 1\n      Topic A\n    Module 2\n      Topic B'
+
+    def user(i):
+        return f'loadtest-{i % 16}'
+
+    def review(i):
+        cards = [{'card_id': card_ids[(i + k) % len(card_ids)], 'grade': (i + k) % 6} for k in range(5)] \
+            if card_ids else []
+        return {'user_id': flashcard_user, 'subject_code': subject_codes[0], 'reviews': cards}
+
+    return {
+        'index': lambda i: ('GET', '/', None, False),
+        'service_worker': lambda i: ('GET', '/sw.js', None, False),
+        'metrics': lambda i: ('GET', '/metrics', None, False),
+        'subjects': lambda i: ('GET', '/api/subjects', None, False),
+        'resources': lambda i: ('GET', '/api/get-resources', None, False),
+        'get_pyqs': lambda i: ('GET', f'/api/get-pyqs?subject_code={subject(i)}', None, False),
+        'pyq_topics': lambda i: ('GET', f'/api/pyq-topics?subject_code={subject(i)}', None, False),
+        'download_pyq': lambda i: ('GET', f'/api/download-pyq/{subject(i)}/2023', None, False),
+        'download_pyqs': lambda i: ('GET', f'/api/download-pyqs?subject_code={subject(i)}', None, False),
+        'content_version': lambda i: ('GET', f'/api/study-content-version?subject_code={subject(i)}'
+                                             f'&exam_type=internal1', None, False),
+        'study_content': lambda i: ('POST', '/api/generate-study-content',
+                                    {'subject_code': subject(i), 'exam_type': 'internal1'}, False),
+        'prefetch': lambda i: ('POST', '/api/prefetch',
+                               {'user_id': user(i), 'subject_code': subject(i), 'exam_type': 'internal2'}, False),
+        'prefetch_cancel': lambda i: ('POST', '/api/prefetch', {'user_id': user(i), 'cancel': True}, False),
+        'notes_stream': lambda i: ('POST', '/api/generate-notes/stream',
+                                   {'subject_code': subject(i), 'exam_type': 'semester'}, True),
+        'chat': lambda i: ('POST', '/api/chat', {'message': f'Explain topic {i}'}, False),
+        'chat_stream': lambda i: ('POST', '/api/chat/stream', {'message': f'Explain topic {i}'}, True),
+        'chat_context': lambda i: ('POST', '/api/chat/stream',
+                                   {'message': f'Explain topic {i}', 'context': 'Subject: Data Structures'}, True),
+        'schedule': lambda i: ('POST', '/api/create-schedule',
+                               {'subjects': subject(i), 'exam_date': '2026-01-10', 'hours_per_day': 3}, False),
+        'schedule_stream': lambda i: ('POST', '/api/create-schedule/stream',
+                                      {'subjects': f'{subject(i)}, {subject(i + 1)}', 'start_date': '2026-01-01',
+                                       'end_date': '2026-01-14', 'hours_per_day': 3}, True),
+        'save_session': lambda i: ('POST', '/api/save-session',
+                                   {'user_id': user(i), 'duration': 25, 'subject': subject(i)}, False),
+        'get_sessions': lambda i: ('GET', f'/api/get-sessions?user_id={user(i)}', None, False),
+        'session_stats': lambda i: ('GET', f'/api/session-stats?user_id={user(i)}', None, False),
+        'flashcard_deck': lambda i: ('POST', '/api/flashcards/deck',
+                                     {'user_id': user(i), 'subject_code': subject(i), 'exam_type': 'semester'}, False),
+        'flashcards_due': lambda i: ('GET', f'/api/flashcards/due?user_id={flashcard_user}'
+                                            f'&subject_code={subject_codes[0]}', None, False),
+        'flashcard_review': lambda i: ('POST', '/api/flashcards/review', review(i), False),
+        'mindmap_image': lambda i: ('POST', '/api/generate-mindmap-image', {'mindmap': mindmap}, False),
+        'mindmap_svg': lambda i: ('GET', f'/api/mindmap-image/{mindmap_key}.svg', None, False),
+        'mindmap_png': lambda i: ('GET', f'/api/mindmap-image/{mindmap_key}.png', None, False),
+        'download_pdf': lambda i: ('POST', '/api/download-pdf',
+                                   {'notes': notes, 'subject_name': 'Load Test', 'exam_type': 'semester',
+                                    'subject_code': subject(i), 'mindmap': mindmap if with_mindmap else None},
+                                   False),
+    }
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def run_request(client, scenario, i):
+    """Issue one request, returning (status, seconds, seconds to first frame, bytes)"""
+    method, path, body, is_stream = scenario(i)
+    start = time.perf_counter()
+    if method == 'GET':
+        response = client.get(path, buffered=not is_stream)
+    else:
+        response = client.post(path, json=body, buffered=not is_stream)
+
+    first_frame = None
+    size = 0
+    if is_stream:
+        for chunk in response.response:
+            if first_frame is None:
+                first_frame = time.perf_counter() - start
+            size += len(chunk)
+        response.close()
+    else:
+        size = len(response.get_data())
+    return response.status_code, time.perf_counter() - start, first_frame, size
+
+
+def run_scenario(app, name, scenario, total, concurrency):
+    local = threading.local()
+
+    def worker(i):
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        try:
+            return run_request(local.client, scenario, i)
+        except Exception as e:
+            return f'exception: {e}', 0.0, None, 0
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(worker, range(total)))
+    elapsed = time.perf_counter() - start
+
+    latencies = [r[1] for r in results]
+    first_frames = [r[2] for r in results if r[2] is not None]
+    statuses = {}
+    for status, _, _, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        'route': name,
+        'requests': total,
+        'throughput_rps': total / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'first_frame_p50_ms': percentile(first_frames, 50) * 1000 if first_frames else None,
+        'bytes_per_request': sum(r[3] for r in results) / total if total else 0,
+        'statuses': statuses,
+    }
+
+
+def print_report(report):
+    header = f"{'route':<16}{'reqs':>6}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'ttff ms':>9}  statuses"
+    print(header)
+    print('-' * len(header))
+    for row in report['routes']:
+        ttff = f"{row['first_frame_p50_ms']:.1f}" if row['first_frame_p50_ms'] is not None else '-'
+        print(f"{row['route']:<16}{row['requests']:>6}{row['throughput_rps']:>9.1f}{row['p50_ms']:>9.1f}"
+              f"{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{ttff:>9}  {row['statuses']}")
+    memory = report['memory']
+    print(f"\nPeak traced allocations: {memory['traced_peak_mb']:.1f} MB, max RSS: {memory['max_rss_mb']:.1f} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=50, help='requests per route')
+    parser.add_argument('--concurrency', type=int, default=4, help='concurrent client threads')
+    parser.add_argument('--subjects', type=int, default=10, help='synthetic subjects to spread requests over')
+    parser.add_argument('--routes', default='', help='comma-separated subset of routes to run')
+    parser.add_argument('--with-mindmap', action='store_true', help='render mind maps in PDF export (needs Playwright)')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+
+    fixture_dir = tempfile.mkdtemp(prefix='loadtest-')
+    subjects_file = os.path.join(fixture_dir, 'data.json')
+    subject_codes = write_fixture_subjects(subjects_file, args.subjects)
+    pyqs_file = os.path.join(fixture_dir, 'pyqs.json')
+    write_fixture_pyq_questions(pyqs_file, subject_codes)
+    pyq_dir = os.path.join(fixture_dir, 'PYQ')
+    write_fixture_pyqs(pyq_dir, subject_codes)
+    os.environ.setdefault('MODEL_BACKEND', 'fake')
+    # The fake backend has no upstream quota; throttling it would measure the limiter, not the app
+    os.environ.setdefault('GEMINI_REQUESTS_PER_MINUTE', '0')
+    # Every data file and store the app writes lives in the fixture dir, never under database/
+    os.environ.update({
+        'SUBJECTS_FILE': subjects_file,
+        'PYQS_FILE': pyqs_file,
+        'PYQ_DIR': pyq_dir,
+        'SESSIONS_DB': os.path.join(fixture_dir, 'sessions.sqlite3'),
+        'FLASHCARDS_DB': os.path.join(fixture_dir, 'flashcards.sqlite3'),
+        'MINDMAP_IMAGE_DIR': os.path.join(fixture_dir, 'mindmaps'),
+        'RETRIEVAL_INDEX_PATH': os.path.join(fixture_dir, 'retrieval_index.npz'),
+        'PYQ_TOPICS_PATH': os.path.join(fixture_dir, 'pyq_topics.json'),
+    })
+    if 'SHARED_CACHE_PATH' in os.environ:
+        os.environ['SHARED_CACHE_PATH'] = os.path.join(fixture_dir, 'shared_cache.sqlite3')
+
+    tracemalloc.start()
+    from app import app
+
+    mindmap_key = write_fixture_mindmap_image(os.environ['MINDMAP_IMAGE_DIR'], args.with_mindmap)
+    flashcard_user = 'loadtest-reviewer'
+    card_ids = seed_flashcards(app, subject_codes, flashcard_user)
+    scenarios = build_scenarios(subject_codes, args.with_mindmap, mindmap_key, card_ids, flashcard_user)
+    selected = [name.strip() for name in args.routes.split(',') if name.strip()] or list(scenarios)
+    unknown = [name for name in selected if name not in scenarios]
+    if unknown:
+        parser.error(f"Unknown routes: {', '.join(unknown)}")
+
+    rows = [run_scenario(app, name, scenarios[name], args.requests, args.concurrency) for name in selected]
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    report = {
+        'backend': os.environ['MODEL_BACKEND'],
+        'concurrency': args.concurrency,
+        'routes': rows,
+        'memory': {
+            'traced_peak_mb': traced_peak / (1024 * 1024),
+            # ru_maxrss is reported in kilobytes on Linux
+            'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        },
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    missing = [row['route'] for row in rows if row['route'] in FIXTURE_SCENARIOS and '404' in row['statuses']]
+    if missing:
+        sys.exit(f"Fixture data was not found by: {', '.join(missing)}")
+
+
+if __name__ == '__main__':
+    main()
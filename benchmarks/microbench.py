@@ -0,0 +1,240 @@
+"""Microbenchmarks for the PDF, markdown and data-layer hot paths.
+
+Each benchmark is timed over several calibrated samples and the median
+time per call is reported. Results can be appended to a history file and
+compared against the median of previous runs; the run fails when any
+benchmark is slower than the baseline by more than the threshold.
+
+Usage:
+    python benchmarks/microbench.py                   # run and compare
+    python benchmarks/microbench.py --save            # run, compare and record
+    python benchmarks/microbench.py --filter pdf --threshold 1.5
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_HISTORY = os.path.join(ROOT, 'benchmarks', '.results', 'history.jsonl')
+# Minimum wall time of one sample; fast benchmarks loop until they reach it
+MIN_SAMPLE_SECONDS = 0.05
+BASELINE_RUNS = 5
+
+
+def make_notes(sections):
+    """Study notes markdown with headings, lists, code blocks and inline formatting"""
+    lines = ['# Data Structures - Semester Exam (All Modules)', '']
+    for i in range(sections):
+        lines += [
+            f'## Module {i + 1}: Trees and Graphs',
+            '',
+            f'### Key Concepts {i + 1}',
+            'A **binary search tree** keeps keys ordered so that *search*, `insert` and `delete` run in O(log n).',
+            '- **Height** is the longest root-to-leaf path; keep it small with rotations.',
+            '- *Traversals*: inorder, preorder and postorder visit every `node` once.',
+            '* Balanced trees such as **AVL** and **red-black** trees bound the height.',
+            '1. Insert the key as in a plain BST.',
+            '2. Walk back up, updating heights and rotating where the **balance factor** exceeds one.',
+            '',
+            '```python',
+            'def inorder(node):',
+            '    if node:',
+            '        yield from inorder(node.left)',
+            '        yield node.key',
+            '        yield from inorder(node.right)',
+            '```',
+            '',
+            'Common mistakes include forgetting to update `height` after a rotation & comparing <keys> wrongly.',
+            '',
+        ]
+    return '\n'.join(lines)
+
+
+def make_schedule(days, subjects=('Data Structures', 'DBMS', 'Operating Systems')):
+    """A day-by-day markdown timetable in the format produced by the planner"""
+    lines = []
+    start = date(2026, 1, 1)
+    for d in range(days):
+        day = start + timedelta(days=d)
+        lines += [f"### {day.strftime('%A, %B %d, %Y')}", '',
+                  '| Time Slot | Subject | Topic | Activities |',
+                  '|-----------|---------|-------|------------|']
+        hour = 9
+        for s, subject in enumerate(subjects):
+            lines.append(f'| {hour}:00 - {hour + 1}:30 | {subject} | Topic {d}.{s} | Study concepts, solve 5 problems |')
+            lines.append(f'| {hour + 1}:30 - {hour + 1}:45 | Break | - | Rest and refresh |')
+            hour += 2
+        lines.append('')
+    return '\n'.join(lines)
+
+
+def write_catalog(directory, subject_count, years=6):
+    """Write a large subjects file and PYQ catalog, returning their paths"""
+    subjects = {}
+    pyqs = {}
+    for i in range(subject_count):
+        code = f'BM{i:04d}'
+        subjects[code] = {
+            'title': f'Benchmark Subject {i}',
+            'modules': [{'module': f'Module: {m}', 'name': f'Module {m}',
+                         'topics': [f'Topic {m}.{t}' for t in range(8)]} for m in range(1, 7)]
+        }
+        pyqs[code] = {
+            exam_type: [{'year': str(2024 - y),
+                         'questions': [f'Explain concept {q} of module {y} in subject {i}' for q in range(10)]}
+                        for y in range(years)]
+            for exam_type in ('internal1', 'internal2', 'internal3', 'semester')
+        }
+    subjects_file = os.path.join(directory, 'data.json')
+    pyqs_file = os.path.join(directory, 'pyqs.json')
+    with open(subjects_file, 'w') as f:
+        json.dump(subjects, f)
+    with open(pyqs_file, 'w') as f:
+        json.dump(pyqs, f)
+    return subjects_file, pyqs_file
+
+
+def build_benchmarks():
+    """Benchmarks keyed by name, each a zero-argument callable"""
+    from utils.model_backends import FakeBackend
+    from utils.gemini_helper import GeminiHelper
+    from utils.database_helper import DatabaseHelper
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+
+    gemini = GeminiHelper(backend=FakeBackend())
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(name='CustomCode', parent=styles['Normal'], fontName='Courier'))
+
+    short_notes = make_notes(3)
+    # Roughly 100 rendered A4 pages
+    long_notes = make_notes(220)
+    schedule = make_schedule(60)
+    inline_line = 'A **binary search tree** keeps keys *ordered* so `insert` and **`delete`** are fast & cheap.'
+
+    catalog_dir = tempfile.mkdtemp(prefix='microbench-')
+    subjects_file, pyqs_file = write_catalog(catalog_dir, 500)
+    db = DatabaseHelper()
+    db.subjects_file = subjects_file
+    db.pyqs_file = pyqs_file
+
+    return {
+        'markdown.convert_inline': lambda: gemini._convert_markdown_inline(inline_line),
+        'markdown.elements_short_notes': lambda: gemini._markdown_to_pdf_elements(short_notes, styles),
+        'markdown.elements_100_page_notes': lambda: gemini._markdown_to_pdf_elements(long_notes, styles),
+        'markdown.elements_60_day_schedule': lambda: gemini._markdown_to_pdf_elements(schedule, styles),
+        'pdf.short_notes': lambda: gemini.generate_pdf_from_notes(short_notes, 'Data Structures', 'semester'),
+        'pdf.100_page_notes': lambda: gemini.generate_pdf_from_notes(long_notes, 'Data Structures', 'semester'),
+        'pdf.60_day_schedule': lambda: gemini.generate_pdf_from_notes(schedule, 'Study Schedule', 'semester'),
+        'db.get_subject_info': lambda: db.get_subject_info('BM0250'),
+        'db.get_pyqs_for_subject': lambda: db.get_pyqs_for_subject('BM0250', 'semester'),
+        'db.get_all_subjects': lambda: db.get_all_subjects(),
+        'db.search_subjects': lambda: db.search_subjects('subject 42'),
+    }
+
+
+def time_benchmark(func, samples):
+    """Median seconds per call over calibrated samples"""
+    func()  # warm up
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_SAMPLE_SECONDS or loops >= 1 << 20:
+            break
+        loops *= 2
+    timings = [elapsed / loops]
+    for _ in range(samples - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        timings.append((time.perf_counter() - start) / loops)
+    return statistics.median(timings), loops
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def baseline_from_history(history, machine):
+    """Median of each benchmark over the most recent runs on this machine"""
+    runs = [run for run in history if run.get('machine') == machine][-BASELINE_RUNS:]
+    values = {}
+    for run in runs:
+        for name, seconds in run['results'].items():
+            values.setdefault(name, []).append(seconds)
+    return {name: statistics.median(times) for name, times in values.items()}
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def format_seconds(seconds):
+    if seconds >= 1:
+        return f'{seconds:.3f} s'
+    if seconds >= 1e-3:
+        return f'{seconds * 1e3:.3f} ms'
+    return f'{seconds * 1e6:.3f} us'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filter', default='', help='only run benchmarks whose name contains this text')
+    parser.add_argument('--samples', type=int, default=5, help='timed samples per benchmark')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='fail when a benchmark is this many times slower than the baseline')
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help='JSON lines file of previous results')
+    parser.add_argument('--save', action='store_true', help='append this run to the history file')
+    args = parser.parse_args(argv)
+
+    machine = f'{platform.node()}-{platform.machine()}-py{platform.python_version()}'
+    baseline = baseline_from_history(load_history(args.history), machine)
+    benchmarks = {name: func for name, func in build_benchmarks().items() if args.filter in name}
+
+    results = {}
+    regressions = []
+    print(f"{'benchmark':<36}{'median':>14}{'loops':>9}{'baseline':>14}{'ratio':>8}")
+    for name, func in benchmarks.items():
+        seconds, loops = time_benchmark(func, args.samples)
+        results[name] = seconds
+        base = baseline.get(name)
+        ratio = seconds / base if base else None
+        flag = ''
+        if ratio is not None and ratio > args.threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<36}{format_seconds(seconds):>14}{loops:>9}"
+              f"{format_seconds(base) if base else '-':>14}{f'{ratio:.2f}' if ratio else '-':>8}{flag}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.history), exist_ok=True)
+        with open(args.history, 'a') as f:
+            f.write(json.dumps({'timestamp': datetime.now().isoformat(), 'revision': git_revision(),
+                                'machine': machine, 'results': results}) + '\n')
+
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) regressed beyond {args.threshold:.2f}x: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""Gunicorn settings for production: gunicorn -c gunicorn.conf.py wsgi:app"""
+import multiprocessing
+import os
+import random
+from utils.rate_limiter import DEFAULT_REQUESTS_PER_MINUTE
+
+bind = os.getenv('BIND', '0.0.0.0:8000')
+
+# One process per core; threads per worker bound its concurrent requests,
+# including open SSE streams
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.getenv('WORKER_THREADS', '8'))
+
+# Load the app and read-only data once in the master, then fork
+preload_app = True
+
+# Generated notes can stream for minutes
+timeout = int(os.getenv('WORKER_TIMEOUT', '300'))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers periodically to bound memory growth from caches and rendering
+max_requests = int(os.getenv('WORKER_MAX_REQUESTS', '1000'))
+max_requests_jitter = max_requests // 10
+
+limit_request_line = 8190
+limit_request_fields = 100
+
+# Generated content is shared between workers through a SQLite cache
+os.environ.setdefault('SHARED_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                        'database', 'shared_cache.sqlite3'))
+# Workers write metric snapshots here so /metrics reports the whole server, not one worker
+os.environ.setdefault('METRICS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                  'database', 'metrics'))
+# Keep each worker's model fan-out modest; workers multiply it across the node
+os.environ.setdefault('GEMINI_MODULE_WORKERS', '2')
+# The model rate limit is enforced per worker, so split the upstream quota between them
+os.environ.setdefault('GEMINI_REQUESTS_PER_MINUTE', str(DEFAULT_REQUESTS_PER_MINUTE / workers))
+
+
+def on_starting(server):
+    from utils import metrics
+    metrics.clear_directory()
+
+
+def post_fork(server, worker):
+    # Forked workers inherit the master's random state; reseed so trace sampling differs per worker
+    random.seed()
+    from utils.metrics import REGISTRY
+    REGISTRY.start_flusher()
+
+
+def worker_exit(server, worker):
+    # Save what the worker counted since its last background flush
+    from utils.metrics import REGISTRY
+    REGISTRY.flush()
+
+
+def child_exit(server, worker):
+    from utils.metrics import REGISTRY
+    REGISTRY.mark_process_dead(worker.pid)
@@ -0,0 +1,45 @@
+"""Precompute which syllabus topics previous year questions ask about most.
+
+Maps every question in pyqs.json to the closest module topic of its subject
+(TF-IDF cosine similarity), groups near-duplicate questions across years
+with MinHash LSH and writes per-topic frequency tables to a JSON index that
+/api/pyq-topics serves as is. The app reloads the file when it changes.
+
+Usage:
+    python jobs/build_pyq_topics.py
+    python jobs/build_pyq_topics.py --output database/pyq_topics.json
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.database_helper import DatabaseHelper
+from utils.pyq_topics import build_topic_index, save_topic_index
+
+DEFAULT_OUTPUT = os.getenv('PYQ_TOPICS_PATH', os.path.join(ROOT, 'database', 'pyq_topics.json'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='index file to write')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    db = DatabaseHelper()
+    index = build_topic_index(db.load_subjects(), db.load_pyqs())
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    save_topic_index(index, args.output)
+    for code, stats in index['subjects'].items():
+        top = ', '.join(f"{t['topic']} ({t['occurrences']})" for t in stats['topics'][:3])
+        print(f"{code}: {stats['total_questions']} questions, {len(stats['topics'])} topics, "
+              f"{len(stats['repeated_questions'])} repeated, {stats['unmapped_questions']} unmapped; top: {top}")
+    print(f"Wrote {args.output} in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""Build the TF-IDF retrieval index used to ground chat answers.
+
+Indexes every subject module and its topics, every PYQ question and, when
+SHARED_CACHE_PATH points at a shared cache, the study notes generated so
+far. The app reloads the index file whenever it changes, so this can run
+on a schedule while the server is up.
+
+Usage:
+    python jobs/build_retrieval_index.py
+    python jobs/build_retrieval_index.py --output database/retrieval_index.npz --no-notes
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.database_helper import DatabaseHelper
+from utils.prompt_registry import PromptRegistry
+from utils.retrieval import RetrievalIndex, collect_passages
+from utils.shared_cache import SharedCache
+
+DEFAULT_OUTPUT = os.getenv('RETRIEVAL_INDEX_PATH', os.path.join(ROOT, 'database', 'retrieval_index.npz'))
+
+
+def cached_notes(subjects):
+    """(subject_code, module_label, notes) for each current module with notes in the shared cache"""
+    shared = SharedCache.from_env()
+    if shared is None:
+        return []
+    # Notes generated before a module's name or topics were edited are skipped
+    current = {(code, module.get('module') or module.get('name', 'Module'), PromptRegistry.module_hash(module))
+               for code, info in subjects.items() for module in info.get('modules', [])}
+    notes = {}
+    # Keys are ('notes', prompt version, subject code, module label, module hash)
+    for key, text in shared.items('notes'):
+        if len(key) == 5 and tuple(key[2:]) in current and text:
+            notes[(key[2], key[3])] = text
+    return [(code, label, text) for (code, label), text in sorted(notes.items())]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='index file to write')
+    parser.add_argument('--no-notes', action='store_true', help='skip generated notes from the shared cache')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    db = DatabaseHelper()
+    subjects = db.load_subjects()
+    notes = [] if args.no_notes else cached_notes(subjects)
+    passages = collect_passages(subjects, db.load_pyqs(), notes)
+    index = RetrievalIndex.build(passages)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    index.save(args.output)
+    print(f"Indexed {len(passages)} passages ({len(notes)} notes modules), "
+          f"{len(index.vocabulary)} terms in {time.perf_counter() - start:.2f}s -> {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,14 +9,67 @@ let currentSubjectName = '';
 let currentSubjectCode = '';
 let currentExamType = '';
 let currentMindmap = '';
+let reviewQueue = [];
+let pendingReviews = [];
+// Reviews are sent in batches of this size, and when the session ends
+const REVIEW_BATCH_SIZE = 10;
+// The selected subject is sent for prefetching once typing pauses for this long
+const PREFETCH_DELAY_MS = 600;
+let prefetchTimer = null;
+let prefetchedSelection = '';
 
 // Initialize app
 document.addEventListener('DOMContentLoaded', () => {
     loadResources();
     updateStreak();
     loadSessions();
+    document.getElementById('subject-code').addEventListener('input', signalPrefetch);
+    document.getElementById('exam-type').addEventListener('change', signalPrefetch);
 });
 
+// Offline app shell and cached read-only APIs
+if ('serviceWorker' in navigator) {
+    window.addEventListener('load', () => {
+        navigator.serviceWorker.register('/sw.js').catch(error => console.error('Service worker registration failed:', error));
+    });
+}
+
+// Let the server start generating study material for the selected subject before it is requested
+function signalPrefetch() {
+    clearTimeout(prefetchTimer);
+    prefetchTimer = setTimeout(() => {
+        const subjectCode = document.getElementById('subject-code').value.trim().toUpperCase();
+        const examType = document.getElementById('exam-type').value;
+        if (!subjectCode) {
+            cancelPrefetch();
+            return;
+        }
+        const selection = `${subjectCode}|${examType}`;
+        if (selection === prefetchedSelection) return;
+        prefetchedSelection = selection;
+        // A new selection replaces the previous one on the server
+        fetch('/api/prefetch', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({ user_id: getUserId(), subject_code: subjectCode, exam_type: examType })
+        }).catch(() => {});
+    }, PREFETCH_DELAY_MS);
+}
+
+function cancelPrefetch() {
+    clearTimeout(prefetchTimer);
+    if (!prefetchedSelection) return;
+    prefetchedSelection = '';
+    const body = JSON.stringify({ user_id: getUserId(), cancel: true });
+    if (navigator.sendBeacon) {
+        navigator.sendBeacon('/api/prefetch', body);
+    } else {
+        fetch('/api/prefetch', { method: 'POST', headers: {'Content-Type': 'application/json'}, body, keepalive: true }).catch(() => {});
+    }
+}
+
+window.addEventListener('pagehide', cancelPrefetch);
+
 // Tab switching
 function switchTab(tabName) {
     // Hide all tab contents
@@ -100,33 +153,47 @@ async function generateContent() {
     document.getElementById('loading').classList.remove('hidden');
     
     try {
+        // Show material saved on an earlier visit straight away, then check it is still current
+        const deckKey = `${subjectCode}|${examType}`;
+        const cached = await loadCachedContent(deckKey);
+        if (cached) {
+            showStudyContent(cached);
+            if (cached.mindmap_url) {
+                displayMindmapImage(cached.mindmap_url, document.getElementById('mindmap-content'));
+            } else {
+                displayMermaidMindMap(cached.mindmap, document.getElementById('mindmap-content'));
+            }
+            document.getElementById('notes-content').innerHTML = renderMarkdown(cached.notes);
+            currentNotes = cached.notes;
+            document.getElementById('download-pdf-btn').classList.remove('hidden');
+        }
+        
+        let version = null;
+        try {
+            const versionResult = await apiCall(`/api/study-content-version?subject_code=${encodeURIComponent(subjectCode)}&exam_type=${examType}`);
+            version = versionResult.version;
+        } catch (error) {
+            if (cached) {
+                showNotification(`Offline: showing saved study material for ${cached.subject_name}`, 'success');
+                return;
+            }
+            throw error;
+        }
+        if (cached && cached.version === version) {
+            showNotification(`Loaded saved study material for ${cached.subject_name}`, 'success');
+            return;
+        }
+        
         // First, generate flashcards and mindmap (non-streaming)
         const result = await apiCall('/api/generate-study-content', 'POST', {
             subject_code: subjectCode,
             exam_type: examType
         });
-        
-        // Store for PDF generation
-        currentSubjectName = result.subject_name;
-        currentSubjectCode = result.subject_code;
-        currentExamType = result.exam_type;
-        currentMindmap = result.mindmap;  // Store mindmap code
-        
-        // Update context for chat
-        currentContext = `Subject: ${result.subject_name} (${subjectCode}), Exam: ${examType}`;
-        
-        // Display flashcards in dedicated tab
-        const flashcardsContent = document.getElementById('flashcards-content');
-        displayFlashcards(result.flashcards, flashcardsContent);
-        
-        // Show flashcard count
-        const countBadge = document.getElementById('flashcard-count');
-        countBadge.textContent = `${result.flashcards.length} cards`;
-        countBadge.classList.remove('hidden');
+        showStudyContent(result);
         
         // Display mind map using Mermaid.js in dedicated tab
         const mindmapContent = document.getElementById('mindmap-content');
-        displayMermaidMindMap(result.mindmap, mindmapContent);
+        const mindmapUrl = displayMermaidMindMap(result.mindmap, mindmapContent);
         
         // Now stream the study notes to dedicated tab
         const notesContent = document.getElementById('notes-content');
@@ -187,6 +254,20 @@ async function generateContent() {
         // Show download button in Notes tab
         document.getElementById('download-pdf-btn').classList.remove('hidden');
         
+        saveCachedContent({
+            key: `${deckKey}|${version}`,
+            deck_key: deckKey,
+            version: version,
+            subject_name: result.subject_name,
+            subject_code: result.subject_code,
+            exam_type: result.exam_type,
+            flashcards: result.flashcards,
+            mindmap: result.mindmap,
+            mindmap_url: await mindmapUrl,
+            notes: fullNotes,
+            saved_at: Date.now()
+        });
+        
         showNotification(`Study material generated for ${result.subject_name}! Check the Notes, Flashcards, and Mind Map tabs.`, 'success');
     } catch (error) {
         console.error('Error generating content:', error);
@@ -196,6 +277,80 @@ async function generateContent() {
     }
 }
 
+// Show generated flashcards and remember the subject for chat, PDF export and reviews
+function showStudyContent(result) {
+    currentSubjectName = result.subject_name;
+    currentSubjectCode = result.subject_code;
+    currentExamType = result.exam_type;
+    currentMindmap = result.mindmap;  // Store mindmap code
+    
+    // Update context for chat
+    currentContext = `Subject: ${result.subject_name} (${result.subject_code}), Exam: ${result.exam_type}`;
+    
+    // Display flashcards in dedicated tab
+    const flashcardsContent = document.getElementById('flashcards-content');
+    displayFlashcards(result.flashcards, flashcardsContent);
+    
+    // Show flashcard count
+    const flashcards = typeof result.flashcards === 'string' ? JSON.parse(result.flashcards) : result.flashcards;
+    const countBadge = document.getElementById('flashcard-count');
+    countBadge.textContent = `${flashcards.length} cards`;
+    countBadge.classList.remove('hidden');
+    
+    // Keep every card for this subject in the spaced-repetition deck
+    addToDeck(result.subject_code, result.exam_type);
+}
+
+// Generated study material is kept in IndexedDB, one record per subject and exam,
+// keyed by the server's content version so a new prompt or syllabus replaces it
+const CONTENT_DB_NAME = 'study-assistant';
+const CONTENT_STORE = 'content';
+
+function openContentDb() {
+    return new Promise((resolve, reject) => {
+        if (!window.indexedDB) {
+            reject(new Error('IndexedDB is not available'));
+            return;
+        }
+        const request = indexedDB.open(CONTENT_DB_NAME, 1);
+        request.onupgradeneeded = () => {
+            const store = request.result.createObjectStore(CONTENT_STORE, {keyPath: 'key'});
+            store.createIndex('deck_key', 'deck_key');
+        };
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => reject(request.error);
+    });
+}
+
+// Latest saved record for a subject and exam, whatever its version
+async function loadCachedContent(deckKey) {
+    try {
+        const db = await openContentDb();
+        return await new Promise((resolve, reject) => {
+            const request = db.transaction(CONTENT_STORE).objectStore(CONTENT_STORE).index('deck_key').getAll(deckKey);
+            request.onsuccess = () => resolve(request.result.sort((a, b) => b.saved_at - a.saved_at)[0] || null);
+            request.onerror = () => reject(request.error);
+        });
+    } catch (error) {
+        console.error('Error reading saved study material:', error);
+        return null;
+    }
+}
+
+async function saveCachedContent(record) {
+    try {
+        const db = await openContentDb();
+        const store = db.transaction(CONTENT_STORE, 'readwrite').objectStore(CONTENT_STORE);
+        // Drop older versions for the same subject and exam
+        store.index('deck_key').getAllKeys(record.deck_key).onsuccess = event => {
+            event.target.result.filter(key => key !== record.key).forEach(key => store.delete(key));
+            store.put(record);
+        };
+    } catch (error) {
+        console.error('Error saving study material:', error);
+    }
+}
+
 // Render markdown-like content
 function renderMarkdown(text) {
     // Enhanced markdown rendering with table support
@@ -294,6 +449,129 @@ function flipCard(index) {
     card.classList.toggle('flipped');
 }
 
+// Spaced repetition: add the subject's cards to this browser's deck
+async function addToDeck(subjectCode, examType) {
+    try {
+        const result = await apiCall('/api/flashcards/deck', 'POST', {
+            user_id: getUserId(),
+            subject_code: subjectCode,
+            exam_type: examType
+        });
+        updateReviewButton(result.stats);
+    } catch (error) {
+        console.error('Error adding flashcards to deck:', error);
+    }
+}
+
+function updateReviewButton(stats) {
+    const button = document.getElementById('review-due-btn');
+    button.textContent = `🔁 Review Due (${stats.due})`;
+    button.classList.toggle('hidden', stats.total === 0);
+}
+
+async function startReview() {
+    if (!currentSubjectCode) {
+        return;
+    }
+    try {
+        await flushReviews();
+        const result = await apiCall(`/api/flashcards/due?user_id=${encodeURIComponent(getUserId())}&subject_code=${currentSubjectCode}&limit=20`);
+        reviewQueue = result.cards;
+        updateReviewButton(result.stats);
+        showReviewCard();
+    } catch (error) {
+        showNotification('Error loading due flashcards', 'error');
+    }
+}
+
+function showReviewCard() {
+    const container = document.getElementById('flashcards-content');
+    if (reviewQueue.length === 0) {
+        container.innerHTML = '<p class="placeholder">🎉 No cards due right now. Come back later!</p>';
+        flushReviews();
+        return;
+    }
+    const card = reviewQueue[0];
+    container.innerHTML = `
+        <div class="flashcard" onclick="this.classList.add('flipped')">
+            <h4></h4>
+            <div class="flashcard-question"></div>
+            <div class="flashcard-answer"></div>
+            <div class="flashcard-hint">Click to show the answer, then rate how well you knew it</div>
+        </div>
+        <div class="review-grades">
+            <button class="btn-primary" onclick="gradeCard(1)">Again</button>
+            <button class="btn-primary" onclick="gradeCard(3)">Hard</button>
+            <button class="btn-primary" onclick="gradeCard(4)">Good</button>
+            <button class="btn-primary" onclick="gradeCard(5)">Easy</button>
+        </div>
+    `;
+    // Card text comes from the model or the user, so it is set as text, never parsed as HTML
+    container.querySelector('.flashcard h4').textContent = `${card.module} · ${reviewQueue.length} left`;
+    container.querySelector('.flashcard-question').textContent = card.question;
+    container.querySelector('.flashcard-answer').textContent = card.answer;
+}
+
+function gradeCard(grade) {
+    const card = reviewQueue.shift();
+    pendingReviews.push({card_id: card.id, grade: grade, reviewed_at: Date.now() / 1000});
+    if (pendingReviews.length >= REVIEW_BATCH_SIZE) {
+        flushReviews();
+    }
+    showReviewCard();
+}
+
+async function flushReviews() {
+    if (pendingReviews.length === 0) {
+        return;
+    }
+    const reviews = pendingReviews;
+    pendingReviews = [];
+    try {
+        const result = await apiCall('/api/flashcards/review', 'POST', {
+            user_id: getUserId(),
+            subject_code: currentSubjectCode,
+            reviews: reviews
+        });
+        updateReviewButton(result.stats);
+    } catch (error) {
+        // Keep them for the next batch
+        pendingReviews = reviews.concat(pendingReviews);
+    }
+}
+
+// Send reviews still waiting for a batch when the page is closed
+window.addEventListener('pagehide', () => {
+    if (pendingReviews.length > 0 && navigator.sendBeacon) {
+        navigator.sendBeacon('/api/flashcards/review', JSON.stringify({
+            user_id: getUserId(),
+            subject_code: currentSubjectCode,
+            reviews: pendingReviews
+        }));
+        pendingReviews = [];
+    }
+});
+
+// Show a rendered mind map; its URL is content-addressed, so the service worker can serve it offline
+function displayMindmapImage(url, container) {
+    container.innerHTML = `
+        <div style="width: 100%; display: flex; justify-content: center; align-items: center; padding: 20px;">
+            <img 
+                src="${url}" 
+                alt="Mind Map - High Quality" 
+                style="
+                    max-width: 100%; 
+                    height: auto; 
+                    border-radius: 10px; 
+                    box-shadow: 0 4px 20px rgba(0,0,0,0.3);
+                    image-rendering: -webkit-optimize-contrast;
+                    image-rendering: crisp-edges;
+                " 
+            />
+        </div>
+    `;
+}
+
 // Display mind map using server-side rendering to image
 async function displayMermaidMindMap(mermaidCode, container) {
     try {
@@ -332,24 +610,10 @@ async function displayMermaidMindMap(mermaidCode, container) {
         }
         
         // Display the HIGH-QUALITY image
-        container.innerHTML = `
-            <div style="width: 100%; display: flex; justify-content: center; align-items: center; padding: 20px;">
-                <img 
-                    src="${result.image}" 
-                    alt="Mind Map - High Quality" 
-                    style="
-                        max-width: 100%; 
-                        height: auto; 
-                        border-radius: 10px; 
-                        box-shadow: 0 4px 20px rgba(0,0,0,0.3);
-                        image-rendering: -webkit-optimize-contrast;
-                        image-rendering: crisp-edges;
-                    " 
-                />
-            </div>
-        `;
+        displayMindmapImage(result.url, container);
         
         console.log('Mind map image displayed successfully');
+        return result.url;
     } catch (error) {
         console.error('Error rendering mind map:', error);
         console.error('Mermaid code was:', mermaidCode);
@@ -413,20 +677,21 @@ async function downloadPDF() {
         const originalText = downloadBtn.textContent;
         downloadBtn.textContent = '⏳ Generating PDF...';
         
+        // Notes go as a file part so the server can parse them line by line
+        const form = new FormData();
+        form.append('subject_name', currentSubjectName);
+        form.append('exam_type', currentExamType);
+        form.append('subject_code', currentSubjectCode);
+        form.append('mindmap', currentMindmap);  // Include mindmap code
+        form.append('notes', new Blob([currentNotes], { type: 'text/markdown' }), 'notes.md');
+        
         const response = await fetch('/api/download-pdf', {
             method: 'POST',
-            headers: {'Content-Type': 'application/json'},
-            body: JSON.stringify({
-                notes: currentNotes,
-                subject_name: currentSubjectName,
-                exam_type: currentExamType,
-                subject_code: currentSubjectCode,
-                mindmap: currentMindmap  // Include mindmap code
-            })
+            body: form
         });
         
         if (!response.ok) {
-            throw new Error('Failed to generate PDF');
+            throw new Error(response.status === 413 ? 'Notes are too large to export' : 'Failed to generate PDF');
         }
         
         // Create a blob from the response
@@ -492,6 +757,7 @@ async function sendMessage() {
             body: JSON.stringify({
                 message: message,
                 context: currentContext,
+                subject_code: currentSubjectCode,
                 chat_history: chatHistory.slice(-5).join('\n')
             })
         });
@@ -740,11 +1006,29 @@ function timerComplete() {
     }
 }
 
+// Anonymous id that keys this browser's sessions on the server
+function getUserId() {
+    let userId = localStorage.getItem('study_user_id');
+    if (!userId) {
+        userId = (window.crypto && crypto.randomUUID) ? crypto.randomUUID()
+            : Date.now().toString(36) + Math.random().toString(36).slice(2);
+        localStorage.setItem('study_user_id', userId);
+    }
+    return userId;
+}
+
+// Local calendar date (YYYY-MM-DD), so daily totals follow the student's own day
+function localDay(date = new Date()) {
+    return `${date.getFullYear()}-${String(date.getMonth() + 1).padStart(2, '0')}-${String(date.getDate()).padStart(2, '0')}`;
+}
+
 async function saveSession(duration) {
     try {
         const result = await apiCall('/api/save-session', 'POST', {
+            user_id: getUserId(),
             duration: duration,
             timestamp: new Date().toISOString(),
+            day: localDay(),
             subject: currentContext || 'General Study'
         });
         
@@ -763,9 +1047,18 @@ async function saveSession(duration) {
     }
 }
 
-function loadSessions() {
-    const sessions = JSON.parse(localStorage.getItem('study_sessions') || '[]');
-    sessions.slice(-10).reverse().forEach(session => {
+async function loadSessions() {
+    let sessions;
+    try {
+        const response = await fetch(`/api/get-sessions?user_id=${encodeURIComponent(getUserId())}&limit=10`);
+        const result = await response.json();
+        if (!result.success) throw new Error(result.error);
+        sessions = result.sessions.reverse();
+    } catch (error) {
+        // Fall back to the copy kept in this browser
+        sessions = JSON.parse(localStorage.getItem('study_sessions') || '[]').slice(-10);
+    }
+    sessions.forEach(session => {
         addSessionToList(session);
     });
 }
@@ -796,7 +1089,19 @@ function addSessionToList(session) {
     sessionsList.insertBefore(sessionDiv, sessionsList.firstChild);
 }
 
-function updateStreak() {
+async function updateStreak() {
+    try {
+        const params = new URLSearchParams({ user_id: getUserId(), today: localDay(), days: 1, weeks: 1 });
+        const response = await fetch(`/api/session-stats?${params}`);
+        const result = await response.json();
+        if (result.success) {
+            document.getElementById('streak-count').textContent = `${result.streak} day${result.streak !== 1 ? 's' : ''}`;
+            return;
+        }
+    } catch (error) {
+        console.error('Error loading session stats:', error);
+    }
+    
     const sessions = JSON.parse(localStorage.getItem('study_sessions') || '[]');
     
     if (sessions.length === 0) {
@@ -895,6 +1200,99 @@ async function downloadPYQ() {
     }
 }
 
+// Download every PYQ for one or more comma-separated subjects as a single zip
+async function downloadAllPYQs() {
+    const subjectCodes = document.getElementById('pyq-subject').value.trim().toUpperCase();
+    const year = document.getElementById('pyq-year').value;
+    const displayDiv = document.getElementById('pyq-display');
+    
+    if (!subjectCodes) {
+        showNotification('Please enter a subject code', 'error');
+        return;
+    }
+    
+    displayDiv.innerHTML = '<p class="placeholder">Collecting PYQs...</p>';
+    
+    try {
+        const params = new URLSearchParams({ subject_code: subjectCodes });
+        if (year) {
+            params.set('year_from', year);
+            params.set('year_to', year);
+        }
+        const response = await fetch(`/api/download-pyqs?${params}`);
+        
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.error || 'PYQs not found');
+        }
+        
+        const count = response.headers.get('X-PYQ-Count');
+        const blob = await response.blob();
+        const url = window.URL.createObjectURL(blob);
+        const a = document.createElement('a');
+        a.href = url;
+        a.download = `${subjectCodes.replace(/\s*,\s*/g, '_')}_PYQs.zip`;
+        document.body.appendChild(a);
+        a.click();
+        window.URL.revokeObjectURL(url);
+        document.body.removeChild(a);
+        
+        displayDiv.innerHTML = `
+            <div style="background: var(--success); color: white; padding: 15px; border-radius: 10px; text-align: center;">
+                <p style="margin: 0; font-weight: 600;">✓ Downloaded ${count} file${count === '1' ? '' : 's'}</p>
+                <p style="margin: 5px 0 0 0; font-size: 0.9rem;">${subjectCodes}${year ? ' - ' + year : ''}</p>
+            </div>
+        `;
+        
+        showNotification(`PYQs downloaded: ${subjectCodes}`, 'success');
+    } catch (error) {
+        console.error('Error downloading PYQs:', error);
+        displayDiv.innerHTML = `
+            <div style="background: var(--error); color: white; padding: 15px; border-radius: 10px; text-align: center;">
+                <p style="margin: 0; font-weight: 600;">✗ Not Found</p>
+                <p style="margin: 5px 0 0 0; font-size: 0.9rem;">${error.message}</p>
+            </div>
+        `;
+        showNotification(error.message, 'error');
+    }
+}
+
+// Show which syllabus topics previous papers asked about most
+async function showTopicFrequencies() {
+    const subjectCode = document.getElementById('pyq-subject').value.trim().toUpperCase();
+    const displayDiv = document.getElementById('pyq-display');
+    
+    if (!subjectCode) {
+        showNotification('Please enter a subject code', 'error');
+        return;
+    }
+    
+    try {
+        const result = await apiCall(`/api/pyq-topics?subject_code=${encodeURIComponent(subjectCode)}`);
+        
+        let html = `<div class="pyq-section"><h4>Most Asked Topics - ${result.subject_name}</h4>`;
+        result.topics.forEach(topic => {
+            html += `<div class="pyq-year">`;
+            html += `<h5>${topic.topic} <span class="resource-category">${topic.module}</span></h5>`;
+            html += `<p>Asked ${topic.occurrences} time${topic.occurrences === 1 ? '' : 's'} in ${topic.years.join(', ')}</p>`;
+            topic.examples.forEach(q => {
+                html += `<div class="pyq-question">${q}</div>`;
+            });
+            html += `</div>`;
+        });
+        if (result.repeated_questions.length) {
+            html += `<h4>Repeated Across Years</h4>`;
+            result.repeated_questions.forEach(r => {
+                html += `<div class="pyq-question">${r.question} (${r.years.join(', ')})</div>`;
+            });
+        }
+        html += '</div>';
+        displayDiv.innerHTML = html;
+    } catch (error) {
+        displayDiv.innerHTML = '<p class="placeholder">No PYQs found for this subject</p>';
+    }
+}
+
 // Old fetchPYQs function (kept for compatibility)
 async function fetchPYQs() {
     const subjectCode = document.getElementById('pyq-subject').value.trim().toUpperCase();
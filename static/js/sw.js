@@ -0,0 +1,77 @@
+// Service worker: offline app shell plus stale-while-revalidate for read-only APIs.
+// Generated study content itself is kept in IndexedDB by script.js.
+const CACHE_VERSION = 'v2';
+// /sw.js prepends the hash of the current asset build, so each build gets a fresh shell cache
+// and activate deletes the one holding the previous build's fingerprinted files
+const SHELL_CACHE = `shell-${CACHE_VERSION}-${self.ASSET_VERSION || ''}`;
+const API_CACHE = `api-${CACHE_VERSION}`;
+// Page scripts and styles are fingerprinted under /assets/ and cached as the page loads them
+const SHELL_URLS = ['/'];
+
+// Read-only GET APIs answered from cache first and refreshed in the background;
+// the refresh is a conditional request, so unchanged data costs a 304
+const REVALIDATE_PREFIXES = [
+    '/api/subjects', '/api/get-pyqs', '/api/get-resources', '/api/pyq-topics', '/api/download-pyq/'
+];
+// Content-addressed and never changed under the same URL
+const IMMUTABLE_PREFIXES = ['/api/mindmap-image/'];
+const ASSET_PREFIX = '/assets/';
+
+self.addEventListener('install', event => {
+    event.waitUntil(caches.open(SHELL_CACHE).then(cache => cache.addAll(SHELL_URLS)).then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(keys.filter(key => key !== SHELL_CACHE && key !== API_CACHE)
+                .map(key => caches.delete(key))))
+            .then(() => self.clients.claim())
+    );
+});
+
+function staleWhileRevalidate(event, cacheName) {
+    const refresh = caches.open(cacheName).then(cache =>
+        fetch(event.request).then(response => {
+            if (response.ok) {
+                cache.put(event.request, response.clone());
+            }
+            return response;
+        })
+    );
+    event.waitUntil(refresh.catch(() => {}));
+    return caches.match(event.request).then(cached => cached || refresh);
+}
+
+function cacheFirst(event, cacheName) {
+    return caches.match(event.request).then(cached => cached || fetch(event.request).then(response => {
+        if (response.ok) {
+            const copy = response.clone();
+            caches.open(cacheName).then(cache => cache.put(event.request, copy));
+        }
+        return response;
+    }));
+}
+
+self.addEventListener('fetch', event => {
+    const url = new URL(event.request.url);
+    if (event.request.method !== 'GET' || url.origin !== self.location.origin) {
+        return;
+    }
+    if (url.pathname.startsWith(ASSET_PREFIX)) {
+        event.respondWith(cacheFirst(event, SHELL_CACHE));
+    } else if (IMMUTABLE_PREFIXES.some(prefix => url.pathname.startsWith(prefix))) {
+        event.respondWith(cacheFirst(event, API_CACHE));
+    } else if (REVALIDATE_PREFIXES.some(prefix => url.pathname.startsWith(prefix))) {
+        event.respondWith(staleWhileRevalidate(event, API_CACHE));
+    } else if (event.request.mode === 'navigate' || url.pathname.startsWith('/static/')) {
+        // The page and unfingerprinted static files come from the network when it is reachable
+        event.respondWith(fetch(event.request).then(response => {
+            if (response.ok) {
+                const copy = response.clone();
+                caches.open(SHELL_CACHE).then(cache => cache.put(event.request, copy));
+            }
+            return response;
+        }).catch(() => caches.match(event.request).then(cached => cached || caches.match('/'))));
+    }
+});
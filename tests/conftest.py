@@ -0,0 +1,35 @@
+import os
+import sys
+
+# The fake backend needs no API key; set before app or utils.gemini_helper is imported
+os.environ.setdefault('MODEL_BACKEND', 'fake')
+# The fake backend has no upstream quota to respect
+os.environ.setdefault('GEMINI_REQUESTS_PER_MINUTE', '0')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import app as app_module
+import utils.gemini_helper
+
+
+@pytest.fixture(autouse=True)
+def temp_stores(tmp_path, monkeypatch):
+    """Point every database and generated file the app writes at a per-test temp dir"""
+    monkeypatch.setattr(app_module, 'SESSIONS_DB', str(tmp_path / 'sessions.sqlite3'))
+    monkeypatch.setattr(app_module, 'FLASHCARDS_DB', str(tmp_path / 'flashcards.sqlite3'))
+    monkeypatch.setattr(app_module, 'RETRIEVAL_INDEX_PATH', str(tmp_path / 'retrieval_index.npz'))
+    monkeypatch.setattr(app_module, 'PYQ_TOPICS_PATH', str(tmp_path / 'pyq_topics.json'))
+    monkeypatch.setattr(utils.gemini_helper, 'MINDMAP_IMAGE_DIR', str(tmp_path / 'mindmaps'))
+    monkeypatch.delenv('SHARED_CACHE_PATH', raising=False)
+    monkeypatch.delenv('METRICS_DIR', raising=False)
+    return tmp_path
+
+
+@pytest.fixture
+def app():
+    return app_module.create_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
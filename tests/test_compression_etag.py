@@ -0,0 +1,30 @@
+import pytest
+
+
+def test_each_encoding_gets_its_own_etag(client):
+    identity = client.get('/sw.js', headers={'Accept-Encoding': 'identity'})
+    gzipped = client.get('/sw.js', headers={'Accept-Encoding': 'gzip'})
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Encoding' not in identity.headers
+    assert gzipped.headers['ETag'] == identity.headers['ETag'][:-1] + '-gzip"'
+
+
+@pytest.mark.parametrize('encoding', ['identity', 'gzip'])
+def test_revalidating_with_the_variant_etag_returns_304(client, encoding):
+    etag = client.get('/sw.js', headers={'Accept-Encoding': encoding}).headers['ETag']
+    response = client.get('/sw.js', headers={'Accept-Encoding': encoding, 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+
+def test_gzip_etag_does_not_validate_the_identity_body(client):
+    etag = client.get('/sw.js', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+    assert client.get('/sw.js', headers={'Accept-Encoding': 'identity', 'If-None-Match': etag}).status_code == 200
+
+
+def test_fingerprinted_assets_use_variant_etags(client):
+    url = '/assets/' + client.application.extensions['assets'].assets['css/style.css'].hashed_name
+    gzipped = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert gzipped.headers['ETag'].endswith('-gzip"')
+    assert client.get(url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': gzipped.headers['ETag']}).status_code == 304
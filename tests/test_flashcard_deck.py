@@ -0,0 +1,112 @@
+import json
+
+import pytest
+from utils.flashcard_deck import DAY_SECONDS, RELEARN_SECONDS, DueQueue, FlashcardDeck, card_text, sm2
+from utils.gemini_helper import GeminiHelper
+from utils.model_backends import FakeChunk
+
+CARDS = [{'question': f'Q{i}', 'answer': f'A{i}'} for i in range(5)]
+
+
+@pytest.fixture
+def deck(tmp_path):
+    return FlashcardDeck(str(tmp_path / 'flashcards.sqlite3'))
+
+
+def test_sm2_intervals_grow_and_failures_reset():
+    ease, interval, reps = sm2(2.5, 0.0, 0, 5)
+    assert (interval, reps) == (1.0, 1)
+    ease, interval, reps = sm2(ease, interval, reps, 4)
+    assert (interval, reps) == (6.0, 2)
+    ease, interval, reps = sm2(ease, interval, reps, 4)
+    assert interval == pytest.approx(6.0 * ease)
+    assert sm2(ease, interval, reps, 1)[1:] == (0.0, 0)
+    assert sm2(1.3, 1.0, 1, 0)[0] == 1.3
+
+
+def test_due_queue_peeks_most_overdue_first_and_skips_stale_entries():
+    queue = DueQueue([(30, 1), (10, 2), (20, 3)], version=1)
+    queue.push(2, 50)
+    assert queue.peek(10, now=40) == [3, 1]
+    assert queue.peek(1, now=40) == [3]
+    assert len(queue) == 3
+
+
+def test_add_cards_skips_duplicates_and_blank_cards(deck):
+    assert deck.add_cards('u1', 'CS301', 'Module 1', CARDS, now=0) == 5
+    assert deck.add_cards('u1', 'CS301', 'Module 1', CARDS + [{'question': ' ', 'answer': 'x'}], now=0) == 0
+    assert deck.add_cards('u2', 'CS301', 'Module 1', CARDS[:2], now=0) == 2
+    assert deck.stats('u1', 'CS301', now=0) == {'total': 5, 'new': 5, 'due': 5}
+
+
+MALFORMED_CARDS = [
+    {'question': 42, 'answer': 'The answer'},
+    {'question': 'Null answer?', 'answer': None},
+    {'question': {'text': 'Nested?'}, 'answer': 'x'},
+    {'question': 'Listed answer?', 'answer': ['a', 'b']},
+    {'question': 'Boolean answer?', 'answer': True},
+    'not a card',
+    {'question': '  Plain?  ', 'answer': 3.5},
+]
+
+
+class MalformedCardsBackend:
+    def generate_content(self, prompt, stream=False):
+        return FakeChunk('```json\n' + json.dumps(MALFORMED_CARDS) + '\n```')
+
+
+@pytest.mark.parametrize('value, text', [(' Q ', 'Q'), (42, '42'), (3.5, '3.5'), (None, ''), (True, ''),
+                                         ({'a': 1}, ''), (['a'], '')])
+def test_card_text_keeps_only_strings_and_numbers(value, text):
+    assert card_text(value) == text
+
+
+def test_add_cards_skips_cards_without_text_instead_of_failing(deck):
+    assert deck.add_cards('u1', 'CS301', 'Module 1', MALFORMED_CARDS, now=0) == 2
+    assert sorted(c['question'] for c in deck.due_cards('u1', 'CS301', now=0)) == ['42', 'Plain?']
+
+
+def test_generated_flashcards_drop_malformed_cards():
+    gemini = GeminiHelper(backend=MalformedCardsBackend())
+    cards = gemini._generate_module_flashcards('CS301', {'name': 'DBMS'}, {'module': 'Module 1', 'name': 'ER'})
+    assert cards == [{'question': '42', 'answer': 'The answer'}, {'question': 'Plain?', 'answer': '3.5'}]
+
+
+def test_reviews_reschedule_cards(deck):
+    deck.add_cards('u1', 'CS301', 'Module 1', CARDS, now=0)
+    cards = deck.due_cards('u1', 'CS301', limit=10, now=0)
+    assert len(cards) == 5
+    passed, failed = cards[0]['id'], cards[1]['id']
+    applied = deck.review('u1', 'CS301', [{'card_id': passed, 'grade': 5, 'reviewed_at': 100},
+                                          {'card_id': failed, 'grade': 1, 'reviewed_at': 100},
+                                          {'card_id': 9999, 'grade': 5}], now=100)
+    assert applied == 2
+    due_now = [c['id'] for c in deck.due_cards('u1', 'CS301', limit=10, now=100)]
+    assert passed not in due_now and failed not in due_now
+    assert failed in [c['id'] for c in deck.due_cards('u1', 'CS301', now=100 + RELEARN_SECONDS)]
+    assert passed in [c['id'] for c in deck.due_cards('u1', 'CS301', now=100 + DAY_SECONDS)]
+    assert deck.stats('u1', 'CS301', now=100) == {'total': 5, 'new': 3, 'due': 3}
+
+
+def test_queue_is_rebuilt_after_another_process_changes_the_deck(deck, tmp_path):
+    deck.add_cards('u1', 'CS301', 'Module 1', CARDS[:2], now=0)
+    assert len(deck.due_cards('u1', 'CS301', now=0)) == 2
+    # A second store on the same file stands in for another worker
+    FlashcardDeck(deck.path).add_cards('u1', 'CS301', 'Module 2', CARDS[2:], now=0)
+    assert len(deck.due_cards('u1', 'CS301', now=0)) == 5
+
+
+def test_deck_routes_add_serve_and_review_cards(client):
+    added = client.post('/api/flashcards/deck', json={'user_id': 'u1', 'subject_code': 'CS301',
+                                                      'exam_type': 'internal1'}).get_json()
+    assert added['success'] and added['added'] > 0
+    due = client.get('/api/flashcards/due?user_id=u1&subject_code=CS301&limit=3').get_json()
+    assert len(due['cards']) == 3
+    reviewed = client.post('/api/flashcards/review', json={
+        'user_id': 'u1', 'subject_code': 'CS301',
+        'reviews': [{'card_id': card['id'], 'grade': 4} for card in due['cards']]}).get_json()
+    assert reviewed['applied'] == 3
+    assert reviewed['stats']['due'] == added['stats']['due'] - 3
+    bad = client.post('/api/flashcards/review', json={'user_id': 'u1', 'subject_code': 'CS301',
+                                                      'reviews': [{'grade': 4}]})
+    assert bad.status_code == 400
@@ -0,0 +1,57 @@
+import pytest
+from utils.gemini_helper import GeminiHelper
+from utils.mermaid_mindmap import MAX_REPAIRS, MindmapError, normalize_mindmap, repair_mindmap
+from utils.model_backends import FakeChunk
+
+CLEAN = 'mindmap\n  root((Data Structures))\n    Trees\n      BST\n    Sorting'
+SUBJECT = {'name': 'Data Structures', 'modules': [{'module': 'Module: 1', 'name': 'Trees', 'topics': ['BST']}]}
+
+
+@pytest.mark.parametrize('text', ['Hello', 'I cannot draw diagrams, but trees are hierarchical structures.',
+                                  'Trees\n  BST\n  AVL', '', '```\n```'])
+def test_text_without_header_or_root_node_is_rejected(text):
+    with pytest.raises(MindmapError):
+        repair_mindmap(text)
+
+
+def test_clean_diagram_needs_no_repairs():
+    canonical, repairs = repair_mindmap(CLEAN)
+    assert repairs == []
+    assert canonical == 'mindmap\n  n1((Data Structures))\n    Trees\n      BST\n    Sorting'
+
+
+def test_repairs_are_reported():
+    text = 'Here is your mind map:\n```mermaid\n' + CLEAN + '\n  Graphs\n```'
+    canonical, repairs = repair_mindmap(text)
+    assert repairs == ['dropped text before the mindmap header', "moved second root 'Graphs' under the root"]
+    assert canonical == normalize_mindmap(CLEAN + '\n    Graphs')
+    assert repair_mindmap('root((DS))\n  Arrays')[1] == ['added missing mindmap header']
+
+
+def test_prose_after_a_header_needs_too_many_repairs():
+    prose = 'mindmap\n' + '\n'.join(f'Sentence {i} of an answer.' for i in range(MAX_REPAIRS + 2))
+    with pytest.raises(MindmapError, match='repairs'):
+        repair_mindmap(prose)
+
+
+class ScriptedBackend:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def generate_content(self, prompt, stream=False):
+        self.calls += 1
+        return FakeChunk(self.responses[min(self.calls, len(self.responses)) - 1])
+
+
+def test_rejected_generation_is_asked_for_again():
+    backend = ScriptedBackend('Sorry, here is some prose instead.', CLEAN)
+    assert GeminiHelper(backend=backend)._generate_mindmap('CS301', 'semester', SUBJECT) == normalize_mindmap(CLEAN)
+    assert backend.calls == 2
+
+
+def test_unusable_generations_fall_back_to_the_syllabus():
+    backend = ScriptedBackend('Hello')
+    mindmap = GeminiHelper(backend=backend).generate_mindmap('CS301', 'semester', SUBJECT)
+    assert backend.calls == 2
+    assert mindmap.splitlines()[:3] == ['mindmap', '  n1((Data Structures))', '    Trees']
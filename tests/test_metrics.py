@@ -0,0 +1,94 @@
+import json
+import os
+import pytest
+from utils.metrics import MetricsRegistry, clear_directory
+
+
+def worker_registry():
+    """A registry with one metric of each kind, standing in for one worker's"""
+    registry = MetricsRegistry()
+    registry.requests = registry.counter('requests_total', 'Requests', ('route',))
+    registry.latency = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+    registry.streams = registry.gauge('open_streams', 'Open streams')
+    registry.info = registry.gauge('template_info', 'Template version', ('version',), aggregate='max')
+    return registry
+
+
+def write_worker(directory, pid, registry):
+    with open(os.path.join(directory, f'{pid}.json'), 'w', encoding='utf-8') as f:
+        json.dump(registry.snapshot(), f)
+
+
+@pytest.fixture
+def metrics_dir(tmp_path, monkeypatch):
+    directory = tmp_path / 'metrics'
+    monkeypatch.setenv('METRICS_DIR', str(directory))
+    return str(directory)
+
+
+def sample(text, line_start):
+    return [line for line in text.splitlines() if line.startswith(line_start)]
+
+
+def test_without_directory_renders_only_this_process():
+    registry = worker_registry()
+    registry.requests.labels(route='home').inc(2)
+    assert sample(registry.render(), 'requests_total{') == ['requests_total{route="home"} 2']
+
+
+def test_scrape_adds_up_every_worker(metrics_dir):
+    local, other = worker_registry(), worker_registry()
+    local.requests.labels(route='home').inc(2)
+    local.latency.observe(0.05)
+    local.streams.inc()
+    local.info.labels(version='abc').set(1)
+    other.requests.labels(route='home').inc(3)
+    other.requests.labels(route='pdf').inc()
+    other.latency.observe(0.5)
+    other.streams.inc(2)
+    other.info.labels(version='abc').set(1)
+    os.makedirs(metrics_dir)
+    write_worker(metrics_dir, 999999, other)
+
+    text = local.render()
+    assert sample(text, 'requests_total{') == ['requests_total{route="home"} 5', 'requests_total{route="pdf"} 1']
+    assert sample(text, 'latency_seconds_bucket') == [
+        'latency_seconds_bucket{le="0.1"} 1', 'latency_seconds_bucket{le="1"} 2', 'latency_seconds_bucket{le="+Inf"} 2']
+    assert sample(text, 'latency_seconds_count') == ['latency_seconds_count 2']
+    assert sample(text, 'open_streams ') == ['open_streams 3']
+    # Values every worker sets alike are not multiplied by the worker count
+    assert sample(text, 'template_info{') == ['template_info{version="abc"} 1']
+    # The answering worker left its own snapshot for the others' scrapes
+    assert os.path.exists(os.path.join(metrics_dir, f'{os.getpid()}.json'))
+
+
+def test_exited_worker_keeps_counters_but_not_gauges(metrics_dir):
+    local, retired = worker_registry(), worker_registry()
+    retired.requests.labels(route='home').inc(4)
+    retired.streams.inc(2)
+    os.makedirs(metrics_dir)
+    write_worker(metrics_dir, 999999, retired)
+
+    local.mark_process_dead(999999)
+    assert not os.path.exists(os.path.join(metrics_dir, '999999.json'))
+    text = local.render()
+    assert sample(text, 'requests_total{') == ['requests_total{route="home"} 4']
+    assert sample(text, 'open_streams ') == ['open_streams 0']
+
+
+def test_clear_directory_drops_an_earlier_run(metrics_dir):
+    local, stale = worker_registry(), worker_registry()
+    stale.requests.labels(route='home').inc(7)
+    os.makedirs(metrics_dir)
+    write_worker(metrics_dir, 999999, stale)
+
+    clear_directory()
+    assert sample(local.render(), 'requests_total{') == []
+
+
+def test_app_metrics_route_aggregates(client, metrics_dir):
+    client.get('/metrics')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert os.listdir(metrics_dir) == [f'{os.getpid()}.json']
+    assert b'http_request_duration_seconds' in response.data
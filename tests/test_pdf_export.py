@@ -0,0 +1,76 @@
+import io
+import re
+
+import pytest
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import KeepTogether, PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table
+from utils.gemini_helper import (MINDMAP_RENDER_VARIANT, PDF_FLOWABLE_LOOKAHEAD, PDF_MINDMAP_RASTER_WIDTH,
+                                 GeminiHelper, _FlowableStream)
+from utils.image_store import ImageStore
+from utils.mermaid_mindmap import normalize_mindmap
+
+MINDMAP = 'mindmap\n  root((Data Structures))\n    Arrays\n      Searching\n    Trees\n      BST'
+PAGE = re.compile(rb'/Type /Page\b(?!s)')
+
+
+def story(keep_with_next=1):
+    styles = getSampleStyleSheet()
+    heading = styles['Heading2'].clone('KeptHeading', keepWithNext=keep_with_next)
+    for section in range(12):
+        # Two headings kept with the paragraph after them, so the layout scans ahead three flowables
+        yield Paragraph(f'Section {section}', heading)
+        yield Paragraph(f'Introduction to section {section}', heading)
+        for n in range(3 + section % 5):
+            yield Paragraph(f'Paragraph {n} of section {section}. ' * (5 + 3 * n), styles['BodyText'])
+        # Long enough to split across pages, repeating its header row
+        yield Table([['Term', 'Meaning']] + [[f'term {section}.{r}', f'meaning {r} ' * 6]
+                                             for r in range(25 + 7 * section)], repeatRows=1)
+        yield KeepTogether([Paragraph(f'Summary {section}', styles['Heading3']), Spacer(1, 6),
+                            Paragraph('Kept with its heading. ' * 20, styles['BodyText'])])
+        if section % 4 == 3:
+            yield PageBreak()
+
+
+def build(flowables):
+    buffer = io.BytesIO()
+    SimpleDocTemplate(buffer, pagesize=A4, invariant=1).build(flowables)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize('lookahead', [3, PDF_FLOWABLE_LOOKAHEAD])
+def test_flowable_stream_lays_out_exactly_like_a_list(lookahead):
+    expected = build(list(story()))
+    assert len(PAGE.findall(expected)) > 10
+    # Keep-with-next groups must change this layout, or the comparison would not cover them
+    assert build(list(story(keep_with_next=0))) != expected
+    assert build(_FlowableStream(story(), lookahead=lookahead)) == expected
+
+
+def test_pdf_export_with_tables_and_mind_map(tmp_path):
+    image = pytest.importorskip('PIL.Image')
+    gemini = GeminiHelper()
+    gemini.mindmap_images = ImageStore(str(tmp_path))
+    # A stored render stands in for the headless browser
+    key = ImageStore.key_for(normalize_mindmap(MINDMAP), MINDMAP_RENDER_VARIANT)
+    gemini.mindmap_images.put(key, 'svg', b'<svg xmlns="http://www.w3.org/2000/svg" width="400" height="200">'
+                                          b'<rect width="400" height="200" fill="#eef"/></svg>')
+    png = io.BytesIO()
+    image.new('RGB', (PDF_MINDMAP_RASTER_WIDTH, 1000), 'white').save(png, 'PNG')
+    gemini.mindmap_images.put(key, f'{PDF_MINDMAP_RASTER_WIDTH}.png', png.getvalue())
+
+    lines = []
+    for module in range(1, 9):
+        lines += [f'# Module {module}', '## Key terms', '| Term | Meaning |', '|------|---------|']
+        lines += [f'| term {module}.{r} | **meaning** of term {r} |' for r in range(30)]
+        lines += ['```', 'def search(items, target):', '    return target in items', '```']
+        lines += [f'- point {p} with `code` and *emphasis*' for p in range(15)] + ['']
+
+    pdf_file = gemini.write_pdf_from_notes(iter(lines), 'Data Structures', 'semester', MINDMAP)
+    assert pdf_file is not None
+    with pdf_file:
+        pdf = pdf_file.read()
+    assert pdf.startswith(b'%PDF')
+    assert len(PAGE.findall(pdf)) > 5
+    # The mind map page embeds the stored image rather than falling back to Mermaid code
+    assert b'/Subtype /Image' in pdf
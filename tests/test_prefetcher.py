@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+from utils.prefetcher import NO_INTENT, Prefetcher
+from utils.shared_cache import SharedCache
+
+
+class SlowGemini:
+    """Stands in for GeminiHelper: each prefetch takes a few short steps and stops once cancelled"""
+
+    def __init__(self, steps=10):
+        self.steps = steps
+        self.runs = []
+        self._lock = threading.Lock()
+
+    def prefetch_study_content(self, subject_code, exam_type, subject_info, cancelled):
+        for step in range(self.steps):
+            if cancelled.wait(0.02):
+                outcome = 'cancelled'
+                break
+        else:
+            outcome = 'done'
+        with self._lock:
+            self.runs.append((subject_code, outcome))
+        return self.steps
+
+
+@pytest.fixture
+def shared(tmp_path):
+    return SharedCache(str(tmp_path / 'shared.sqlite3'), max_entries=4)
+
+
+def finish(prefetcher):
+    prefetcher._executor.shutdown(wait=True)
+
+
+def test_reselect_right_after_cancel_starts_a_new_task(shared):
+    gemini = SlowGemini()
+    prefetcher = Prefetcher(gemini, shared=shared)
+    assert prefetcher.request('u1', 'CS301', 'semester', {}) == 'queued'
+    prefetcher.cancel('u1')
+    assert prefetcher.request('u1', 'CS301', 'semester', {}) == 'queued'
+    finish(prefetcher)
+    assert ('CS301', 'done') in gemini.runs
+    assert shared.get_state(('prefetch_task', 'CS301', 'semester')) is None
+
+
+def test_second_prefetcher_joins_and_cancels_across_workers(shared):
+    gemini = SlowGemini(steps=50)
+    first, second = Prefetcher(gemini, shared=shared), Prefetcher(gemini, shared=shared)
+    assert first.request('u1', 'CS301', 'semester', {}) == 'queued'
+    assert second.request('u2', 'CS301', 'semester', {}) == 'joined'
+    second.cancel('u1')
+    second.cancel('u2')
+    finish(first)
+    finish(second)
+    assert gemini.runs == [('CS301', 'cancelled')]
+
+
+def test_cancelled_intent_is_stored_as_a_sentinel(shared):
+    prefetcher = Prefetcher(SlowGemini(), shared=shared)
+    prefetcher.request('u1', 'CS301', 'semester', {})
+    assert shared.get_state(('prefetch_intent', 'u1')) == ['CS301', 'semester']
+    prefetcher.cancel('u1')
+    assert shared.get_state(('prefetch_intent', 'u1')) == NO_INTENT
+    assert shared.get_state(('prefetch_intent', 'u2'), 'missing') == 'missing'
+    finish(prefetcher)
+
+
+def test_coordination_state_survives_cache_trim_and_clear(shared):
+    shared.set_state(('prefetch_intent', 'u1'), ['CS301', 'semester'])
+    for i in range(200):
+        shared.set(('notes', i), 'x')
+    shared.clear()
+    assert shared.get_state(('prefetch_intent', 'u1')) == ['CS301', 'semester']
+
+
+def test_local_requests_join_and_drop_beyond_the_pending_cap():
+    gemini = SlowGemini(steps=50)
+    prefetcher = Prefetcher(gemini, max_pending=1)
+    assert prefetcher.request('u1', 'CS301', 'semester', {}) == 'queued'
+    assert prefetcher.request('u2', 'CS301', 'semester', {}) == 'joined'
+    assert prefetcher.request('u3', 'CS302', 'semester', {}) == 'dropped'
+    prefetcher.cancel('u1')
+    prefetcher.cancel('u2')
+    finish(prefetcher)
+    assert gemini.runs == [('CS301', 'cancelled')]
@@ -0,0 +1,87 @@
+import json
+import os
+
+import pytest
+from utils.database_helper import DatabaseHelper
+from utils.pyq_topics import (PyqTopics, build_topic_index, near_duplicate_clusters, save_topic_index,
+                              subject_topic_frequencies)
+
+SUBJECT = {'title': 'Data Structures', 'modules': [
+    {'module': 'Module: 1', 'name': 'Trees', 'topics': ['Binary Search Tree', 'AVL Trees']},
+    {'module': 'Module: 2', 'name': 'Sorting', 'topics': ['Quick Sort', 'Merge Sort']},
+]}
+EXAMS = {
+    'internal1': [
+        {'year': '2022', 'questions': ['Explain insertion in a binary search tree with an example',
+                                       'Write the quick sort algorithm and trace it on an array']},
+        {'year': '2023', 'questions': ['Explain insertion in a binary search tree with an example.',
+                                       'Describe the rotations used to balance AVL trees']},
+    ],
+    'semester': [
+        {'year': '2023', 'questions': ['Explain insertion into a binary search tree with examples',
+                                       'What is the capital of France']},
+    ],
+}
+
+
+def test_near_duplicate_clusters_group_rewordings_only():
+    clusters = near_duplicate_clusters(['Explain insertion in a binary search tree with an example',
+                                        'Explain insertion in a binary search tree with an example.',
+                                        'Describe merge sort and its time complexity'])
+    assert clusters == [[0, 1], [2]]
+    assert near_duplicate_clusters([]) == []
+
+
+def test_topic_frequencies_count_repeats_and_unmapped_questions():
+    stats = subject_topic_frequencies(SUBJECT, EXAMS)
+    assert stats['total_questions'] == 6
+    assert stats['unmapped_questions'] == 1
+    top = stats['topics'][0]
+    assert (top['topic'], top['module']) == ('Binary Search Tree', 'Trees')
+    assert top['occurrences'] == 3
+    assert top['years'] == ['2022', '2023'] and top['last_asked'] == '2023'
+    assert top['exam_types'] == {'internal1': 2, 'semester': 1}
+    assert {row['topic'] for row in stats['topics']} == {'Binary Search Tree', 'Quick Sort', 'AVL Trees'}
+    assert stats['repeated_questions'][0]['years'] == ['2022', '2023']
+
+
+@pytest.fixture
+def data_files(tmp_path, monkeypatch):
+    subjects_file, pyqs_file = tmp_path / 'data.json', tmp_path / 'pyqs.json'
+    subjects_file.write_text(json.dumps({'CS301': SUBJECT}))
+    pyqs_file.write_text(json.dumps({'CS301': EXAMS}))
+    monkeypatch.setenv('SUBJECTS_FILE', str(subjects_file))
+    monkeypatch.setenv('PYQS_FILE', str(pyqs_file))
+    return subjects_file, pyqs_file
+
+
+def test_index_is_built_from_data_files_and_rebuilt_when_they_change(data_files, tmp_path):
+    _, pyqs_file = data_files
+    topics = PyqTopics(str(tmp_path / 'missing.json'), DatabaseHelper())
+    assert topics.get('CS301')['subject_name'] == 'Data Structures'
+    assert topics.get('CS302') is None
+    first = topics.version
+    pyqs_file.write_text(json.dumps({'CS302': EXAMS}))
+    os.utime(pyqs_file, (first[2] + 10, first[2] + 10))
+    assert topics.get('CS302')['total_questions'] == 6
+    assert topics.version != first
+
+
+def test_precomputed_index_file_is_preferred(data_files, tmp_path):
+    path = str(tmp_path / 'pyq_topics.json')
+    index = build_topic_index({'CS301': SUBJECT}, {'CS301': EXAMS})
+    index['subjects']['CS301']['subject_name'] = 'From the job'
+    save_topic_index(index, path)
+    topics = PyqTopics(path, DatabaseHelper())
+    assert topics.get('CS301')['subject_name'] == 'From the job'
+    assert topics.version[0] == 'file'
+
+
+def test_pyq_topics_route(data_files, client):
+    assert client.get('/api/pyq-topics').status_code == 400
+    assert client.get('/api/pyq-topics?subject_code=CS999').status_code == 404
+    response = client.get('/api/pyq-topics?subject_code=cs301')
+    assert response.status_code == 200
+    assert response.get_json()['topics'][0]['topic'] == 'Binary Search Tree'
+    assert client.get('/api/pyq-topics?subject_code=CS301',
+                      headers={'If-None-Match': response.headers['ETag']}).status_code == 304
@@ -0,0 +1,20 @@
+from utils.rate_limiter import DEFAULT_REQUESTS_PER_MINUTE, RateLimiter
+
+
+def test_limits_to_the_upstream_quota_by_default(monkeypatch):
+    monkeypatch.delenv('GEMINI_REQUESTS_PER_MINUTE', raising=False)
+    assert DEFAULT_REQUESTS_PER_MINUTE > 0
+    assert RateLimiter.from_env().interval == 60.0 / DEFAULT_REQUESTS_PER_MINUTE
+
+
+def test_zero_turns_the_limit_off(monkeypatch):
+    monkeypatch.setenv('GEMINI_REQUESTS_PER_MINUTE', '0')
+    limiter = RateLimiter.from_env()
+    assert [limiter.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+
+
+def test_calls_past_the_burst_wait_for_their_slot():
+    limiter = RateLimiter(600, burst=2)
+    waits = [limiter.acquire() for _ in range(3)]
+    assert waits[:2] == [0.0, 0.0]
+    assert 0.05 < waits[2] <= 0.1
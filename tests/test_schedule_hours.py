@@ -0,0 +1,41 @@
+import pytest
+from utils.schedule_planner import MAX_HOURS_PER_DAY, MIN_HOURS_PER_DAY, hours_per_day_value, plan_schedule
+
+SCHEDULE_ROUTES = ('/api/create-schedule', '/api/create-schedule/stream')
+
+
+@pytest.mark.parametrize('value', ['4', 4, 2, 13, 7.5])
+def test_hours_per_day_accepts_numbers_in_range(value):
+    assert hours_per_day_value(value) == float(value)
+
+
+@pytest.mark.parametrize('value', ['four', None, [], 1, 13.5, 16, 1e9, -3, float('nan')])
+def test_hours_per_day_rejects_other_values(value):
+    with pytest.raises(ValueError):
+        hours_per_day_value(value)
+
+
+def test_plan_schedule_treats_string_hours_as_a_number():
+    days = plan_schedule([{'name': 'DBMS', 'modules': []}], '2025-01-01', '2025-01-01', '4')
+    assert [slot['end'] for slot in days[0]['slots']][-1] == '13:30'
+
+
+@pytest.mark.parametrize('hours', range(MIN_HOURS_PER_DAY, MAX_HOURS_PER_DAY + 1))
+def test_last_slot_ends_by_midnight(hours):
+    days = plan_schedule([{'name': 'DBMS', 'modules': []}], '2025-01-01', '2025-01-01', hours)
+    end_hour, end_minute = map(int, days[0]['slots'][-1]['end'].split(':'))
+    assert end_hour * 60 + end_minute <= 24 * 60
+
+
+def test_longest_day_ends_at_midnight():
+    days = plan_schedule([{'name': 'DBMS', 'modules': []}], '2025-01-01', '2025-01-01', MAX_HOURS_PER_DAY)
+    assert days[0]['slots'][-1]['end'] == '24:00'
+
+
+@pytest.mark.parametrize('route', SCHEDULE_ROUTES)
+@pytest.mark.parametrize('hours', ['4' * 8, 'four', 100, 16, 1])
+def test_schedule_routes_reject_bad_hours(client, route, hours):
+    response = client.post(route, json={'subjects': 'DBMS', 'start_date': '2025-01-01',
+                                        'end_date': '2025-01-07', 'hours_per_day': hours})
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
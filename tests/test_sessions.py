@@ -0,0 +1,88 @@
+import pytest
+from utils.session_store import SessionStore, session_day, session_duration, week_start
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SessionStore(str(tmp_path / 'sessions.sqlite3'))
+
+
+def add(store, user_id, subject, duration, day):
+    store.add(user_id, subject, duration, f'{day}T10:00:00', day)
+
+
+def test_rollups_sum_minutes_per_day_and_week(store):
+    # 2025-01-06 is a Monday; the 12th closes the same ISO week
+    add(store, 'u1', 'DBMS', 25, '2025-01-06')
+    add(store, 'u1', 'DBMS', 50, '2025-01-06')
+    add(store, 'u1', 'OS', 25, '2025-01-12')
+    add(store, 'u1', 'DBMS', 25, '2025-01-13')
+    add(store, 'u2', 'DBMS', 90, '2025-01-06')
+
+    assert store.daily_totals('u1', '2025-01-06') == [
+        {'day': '2025-01-06', 'subject': 'DBMS', 'minutes': 75, 'sessions': 2},
+        {'day': '2025-01-12', 'subject': 'OS', 'minutes': 25, 'sessions': 1},
+        {'day': '2025-01-13', 'subject': 'DBMS', 'minutes': 25, 'sessions': 1},
+    ]
+    assert store.weekly_totals('u1', '2025-01-06') == [
+        {'week': '2025-01-06', 'subject': 'DBMS', 'minutes': 75, 'sessions': 2},
+        {'week': '2025-01-06', 'subject': 'OS', 'minutes': 25, 'sessions': 1},
+        {'week': '2025-01-13', 'subject': 'DBMS', 'minutes': 25, 'sessions': 1},
+    ]
+
+
+def test_recent_sessions_are_newest_first_and_per_user(store):
+    for day in ('2025-01-01', '2025-01-03', '2025-01-02'):
+        add(store, 'u1', 'DBMS', 25, day)
+    add(store, 'u2', 'OS', 25, '2025-01-04')
+    assert [s['day'] for s in store.recent_sessions('u1', limit=2)] == ['2025-01-03', '2025-01-02']
+
+
+def test_streak_counts_consecutive_days_ending_today_or_yesterday(store):
+    for day in ('2025-01-01', '2025-01-03', '2025-01-04', '2025-01-05'):
+        add(store, 'u1', 'DBMS', 25, day)
+    assert store.streak('u1', '2025-01-05') == 3
+    assert store.streak('u1', '2025-01-06') == 3
+    assert store.streak('u1', '2025-01-07') == 0
+
+
+def test_sessions_are_written_in_one_batch_by_flush(store):
+    for i in range(5):
+        add(store, 'u1', 'DBMS', 25, '2025-01-06')
+    assert store._pending
+    store.flush()
+    assert not store._pending
+    assert store.daily_totals('u1', '2025-01-06')[0]['sessions'] == 5
+
+
+def test_session_day_prefers_the_client_date():
+    assert session_day('2025-01-06T23:30:00Z', '2025-01-07') == '2025-01-07'
+    assert session_day('2025-01-06T23:30:00Z', 'not a date') == '2025-01-06'
+    assert week_start('2025-01-12') == '2025-01-06'
+
+
+def test_save_session_route_feeds_stats(client):
+    response = client.post('/api/save-session', json={'user_id': 'u1', 'subject': 'DBMS', 'duration': '30',
+                                                      'timestamp': '2025-01-06T10:00:00', 'day': '2025-01-06'})
+    assert response.get_json()['session']['duration'] == 30
+    stats = client.get('/api/session-stats?user_id=u1&today=2025-01-06').get_json()
+    assert stats['daily'] == [{'day': '2025-01-06', 'subject': 'DBMS', 'minutes': 30, 'sessions': 1}]
+    assert stats['streak'] == 1
+
+
+@pytest.mark.parametrize('value, minutes', [(25, 25), ('50', 50), (0.4, 1), (1440, 1440)])
+def test_session_duration_accepts_positive_minutes_up_to_a_day(value, minutes):
+    assert session_duration(value) == minutes
+
+
+@pytest.mark.parametrize('value', ['long', None, 0, -25, 1441, 1e9, float('inf'), float('nan')])
+def test_session_duration_rejects_other_values(value):
+    with pytest.raises(ValueError):
+        session_duration(value)
+
+
+@pytest.mark.parametrize('duration', ['long', 0, -25, 100000])
+def test_save_session_rejects_bad_duration(client, duration):
+    response = client.post('/api/save-session', json={'subject': 'DBMS', 'duration': duration})
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
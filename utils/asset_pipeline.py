@@ -0,0 +1,260 @@
+import gzip
+import hashlib
+import os
+import re
+from flask import Response, abort, request, url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Static files served minified under content-hashed names; everything else stays under /static
+ASSETS = ('js/script.js', 'css/style.css')
+ENABLED = os.getenv('ASSET_PIPELINE', '1') != '0'
+HASH_LENGTH = 10
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+MIMETYPES = {'.js': 'application/javascript', '.css': 'text/css'}
+
+# A '/' after one of these (or at the start) begins a regex literal rather than a division
+_REGEX_AFTER = set('(,=:[!&|?{};+-*%<>~^')
+_REGEX_AFTER_WORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete', 'void', 'throw',
+                      'yield', 'await'}
+# Whitespace next to these never separates two tokens that would otherwise merge
+_JS_TIGHT = set('{}()[];,:')
+_CSS_TIGHT = set('{};,>')
+
+
+def _last_char(out):
+    for chunk in reversed(out):
+        if chunk.strip():
+            return chunk.rstrip()[-1]
+    return ''
+
+
+def _previous_word(out):
+    match = re.search(r'[A-Za-z_$][\w$]*$', ''.join(out[-16:]))
+    return match.group(0) if match else ''
+
+
+def minify_js(source):
+    """Strip comments and collapse whitespace outside strings, templates and regex literals.
+
+    Line breaks between statements are kept, so automatic semicolon insertion
+    works as in the source.
+    """
+    out = []
+    i, n = 0, len(source)
+    # Open template literals; each entry counts the braces opened inside its current ${ }
+    templates = []
+    pending_space = ''
+
+    def flush_space(next_char):
+        last = out[-1][-1] if out else ''
+        if pending_space == '\n':
+            if last and last not in '{(,;\n':
+                out.append('\n')
+        elif pending_space and last and last not in _JS_TIGHT and next_char not in _JS_TIGHT:
+            out.append(' ')
+
+    while i < n:
+        c = source[i]
+        if c in ' \t\r\n':
+            # A run of whitespace becomes one line break if it has one, otherwise one space
+            if pending_space != '\n':
+                pending_space = '\n' if c == '\n' else ' '
+            i += 1
+            continue
+        if c == '/' and source.startswith('//', i):
+            end = source.find('\n', i)
+            i = n if end == -1 else end
+            continue
+        if c == '/' and source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = n if end == -1 else end + 2
+            pending_space = pending_space or ' '
+            continue
+
+        flush_space(c)
+        pending_space = ''
+        if c in '\'"':
+            j = i + 1
+            while j < n and source[j] != c:
+                j += 2 if source[j] == '\\' else 1
+            out.append(source[i:j + 1])
+            i = j + 1
+        elif c == '`' or (c == '}' and templates and templates[-1] == 0):
+            # Template text runs to the closing backtick or the next ${
+            if c == '}':
+                templates.pop()
+            j = i + 1
+            while j < n and source[j] != '`' and not source.startswith('${', j):
+                j += 2 if source[j] == '\\' else 1
+            if source.startswith('${', j):
+                templates.append(0)
+                out.append(source[i:j + 2])
+                i = j + 2
+            else:
+                out.append(source[i:j + 1])
+                i = j + 1
+        elif c == '/':
+            last = _last_char(out)
+            if not last or last in _REGEX_AFTER or _previous_word(out) in _REGEX_AFTER_WORDS:
+                j = i + 1
+                in_class = False
+                while j < n and (in_class or source[j] != '/'):
+                    if source[j] == '\\':
+                        j += 1
+                    elif source[j] == '[':
+                        in_class = True
+                    elif source[j] == ']':
+                        in_class = False
+                    j += 1
+                j += 1
+                while j < n and source[j].isalnum():
+                    j += 1
+                out.append(source[i:j])
+                i = j
+            else:
+                out.append(c)
+                i += 1
+        else:
+            if templates:
+                if c == '{':
+                    templates[-1] += 1
+                elif c == '}':
+                    templates[-1] -= 1
+            out.append(c)
+            i += 1
+    return ''.join(out).strip() + '\n'
+
+
+def minify_css(source):
+    """Strip comments and collapse whitespace outside strings"""
+    out = []
+    i, n = 0, len(source)
+    pending_space = False
+    while i < n:
+        c = source[i]
+        if c in ' \t\r\n':
+            pending_space = True
+            i += 1
+            continue
+        if source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = n if end == -1 else end + 2
+            pending_space = True
+            continue
+        last = out[-1][-1] if out else ''
+        if pending_space and last and last not in _CSS_TIGHT and last != ':' and c not in _CSS_TIGHT:
+            out.append(' ')
+        pending_space = False
+        if c in '\'"':
+            j = i + 1
+            while j < n and source[j] != c:
+                j += 2 if source[j] == '\\' else 1
+            out.append(source[i:j + 1])
+            i = j + 1
+            continue
+        if c == '}' and last == ';':
+            out[-1] = out[-1][:-1]
+        out.append(c)
+        i += 1
+    return ''.join(out).strip() + '\n'
+
+
+MINIFIERS = {'.js': minify_js, '.css': minify_css}
+
+# Assets already built in this process, keyed by source path and source hash, shared by every app
+_BUILT = {}
+
+
+class BuiltAsset:
+    """Minified, content-hashed asset with its precompressed variants"""
+
+    def __init__(self, name, body):
+        self.name = name
+        self.mimetype = MIMETYPES[os.path.splitext(name)[1]]
+        self.digest = hashlib.sha256(body).hexdigest()[:HASH_LENGTH]
+        stem, ext = os.path.splitext(name)
+        self.hashed_name = f'{stem}.{self.digest}{ext}'
+        self.variants = {None: body, 'gzip': gzip.compress(body, 9, mtime=0)}
+        if brotli is not None:
+            self.variants['br'] = brotli.compress(body, quality=11)
+
+
+class AssetPipeline:
+    """Builds fingerprinted static assets at startup and serves them with immutable caching"""
+
+    def __init__(self, app=None, names=ASSETS):
+        self.names = names
+        self.assets = {}
+        self.by_hashed_name = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['assets'] = self
+        app.jinja_env.globals['asset_url'] = self.url
+        if ENABLED:
+            self.build(app.static_folder)
+        app.add_url_rule('/assets/<path:filename>', 'assets', self.serve)
+
+    def build(self, static_folder):
+        """Minify, hash and precompress every asset; a file that fails is served from /static as is.
+
+        A source already built in this process is reused, so later create_app() calls cost one read
+        and hash per file.
+        """
+        original = compressed = built = 0
+        for name in self.names:
+            path = os.path.join(static_folder, name)
+            try:
+                with open(path, 'rb') as f:
+                    source = f.read()
+                key = (path, hashlib.sha256(source).hexdigest())
+                asset = _BUILT.get(key)
+                if asset is None:
+                    body = MINIFIERS[os.path.splitext(name)[1]](source.decode('utf-8')).encode('utf-8')
+                    asset = _BUILT[key] = BuiltAsset(name, body)
+                    built += 1
+            except (OSError, KeyError, UnicodeDecodeError) as e:
+                print(f"⚠ Asset {name} not built: {e}")
+                continue
+            self.assets[name] = asset
+            self.by_hashed_name[asset.hashed_name] = asset
+            original += len(source)
+            compressed += len(asset.variants['gzip'])
+        if built:
+            print(f"✓ Built {built} static assets: {original} bytes -> {compressed} bytes gzipped")
+
+    @property
+    def version(self):
+        """Short hash of every built asset's digest; changes whenever any asset does"""
+        digests = ''.join(sorted(asset.digest for asset in self.assets.values()))
+        return hashlib.sha256(digests.encode('utf-8')).hexdigest()[:HASH_LENGTH] if digests else ''
+
+    def url(self, name):
+        """URL of the fingerprinted asset, or of the plain static file when it was not built"""
+        asset = self.assets.get(name)
+        if asset is None:
+            return url_for('static', filename=name)
+        return url_for('assets', filename=asset.hashed_name)
+
+    def serve(self, filename):
+        asset = self.by_hashed_name.get(filename)
+        if asset is None:
+            abort(404)
+        encoding = request.accept_encodings.best_match([e for e in ('br', 'gzip') if e in asset.variants])
+        # Every variant is its own representation, so compressed ones carry a suffixed ETag
+        etag = f'{asset.digest}-{encoding}' if encoding else asset.digest
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            response = Response(asset.variants[encoding], mimetype=asset.mimetype)
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        response.vary.add('Accept-Encoding')
+        return response
@@ -0,0 +1,108 @@
+import gzip
+import os
+import zlib
+from flask import request
+from utils.content_cache import ContentCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Only text formats are compressed; PNG, PDF, docx and zip bodies are already compressed
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'image/svg+xml')
+MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '500'))
+
+# Per-request bodies and streams favour speed; cached variants are compressed once, so favour size
+STREAM_GZIP_LEVEL = 6
+STREAM_BROTLI_QUALITY = 4
+CACHED_GZIP_LEVEL = 9
+CACHED_BROTLI_QUALITY = 11
+
+
+def _encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def _compress(data, encoding, cached):
+    if encoding == 'br':
+        return brotli.compress(data, quality=CACHED_BROTLI_QUALITY if cached else STREAM_BROTLI_QUALITY)
+    return gzip.compress(data, CACHED_GZIP_LEVEL if cached else STREAM_GZIP_LEVEL, mtime=0)
+
+
+def _compress_stream(chunks, encoding):
+    """Compress an iterable of chunks, flushing after each so every SSE frame is sent immediately"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=STREAM_BROTLI_QUALITY)
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(STREAM_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class Compression:
+    """Negotiates gzip/brotli response compression for a Flask app"""
+
+    def __init__(self, app=None):
+        # Compressed bodies of responses with an ETag, keyed by the encoding-suffixed ETag
+        self.cache = ContentCache(name='compressed', max_entries=256)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['compression'] = self
+        app.after_request(self.compress_response)
+
+    def compress_response(self, response):
+        content_type = response.mimetype or ''
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return response
+        response.vary.add('Accept-Encoding')
+        if (response.status_code < 200 or response.status_code in (204, 206, 304)
+                or 'Content-Encoding' in response.headers or response.direct_passthrough):
+            return response
+        encoding = request.accept_encodings.best_match(_encodings())
+        if encoding is None:
+            return response
+
+        if not response.is_streamed:
+            data = response.get_data()
+            if len(data) < MIN_SIZE:
+                return response
+        # Each encoding is a different representation, so it gets its own ETag; a client revalidating
+        # the compressed body sends that tag back, which the view's unsuffixed check cannot match
+        etag, weak = response.get_etag()
+        if etag:
+            etag = f'{etag}-{encoding}'
+            response.set_etag(etag, weak)
+            if request.if_none_match.contains_weak(etag):
+                response.status_code = 304
+                response.set_data(b'')
+                del response.headers['Content-Length']
+                return response
+
+        if response.is_streamed:
+            response.response = _compress_stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+        elif etag:
+            compressed = self.cache.get(etag)
+            if compressed is None:
+                compressed = _compress(data, encoding, cached=True)
+                self.cache.set(etag, compressed)
+            response.set_data(compressed)
+        else:
+            response.set_data(_compress(data, encoding, cached=False))
+        response.headers['Content-Encoding'] = encoding
+        return response
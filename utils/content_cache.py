@@ -0,0 +1,52 @@
+import threading
+from collections import OrderedDict
+from utils.metrics import CACHE_REQUESTS
+
+
+class ContentCache:
+    """Thread-safe in-memory LRU cache for generated study content"""
+
+    def __init__(self, name='content', max_entries=512, shared=None):
+        self.name = name
+        self.max_entries = max_entries
+        # Optional second tier shared with other worker processes
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = CACHE_REQUESTS.labels(cache=name, result='hit')
+        self._misses = CACHE_REQUESTS.labels(cache=name, result='miss')
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._hits.inc()
+                return self._entries[key]
+            self._misses.inc()
+        if self.shared is None:
+            return None
+        value = self.shared.get(key)
+        if value is not None:
+            self._store(key, value)
+        return value
+
+    def set(self, key, value):
+        """Store value under key, evicting the least recently used entry if full"""
+        self._store(key, value)
+        if self.shared is not None:
+            self.shared.set(key, value)
+
+    def _store(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all cached entries"""
+        with self._lock:
+            self._entries.clear()
+        if self.shared is not None:
+            self.shared.clear()
@@ -1,19 +1,51 @@
 import json
 import os
 from datetime import datetime, timedelta
+from utils.metrics import DB_LOAD_SECONDS
 
 class DatabaseHelper:
     def __init__(self):
         self.base_dir = os.path.dirname(os.path.dirname(__file__))
         # Use data.json from parent directory instead of subjects.json
-        self.subjects_file = os.path.join(os.path.dirname(self.base_dir), 'data.json')
-        self.pyqs_file = os.path.join(self.base_dir, 'database', 'pyqs.json')
+        self.subjects_file = os.getenv('SUBJECTS_FILE', os.path.join(os.path.dirname(self.base_dir), 'data.json'))
+        self.pyqs_file = os.getenv('PYQS_FILE', os.path.join(self.base_dir, 'database', 'pyqs.json'))
+        # path -> (mtime, parsed data)
+        self._loaded = {}
+        self._reload_listeners = []
+    
+    def _load(self, name, path):
+        """Parsed JSON file, reloaded only when its modification time changes"""
+        mtime = os.path.getmtime(path)
+        cached = self._loaded.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        with DB_LOAD_SECONDS.labels(file=name).time(), open(path, 'r') as f:
+            data = json.load(f)
+        self._loaded[path] = (mtime, data)
+        if cached is not None:
+            for listener in self._reload_listeners:
+                listener(name)
+        return data
+    
+    def add_reload_listener(self, listener):
+        """Call listener(name) whenever a data file is reloaded after changing on disk"""
+        self._reload_listeners.append(listener)
+    
+    def data_version(self, *names):
+        """Modification times of the named data files ('subjects', 'pyqs'), for cache keys"""
+        paths = {'subjects': self.subjects_file, 'pyqs': self.pyqs_file}
+        version = []
+        for name in names:
+            try:
+                version.append(os.path.getmtime(paths[name]))
+            except OSError:
+                version.append(None)
+        return tuple(version)
     
     def load_subjects(self):
         """Load subjects database"""
         try:
-            with open(self.subjects_file, 'r') as f:
-                return json.load(f)
+            return self._load('subjects', self.subjects_file)
         except Exception as e:
             print(f"Error loading subjects: {e}")
             return {}
@@ -21,12 +53,16 @@ class DatabaseHelper:
     def load_pyqs(self):
         """Load previous year questions database"""
         try:
-            with open(self.pyqs_file, 'r') as f:
-                return json.load(f)
+            return self._load('pyqs', self.pyqs_file)
         except Exception as e:
             print(f"Error loading PYQs: {e}")
             return {}
     
+    def preload(self):
+        """Load the read-only data files ahead of the first request"""
+        self.load_subjects()
+        self.load_pyqs()
+    
     def get_subject_info(self, subject_code):
         """Get information for a specific subject"""
         subjects = self.load_subjects()
@@ -42,6 +78,17 @@ class DatabaseHelper:
             'modules': subject_data.get('modules', [])
         }
     
+    def find_subject(self, query):
+        """Subject info for a subject code or exact title, or None"""
+        query = query.strip()
+        subjects = self.load_subjects()
+        if query.upper() in subjects:
+            return self.get_subject_info(query.upper())
+        for code, info in subjects.items():
+            if info.get('title', '').lower() == query.lower():
+                return self.get_subject_info(code)
+        return None
+    
     def get_pyqs_for_subject(self, subject_code, exam_type=None):
         """Get PYQs for a specific subject and exam type"""
         pyqs = self.load_pyqs()
@@ -0,0 +1,231 @@
+import heapq
+import os
+import sqlite3
+import threading
+import time
+
+# SM-2 scheduling: grades run from 0 (forgot) to 5 (perfect); below PASSING_GRADE the card is relearned
+PASSING_GRADE = 3
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+# A failed card comes back after this long, new cards are due immediately
+RELEARN_SECONDS = 10 * 60
+DAY_SECONDS = 86400
+MAX_REVIEW_BATCH = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cards (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    subject_code TEXT NOT NULL,
+    module TEXT NOT NULL,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    ease REAL NOT NULL,
+    interval_days REAL NOT NULL,
+    repetitions INTEGER NOT NULL,
+    lapses INTEGER NOT NULL,
+    due REAL NOT NULL,
+    UNIQUE (user_id, subject_code, question)
+);
+CREATE INDEX IF NOT EXISTS cards_deck_due ON cards (user_id, subject_code, due);
+CREATE TABLE IF NOT EXISTS reviews (
+    id INTEGER PRIMARY KEY,
+    card_id INTEGER NOT NULL,
+    grade INTEGER NOT NULL,
+    reviewed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS decks (
+    user_id TEXT NOT NULL,
+    subject_code TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    PRIMARY KEY (user_id, subject_code)
+);
+"""
+
+BUMP_VERSION = """
+INSERT INTO decks (user_id, subject_code, version) VALUES (?, ?, 1)
+ON CONFLICT (user_id, subject_code) DO UPDATE SET version = version + 1
+"""
+
+
+def card_text(value):
+    """Stripped text of a model-written question or answer; '' for nulls, booleans, lists and objects"""
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return ''
+
+
+def sm2(ease, interval_days, repetitions, grade):
+    """Next (ease, interval_days, repetitions) after a review with grade 0-5"""
+    ease = max(MIN_EASE, ease + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+    if grade < PASSING_GRADE:
+        return ease, 0.0, 0
+    if repetitions == 0:
+        interval_days = 1.0
+    elif repetitions == 1:
+        interval_days = 6.0
+    else:
+        interval_days = interval_days * ease
+    return ease, interval_days, repetitions + 1
+
+
+class DueQueue:
+    """Min-heap of (due, card_id) for one deck, with lazy removal of outdated entries"""
+
+    def __init__(self, entries, version):
+        self.version = version
+        self._due = dict((card_id, due) for due, card_id in entries)
+        self._heap = [(due, card_id) for card_id, due in self._due.items()]
+        heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self._due)
+
+    def push(self, card_id, due):
+        self._due[card_id] = due
+        heapq.heappush(self._heap, (due, card_id))
+
+    def _discard_stale(self):
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def peek(self, limit, now):
+        """Ids of up to limit cards due by now, most overdue first, in O(limit log n)"""
+        taken = []
+        self._discard_stale()
+        while self._heap and len(taken) < limit and self._heap[0][0] <= now:
+            taken.append(heapq.heappop(self._heap))
+            self._discard_stale()
+        # Cards stay queued until they are reviewed
+        for entry in taken:
+            heapq.heappush(self._heap, entry)
+        return [card_id for _, card_id in taken]
+
+
+class FlashcardDeck:
+    """Per-user flashcard decks in SQLite, scheduled with SM-2 and served from in-memory due queues"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._queues = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        # Connections are per thread and per process; never reuse one across a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _version(self, conn, user_id, subject_code):
+        row = conn.execute('SELECT version FROM decks WHERE user_id = ? AND subject_code = ?',
+                           (user_id, subject_code)).fetchone()
+        return row['version'] if row else 0
+
+    def _queue(self, user_id, subject_code):
+        """Due queue for a deck, rebuilt when another process has changed the deck"""
+        conn = self._connection()
+        key = (user_id, subject_code)
+        version = self._version(conn, user_id, subject_code)
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue is None or queue.version != version:
+                rows = conn.execute('SELECT due, id FROM cards WHERE user_id = ? AND subject_code = ?',
+                                    key).fetchall()
+                queue = self._queues[key] = DueQueue([tuple(row) for row in rows], version)
+            return queue
+
+    def add_cards(self, user_id, subject_code, module, cards, now=None):
+        """Add question/answer cards to a deck, skipping questions it already has and cards without text;
+        returns the number added"""
+        now = time.time() if now is None else now
+        texts = [(card_text(c.get('question')), card_text(c.get('answer'))) for c in cards if isinstance(c, dict)]
+        rows = [(user_id, subject_code, module, question, answer, INITIAL_EASE, 0.0, 0, 0, now)
+                for question, answer in texts if question and answer]
+        conn = self._connection()
+        with self._lock, conn:
+            before = conn.total_changes
+            conn.executemany('INSERT OR IGNORE INTO cards (user_id, subject_code, module, question, answer, '
+                             'ease, interval_days, repetitions, lapses, due) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                             rows)
+            added = conn.total_changes - before
+            if added:
+                conn.execute(BUMP_VERSION, (user_id, subject_code))
+                # The queue is reloaded with the new cards on next use
+                self._queues.pop((user_id, subject_code), None)
+        return added
+
+    def due_cards(self, user_id, subject_code, limit=20, now=None):
+        """Up to limit cards due for review, most overdue first"""
+        now = time.time() if now is None else now
+        ids = self._queue(user_id, subject_code).peek(limit, now)
+        if not ids:
+            return []
+        rows = self._connection().execute(
+            f"SELECT id, module, question, answer, repetitions, interval_days, due FROM cards "
+            f"WHERE id IN ({','.join('?' * len(ids))})", ids).fetchall()
+        by_id = {row['id']: dict(row) for row in rows}
+        return [by_id[card_id] for card_id in ids if card_id in by_id]
+
+    def stats(self, user_id, subject_code, now=None):
+        """Total, due and never-reviewed card counts for a deck"""
+        now = time.time() if now is None else now
+        row = self._connection().execute(
+            'SELECT COUNT(*) AS total, SUM(repetitions = 0 AND lapses = 0) AS new, SUM(due <= ?) AS due '
+            'FROM cards WHERE user_id = ? AND subject_code = ?', (now, user_id, subject_code)).fetchone()
+        return {'total': row['total'], 'new': row['new'] or 0, 'due': row['due'] or 0}
+
+    def review(self, user_id, subject_code, reviews, now=None):
+        """Apply a batch of {'card_id', 'grade'} reviews in one transaction; returns the number applied"""
+        now = time.time() if now is None else now
+        reviews = reviews[:MAX_REVIEW_BATCH]
+        ids = [int(r['card_id']) for r in reviews]
+        if not ids:
+            return 0
+        conn = self._connection()
+        queue = self._queue(user_id, subject_code)
+        with self._lock, conn:
+            rows = conn.execute(
+                f"SELECT id, ease, interval_days, repetitions, lapses FROM cards "
+                f"WHERE user_id = ? AND subject_code = ? AND id IN ({','.join('?' * len(ids))})",
+                [user_id, subject_code] + ids).fetchall()
+            cards = {row['id']: dict(row) for row in rows}
+            updates = {}
+            history = []
+            # Reviews are applied in order, so the same card may be graded twice in one batch
+            for r in reviews:
+                card = cards.get(int(r['card_id']))
+                if card is None:
+                    continue
+                grade = min(5, max(0, int(r['grade'])))
+                reviewed_at = float(r.get('reviewed_at') or now)
+                card['ease'], card['interval_days'], card['repetitions'] = sm2(
+                    card['ease'], card['interval_days'], card['repetitions'], grade)
+                if grade < PASSING_GRADE:
+                    card['lapses'] += 1
+                    card['due'] = reviewed_at + RELEARN_SECONDS
+                else:
+                    card['due'] = reviewed_at + card['interval_days'] * DAY_SECONDS
+                updates[card['id']] = card
+                history.append((card['id'], grade, reviewed_at))
+            conn.executemany('UPDATE cards SET ease = :ease, interval_days = :interval_days, '
+                             'repetitions = :repetitions, lapses = :lapses, due = :due WHERE id = :id',
+                             list(updates.values()))
+            conn.executemany('INSERT INTO reviews (card_id, grade, reviewed_at) VALUES (?, ?, ?)', history)
+            if updates:
+                conn.execute(BUMP_VERSION, (user_id, subject_code))
+                for card in updates.values():
+                    queue.push(card['id'], card['due'])
+                queue.version = self._version(conn, user_id, subject_code)
+        return len(history)
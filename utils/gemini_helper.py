@@ -1,27 +1,201 @@
-import google.generativeai as genai
 import os
 from dotenv import load_dotenv
+import hashlib
 import json
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Image, Table, TableStyle
-from reportlab.lib.enums import TA_JUSTIFY, TA_CENTER, TA_LEFT
-from reportlab.lib import colors
-from io import BytesIO
-import markdown
 import re
-from html.parser import HTMLParser
 import tempfile
-import subprocess
-import base64
+import queue
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, Future
+from itertools import chain, islice
+import threading
+from utils.content_cache import ContentCache
+from utils.shared_cache import SharedCache
+from utils.image_store import ImageStore
+from utils.flashcard_deck import card_text
+from utils.svg_optimizer import optimize_svg
+from utils.mermaid_mindmap import normalize_mindmap, repair_mindmap, build_mindmap, MindmapError
+from utils.schedule_planner import plan_schedule, study_slots, week_segments, render_week
+from utils.prompt_registry import PromptRegistry
+from utils.model_backends import create_backend
+from utils.rate_limiter import RateLimiter
+from utils.metrics import (GEMINI_TTFT_SECONDS, GEMINI_DURATION_SECONDS, GEMINI_ERRORS,
+                           GEMINI_RATE_LIMIT_WAIT_SECONDS, MINDMAP_RENDER_SECONDS, PDF_BUILD_SECONDS,
+                           PDF_MARKDOWN_SECONDS, MINDMAP_GENERATIONS)
+from utils.tracing import tracer
 
 load_dotenv()
-genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+
+# Parallel per-module generation settings
+MODULE_WORKERS = int(os.getenv('GEMINI_MODULE_WORKERS', '4'))
+FLASHCARDS_PER_REQUEST = 5
+
+# Prefetching waits for real requests to free the model workers, polling at this interval
+PREFETCH_POLL_SECONDS = 0.25
+PREFETCH_MAX_WAIT_SECONDS = 30
+
+# Schedule sessions whose topic and activities are written by one model call, and weeks
+# generated at once; the model rate limit (GEMINI_REQUESTS_PER_MINUTE) still applies
+SCHEDULE_BATCH_SLOTS = 24
+SCHEDULE_WORKERS = int(os.getenv('GEMINI_SCHEDULE_WORKERS', '4'))
+SCHEDULE_DETAIL_LINE = re.compile(r'^\W*(\d+)\W*\|([^|]+)\|(.+)$')
+
+# Prompt budgets for chat: retrieved syllabus passages, client context and conversation history
+RETRIEVAL_TOP_K = 6
+RETRIEVAL_TOKEN_BUDGET = 600
+CONTEXT_TOKEN_BUDGET = 300
+HISTORY_TOKEN_BUDGET = 500
+
+# A generated mind map that is not a usable diagram is asked for again, up to this many times in all
+MINDMAP_ATTEMPTS = 2
+
+# Rendered mind maps are stored by content hash; bump the variant when render settings change
+MINDMAP_IMAGE_DIR = os.getenv('MINDMAP_IMAGE_DIR', os.path.join(tempfile.gettempdir(), 'study-assistant-mindmaps'))
+MINDMAP_RENDER_VARIANT = 'svg-v1'
+MINDMAP_RENDER_TIMEOUT_MS = 15000
+# PNGs are rasterized from the SVG on demand, at a requested width within these bounds
+MINDMAP_PNG_WIDTH = 1600
+MINDMAP_PNG_MIN_WIDTH = 200
+MINDMAP_PNG_MAX_WIDTH = 4000
+# Mind map box on the PDF page, in points, and the raster width used without svglib
+PDF_MINDMAP_WIDTH = 500
+PDF_MINDMAP_HEIGHT = 350
+PDF_MINDMAP_RASTER_WIDTH = 2000
+# PDFs are written to memory up to this size, then to a temporary file
+PDF_SPOOL_BYTES = int(os.getenv('PDF_SPOOL_BYTES', str(4 * 1024 * 1024)))
+# Flowables parsed ahead of the layout, enough for keep-with-next groups
+PDF_FLOWABLE_LOOKAHEAD = 64
+
+
+class _FlowableStream(list):
+    """Flowable list for ReportLab that refills from an iterator as the layout consumes it.
+
+    This relies on how BaseDocTemplate.build (ReportLab 4.0.7, pinned in
+    requirements.txt) walks its story: it loops on len(), reads and deletes
+    flowables[0], puts split parts back at the front, and scans at most len()
+    items for keep-with-next groups. Re-check tests/test_pdf_export.py when
+    upgrading ReportLab.
+    """
+
+    def __init__(self, flowables, lookahead=PDF_FLOWABLE_LOOKAHEAD):
+        super().__init__()
+        self._source = iter(flowables)
+        self._lookahead = lookahead
+
+    def __len__(self):
+        # ReportLab checks len() before every flowable it lays out
+        if list.__len__(self) < self._lookahead:
+            self.extend(islice(self._source, self._lookahead - list.__len__(self)))
+        return list.__len__(self)
+
+class _TimedIterator:
+    """Iterator that adds up the time spent producing its items, for work done lazily inside another step"""
+
+    def __init__(self, iterable):
+        self._source = iter(iterable)
+        self.seconds = 0.0
+        self.count = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            item = next(self._source)
+        finally:
+            self.seconds += time.perf_counter() - start
+        self.count += 1
+        return item
 
 class GeminiHelper:
-    def __init__(self):
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
+    def __init__(self, backend=None, retriever=None):
+        # Model backend selected by MODEL_BACKEND unless one is passed in
+        self.model = backend or create_backend()
+        # Optional syllabus search used to ground chat answers
+        self.retriever = retriever
+        # Generated notes and flashcards cached per (subject, module), shared
+        # between worker processes when SHARED_CACHE_PATH is set
+        self.cache = ContentCache(shared=SharedCache.from_env())
+        self.prompts = PromptRegistry()
+        # Upstream request rate limit shared by every model call in this process
+        self.rate_limiter = RateLimiter.from_env()
+        self.mindmap_images = ImageStore(MINDMAP_IMAGE_DIR)
+        self._executor = ThreadPoolExecutor(max_workers=MODULE_WORKERS, thread_name_prefix='gemini-module')
+        self._schedule_executor = ThreadPoolExecutor(max_workers=SCHEDULE_WORKERS, thread_name_prefix='gemini-schedule')
+        # Cache keys being generated by a prefetch, so requests wait for them instead of generating twice
+        self._inflight = {}
+        # Model calls in progress, so prefetching can stay out of the way of real requests
+        self._active_calls = 0
+        self._calls_lock = threading.Lock()
+    
+    def _submit(self, fn, *args, executor=None):
+        """Run fn on the shared (or given) executor, carrying over the current trace context"""
+        return (executor or self._executor).submit(contextvars.copy_context().run, fn, *args)
+    
+    def _track_call(self, delta):
+        with self._calls_lock:
+            self._active_calls += delta
+    
+    def busy(self):
+        """Whether model calls in progress already fill the module workers"""
+        return self._active_calls >= MODULE_WORKERS
+    
+    def _wait_for_rate_limit(self, method):
+        GEMINI_RATE_LIMIT_WAIT_SECONDS.labels(method=method).observe(self.rate_limiter.acquire())
+    
+    def _generate(self, method, prompt):
+        """Call the model and return the response text, recording latency metrics"""
+        self._wait_for_rate_limit(method)
+        start = time.perf_counter()
+        self._track_call(1)
+        try:
+            with tracer.span(f'gemini.{method}', prompt_tokens=self.prompts.estimate_tokens(prompt)):
+                text = self.model.generate_content(prompt).text
+        except Exception:
+            GEMINI_ERRORS.labels(method=method).inc()
+            raise
+        finally:
+            self._track_call(-1)
+        elapsed = time.perf_counter() - start
+        # Non-streaming responses arrive whole, so the first token is the last
+        GEMINI_TTFT_SECONDS.labels(method=method).observe(elapsed)
+        GEMINI_DURATION_SECONDS.labels(method=method).observe(elapsed)
+        return text
+    
+    def _generate_stream(self, method, prompt):
+        """Stream response text chunks from the model, recording latency metrics"""
+        self._wait_for_rate_limit(method)
+        start = time.perf_counter()
+        span = tracer.start_span(f'gemini.{method}', prompt_tokens=self.prompts.estimate_tokens(prompt), stream=True)
+        first_chunk = True
+        self._track_call(1)
+        try:
+            for chunk in self.model.generate_content(prompt, stream=True):
+                if chunk.text:
+                    if first_chunk:
+                        ttft = time.perf_counter() - start
+                        GEMINI_TTFT_SECONDS.labels(method=method).observe(ttft)
+                        span.set_attribute('time_to_first_token_ms', round(ttft * 1000, 2))
+                        first_chunk = False
+                    yield chunk.text
+        except Exception as e:
+            GEMINI_ERRORS.labels(method=method).inc()
+            span.record_error(e)
+            raise
+        finally:
+            self._track_call(-1)
+            span.end()
+        GEMINI_DURATION_SECONDS.labels(method=method).observe(time.perf_counter() - start)
+    
+    def _stream_or_error(self, method, prompt, error_prefix):
+        """Stream response text, yielding an error message instead of raising"""
+        try:
+            for text in self._generate_stream(method, prompt):
+                yield text
+        except Exception as e:
+            yield f"{error_prefix}{str(e)}"
     
     def _filter_modules_by_exam_type(self, modules, exam_type):
         """Filter modules based on exam type"""
@@ -41,336 +215,427 @@ class GeminiHelper:
             # All modules
             return modules
     
-    def generate_study_notes(self, subject_code, exam_type, subject_info, stream=False):
-        """Generate comprehensive study notes"""
-        # Filter modules based on exam type
+    def _module_label(self, module):
+        """Stable label used to identify a module in cache keys"""
+        return module.get('module') or module.get('name', 'Module')
+
+    def _module_cache_key(self, kind, subject_code, module):
+        """Cache key for per-module content, versioned by its prompt template and the module's syllabus"""
+        return (kind, self.prompts.version(f'module_{kind}'), subject_code, self._module_label(module),
+                self.prompts.module_hash(module))
+    
+    def _mindmap_cache_key(self, subject_code, exam_type, subject_info):
+        """Cache key for a mind map, versioned by its prompt template and the modules it covers"""
+        modules = self._filter_modules_by_exam_type(subject_info.get('modules', []), exam_type)
+        digest = hashlib.sha256('\n'.join(self.prompts.module_line(m) for m in modules).encode('utf-8')).hexdigest()[:12]
+        return ('mindmap', self.prompts.version('mindmap'), subject_code, exam_type, digest)
+
+    def _modules_for_generation(self, subject_code, exam_type, subject_info):
+        """Modules to generate per-module content for, falling back to the whole subject"""
         all_modules = subject_info.get('modules', [])
         filtered_modules = self._filter_modules_by_exam_type(all_modules, exam_type)
+        if filtered_modules:
+            return filtered_modules
+        # No module breakdown available - treat the subject as a single module
+        return [{'module': 'Overview', 'name': subject_info.get('name', subject_code), 'topics': []}]
+
+    def content_version(self, subject_code, exam_type, subject_info):
+        """Version of generated notes, flashcards and mind map, changing with their prompts and modules"""
+        modules = self._modules_for_generation(subject_code, exam_type, subject_info)
+        parts = [self.prompts.version(name) for name in ('module_notes', 'module_flashcards', 'mindmap')]
+        parts.extend(self.prompts.module_line(m) for m in modules)
+        return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()[:16]
+    
+    def generate_study_notes(self, subject_code, exam_type, subject_info, stream=False):
+        """Generate comprehensive study notes composed from per-module notes"""
+        modules = self._modules_for_generation(subject_code, exam_type, subject_info)
+        exam_type_text = self.prompts.exam_type_text(exam_type)
         
-        modules_text = "\n".join([f"{m.get('module', 'Module')}: {m.get('name', 'Unknown')} - Topics: {', '.join(m.get('topics', []))}" 
-                                  for m in filtered_modules])
+        chunks = self._stream_module_notes(subject_code, exam_type_text, subject_info, modules)
+        if stream:
+            return chunks
+        return ''.join(chunks)
+    
+    def _stream_module_notes(self, subject_code, exam_type_text, subject_info, modules):
+        """Stream notes module by module, generating uncached modules in parallel"""
+        cached = {}
+        pending = {}
+        for module in modules:
+            key = self._module_cache_key('notes', subject_code, module)
+            text = self.cache.get(key)
+            if text is not None:
+                cached[key] = text
+            elif key not in pending:
+                chunks = queue.Queue()
+                inflight = self._inflight.get(key)
+                if inflight is not None:
+                    # Being prefetched; its notes arrive in one piece when done
+                    inflight.add_done_callback(lambda f, chunks=chunks: self._put_prefetched_notes(f, chunks))
+                else:
+                    self._submit(self._generate_module_notes, key, subject_code, subject_info, module, chunks)
+                pending[key] = chunks
         
-        exam_type_text = {
-            'internal1': 'Internal 1 (Modules 1-2)',
-            'internal2': 'Internal 2 (Modules 1-4)',
-            'internal3': 'Internal 3 (Modules 5-6)',
-            'semester': 'Semester Exam (All Modules)'
-        }.get(exam_type, exam_type)
+        yield f"# {subject_info.get('name', subject_code)} - {exam_type_text}\n\n"
         
-        prompt = f"""Generate comprehensive study notes for {subject_info.get('name', subject_code)} focusing on {exam_type_text}.
-
-Subject: {subject_info.get('name', subject_code)}
-Modules covered:
-{modules_text}
-
-Please provide:
-1. Key concepts and definitions for each module
-2. Important formulas and algorithms (if applicable)
-3. Real-world examples and applications
-4. Important points to remember
-5. Common mistakes to avoid
-
-Format the response in markdown with clear headings, bullet points, and code examples where applicable.
-Make it comprehensive but concise, suitable for exam preparation."""
+        for module in modules:
+            key = self._module_cache_key('notes', subject_code, module)
+            if key in cached:
+                yield cached[key]
+            else:
+                # Drain this module's queue; later modules keep buffering meanwhile
+                chunks = pending[key]
+                parts = []
+                while True:
+                    chunk = chunks.get()
+                    if chunk is None:
+                        break
+                    parts.append(chunk)
+                    yield chunk
+                cached[key] = ''.join(parts)
+            yield "\n\n"
+    
+    @staticmethod
+    def _put_prefetched_notes(future, chunks):
+        try:
+            chunks.put(future.result())
+        except Exception as e:
+            chunks.put(f"Error generating study notes: {str(e)}")
+        finally:
+            chunks.put(None)
+    
+    def _module_notes_prompt(self, subject_code, subject_info, module):
+        return self.prompts.render('module_notes',
+                                   module_line=self.prompts.module_line(module),
+                                   subject_name=subject_info.get('name', subject_code),
+                                   module_name=module.get('name', 'Unknown'))
+    
+    def _generate_module_notes(self, key, subject_code, subject_info, module, chunks):
+        """Generate notes for one module, pushing chunks to a queue and caching the result"""
+        prompt = self._module_notes_prompt(subject_code, subject_info, module)
 
+        parts = []
         try:
-            if stream:
-                # Return streaming response
-                response = self.model.generate_content(prompt, stream=True)
-                for chunk in response:
-                    if chunk.text:
-                        yield chunk.text
-            else:
-                response = self.model.generate_content(prompt)
-                return response.text
+            for text in self._generate_stream('generate_study_notes', prompt):
+                parts.append(text)
+                chunks.put(text)
+            self.cache.set(key, ''.join(parts))
         except Exception as e:
-            if stream:
-                yield f"Error generating study notes: {str(e)}"
-            else:
-                return f"Error generating study notes: {str(e)}"
+            chunks.put(f"Error generating study notes: {str(e)}")
+        finally:
+            chunks.put(None)
     
     def generate_flashcards(self, subject_code, exam_type, subject_info):
-        """Generate flashcards in JSON format"""
-        # Filter modules based on exam type
-        all_modules = subject_info.get('modules', [])
-        filtered_modules = self._filter_modules_by_exam_type(all_modules, exam_type)
+        """Generate flashcards in JSON format, composed from per-module flashcards"""
+        per_module, errors = self._module_flashcards(subject_code, exam_type, subject_info)
         
-        modules_text = "\n".join([f"{m.get('module', 'Module')}: {m.get('name', 'Unknown')} - Topics: {', '.join(m.get('topics', []))}" 
-                                  for m in filtered_modules])
+        # Round-robin across modules so every module is represented
+        per_module = [cards for _, cards in per_module]
+        flashcards = []
+        index = 0
+        while len(flashcards) < FLASHCARDS_PER_REQUEST and any(index < len(cards) for cards in per_module):
+            for cards in per_module:
+                if index < len(cards) and len(flashcards) < FLASHCARDS_PER_REQUEST:
+                    flashcards.append(cards[index])
+            index += 1
+        
+        if not flashcards:
+            return json.dumps([{"question": "Error", "answer": errors[0] if errors else "No flashcards generated"}])
+        return json.dumps(flashcards)
+    
+    def module_flashcards(self, subject_code, exam_type, subject_info):
+        """Every cached or newly generated flashcard, as (module label, cards) pairs"""
+        per_module, errors = self._module_flashcards(subject_code, exam_type, subject_info)
+        if not per_module and errors:
+            raise RuntimeError(errors[0])
+        return per_module
+    
+    def _module_flashcards(self, subject_code, exam_type, subject_info):
+        """(module label, cards) pairs for the exam's modules, generating uncached ones in parallel, and errors"""
+        modules = self._modules_for_generation(subject_code, exam_type, subject_info)
         
-        exam_type_text = {
-            'internal1': 'Internal 1 (Modules 1-2)',
-            'internal2': 'Internal 2 (Modules 1-4)',
-            'internal3': 'Internal 3 (Modules 5-6)',
-            'semester': 'Semester Exam (All Modules)'
-        }.get(exam_type, exam_type)
+        deck = {}
+        missing = []
+        for module in modules:
+            key = self._module_cache_key('flashcards', subject_code, module)
+            cards = self.cache.get(key)
+            if cards is not None:
+                deck[key] = cards
+            elif key not in missing:
+                missing.append(key)
         
-        prompt = f"""Create EXACTLY 5 flashcards for {subject_info.get('name', subject_code)} {exam_type_text}.
-
-Subject: {subject_info.get('name', subject_code)}
-Modules:
-{modules_text}
-
-Generate flashcards covering:
-- Important concepts and definitions
-- Key formulas and algorithms
-- Important facts and figures
-- Common interview questions
-
-Return ONLY a valid JSON array with this exact format (no additional text):
-[
-  {{"question": "What is...", "answer": "..."}},
-  {{"question": "Explain...", "answer": "..."}}
-]
-
-IMPORTANT: Generate EXACTLY 5 flashcards, no more, no less.
-Make sure questions are clear and answers are concise but complete."""
-
-        try:
-            response = self.model.generate_content(prompt)
-            # Extract JSON from response
-            text = response.text.strip()
-            # Try to find JSON array in the response
-            if text.startswith('['):
-                return text
-            else:
-                # Try to extract JSON from markdown code block
-                if '```json' in text:
-                    json_start = text.find('[')
-                    json_end = text.rfind(']') + 1
-                    if json_start != -1 and json_end > json_start:
-                        return text[json_start:json_end]
-                elif '```' in text:
-                    json_start = text.find('[')
-                    json_end = text.rfind(']') + 1
-                    if json_start != -1 and json_end > json_start:
-                        return text[json_start:json_end]
-            return text
-        except Exception as e:
-            return json.dumps([{"question": "Error", "answer": str(e)}])
+        # Generate uncached modules in parallel
+        modules_by_key = {self._module_cache_key('flashcards', subject_code, m): m for m in modules}
+        futures = {key: self._inflight.get(key) or
+                   self._submit(self._generate_module_flashcards, subject_code, subject_info, modules_by_key[key])
+                   for key in missing}
+        errors = []
+        for key, future in futures.items():
+            try:
+                cards = future.result()
+                self.cache.set(key, cards)
+                deck[key] = cards
+            except Exception as e:
+                errors.append(str(e))
+        
+        return [(self._module_label(modules_by_key[key]), deck[key]) for key in modules_by_key if key in deck], errors
+    
+    def _generate_module_flashcards(self, subject_code, subject_info, module):
+        """Generate flashcards for one module as a list of question/answer dicts"""
+        prompt = self.prompts.render('module_flashcards',
+                                     count=FLASHCARDS_PER_REQUEST,
+                                     subject_name=subject_info.get('name', subject_code),
+                                     module_line=self.prompts.module_line(module))
+
+        text = self._generate('generate_flashcards', prompt).strip()
+        # Extract the JSON array, tolerating markdown code blocks around it
+        json_start = text.find('[')
+        json_end = text.rfind(']') + 1
+        if json_start == -1 or json_end <= json_start:
+            raise ValueError(f"No flashcards found in response for {self._module_label(module)}")
+        cards = json.loads(text[json_start:json_end])
+        # The model sometimes writes numbers, nulls or nested objects; keep only cards with text on both sides
+        cards = [{'question': card_text(c.get('question')), 'answer': card_text(c.get('answer'))}
+                 for c in cards if isinstance(c, dict)]
+        return [c for c in cards if c['question'] and c['answer']]
     
     def generate_mindmap(self, subject_code, exam_type, subject_info):
         """Generate mind map in Mermaid.js format"""
+        key = self._mindmap_cache_key(subject_code, exam_type, subject_info)
+        mindmap = self.cache.get(key)
+        if mindmap is not None:
+            return mindmap
+        
+        try:
+            inflight = self._inflight.get(key)
+            mindmap = inflight.result() if inflight else self._generate_mindmap(subject_code, exam_type, subject_info)
+            self.cache.set(key, mindmap)
+            return mindmap
+        except MindmapError as e:
+            print(f"⚠ Model returned an unusable mind map ({e}); building one from the syllabus")
+            filtered_modules = self._filter_modules_by_exam_type(subject_info.get('modules', []), exam_type)
+            return build_mindmap(subject_info.get('name', subject_code),
+                                 [(m.get('name', m.get('module', 'Module')), m.get('topics', []))
+                                  for m in filtered_modules])
+        except Exception as e:
+            return build_mindmap('Error', [(str(e), [])])
+    
+    def _generate_mindmap(self, subject_code, exam_type, subject_info):
+        """Model-generated mind map, normalized; raises MindmapError when no attempt yields a usable one"""
         # Filter modules based on exam type
         all_modules = subject_info.get('modules', [])
         filtered_modules = self._filter_modules_by_exam_type(all_modules, exam_type)
         
-        modules_text = "\n".join([f"{m.get('module', 'Module')}: {m.get('name', 'Unknown')} - Topics: {', '.join(m.get('topics', []))}" 
-                                  for m in filtered_modules])
-        
-        exam_type_text = {
-            'internal1': 'Internal 1 (Modules 1-2)',
-            'internal2': 'Internal 2 (Modules 1-4)',
-            'internal3': 'Internal 3 (Modules 5-6)',
-            'semester': 'Semester Exam (All Modules)'
-        }.get(exam_type, exam_type)
+        prompt = self.prompts.render('mindmap',
+                                     subject_name=subject_info.get('name', subject_code),
+                                     exam_type_text=self.prompts.exam_type_text(exam_type),
+                                     modules_text=self.prompts.module_block(subject_code, exam_type, filtered_modules))
+
+        # Code fences, stray text and bad indentation are repaired; text that is not a diagram is regenerated
+        for attempt in range(MINDMAP_ATTEMPTS):
+            try:
+                mindmap, repairs = repair_mindmap(self._generate('generate_mindmap', prompt).strip())
+            except MindmapError as e:
+                MINDMAP_GENERATIONS.labels(outcome='rejected').inc()
+                print(f"⚠ Rejected generated mind map for {subject_code} (attempt {attempt + 1}): {e}")
+                if attempt + 1 == MINDMAP_ATTEMPTS:
+                    raise
+                continue
+            if repairs:
+                print(f"⚠ Repaired generated mind map for {subject_code}: {'; '.join(repairs)}")
+            MINDMAP_GENERATIONS.labels(outcome='repaired' if repairs else 'clean').inc()
+            return mindmap
+    
+    def prefetch_study_content(self, subject_code, exam_type, subject_info, cancelled):
+        """Generate and cache missing flashcards, mind map and notes one piece at a time.
+
+        Stops when cancelled is set or when real requests keep the model busy
+        for PREFETCH_MAX_WAIT_SECONDS. Returns the number of pieces generated.
+        """
+        modules = self._modules_for_generation(subject_code, exam_type, subject_info)
+        # Flashcards and the mind map come first: the study content request needs them before notes
+        work = [(self._module_cache_key('flashcards', subject_code, m), self._generate_module_flashcards,
+                 (subject_code, subject_info, m)) for m in modules]
+        work.append((self._mindmap_cache_key(subject_code, exam_type, subject_info), self._generate_mindmap,
+                     (subject_code, exam_type, subject_info)))
+        work.extend((self._module_cache_key('notes', subject_code, m), self._generate_prefetched_notes,
+                     (subject_code, subject_info, m)) for m in modules)
         
-        prompt = f"""Create a mind map in Mermaid.js syntax for {subject_info.get('name', subject_code)} - {exam_type_text}.
-
-Subject: {subject_info.get('name', subject_code)}
-Modules:
-{modules_text}
-
-Generate a Mermaid.js mindmap diagram with the following structure:
-- Root node: Subject name
-- Child nodes: Module names
-- Sub-child nodes: Key topics from each module
-
-Return ONLY the Mermaid.js code (no additional text, no markdown code blocks).
-Start with: mindmap
-Use proper indentation for hierarchy.
-
-Example format:
-mindmap
-  root((Subject Name))
-    Module 1
-      Topic 1
-      Topic 2
-    Module 2
-      Topic 3
-      Topic 4
-
-Generate a comprehensive mind map covering all important topics."""
-
+        generated = 0
+        for key, fn, args in work:
+            if key in self._inflight or self.cache.get(key) is not None:
+                continue
+            waited = 0.0
+            while self.busy() and waited < PREFETCH_MAX_WAIT_SECONDS and not cancelled.is_set():
+                cancelled.wait(PREFETCH_POLL_SECONDS)
+                waited += PREFETCH_POLL_SECONDS
+            if cancelled.is_set() or self.busy():
+                break
+            future = self._inflight[key] = Future()
+            try:
+                value = fn(*args)
+                self.cache.set(key, value)
+                future.set_result(value)
+                generated += 1
+            except Exception as e:
+                future.set_exception(e)
+                print(f"Error prefetching {key[0]} for {subject_code}: {e}")
+                break
+            finally:
+                self._inflight.pop(key, None)
+        return generated
+    
+    def _generate_prefetched_notes(self, subject_code, subject_info, module):
+        return self._generate('generate_study_notes', self._module_notes_prompt(subject_code, subject_info, module))
+    
+    def create_study_schedule(self, subjects, start_date, end_date, hours_per_day, stream=False):
+        """Study timetable planned locally, with topics and activities for each session filled in by the model.
+
+        subjects is a list of subject info dicts ('name', 'modules'). Weeks
+        are filled in concurrently, within the model rate limit. Raises
+        ValueError for an invalid date range before any model call is made.
+        """
+        days = plan_schedule(subjects, start_date, end_date, hours_per_day)
+        by_name = {s['name']: s for s in subjects}
+        # Submitted in calendar order, so earlier weeks are generated first
+        weeks = [(week, self._schedule_week_batches(by_name, week)) for week in week_segments(days)]
+        stream_weeks = self._stream_schedule(weeks)
+        if stream:
+            return stream_weeks
+        return ''.join(stream_weeks)
+    
+    def _stream_schedule(self, weeks):
+        """Yield each week as soon as it and every earlier week are filled in"""
         try:
-            response = self.model.generate_content(prompt)
-            text = response.text.strip()
-            
-            # Extract mermaid code from markdown if present
-            if '```mermaid' in text:
-                start = text.find('```mermaid') + 10
-                end = text.find('```', start)
-                if end != -1:
-                    return text[start:end].strip()
-            elif '```' in text:
-                start = text.find('```') + 3
-                end = text.find('```', start)
-                if end != -1:
-                    return text[start:end].strip()
-            
-            return text
+            for number, (week, futures) in enumerate(weeks, 1):
+                for future in futures:
+                    future.result()
+                yield render_week(number, week)
+        finally:
+            # The client may have gone away; weeks not yet started are not needed
+            for _, futures in weeks:
+                for future in futures:
+                    future.cancel()
+    
+    def _schedule_week_batches(self, subjects_by_name, week):
+        """Start filling in one week's sessions, SCHEDULE_BATCH_SLOTS per model call"""
+        slots = study_slots(week)
+        return [self._submit(self._fill_schedule_details, subjects_by_name, slots[i:i + SCHEDULE_BATCH_SLOTS],
+                             executor=self._schedule_executor)
+                for i in range(0, len(slots), SCHEDULE_BATCH_SLOTS)]
+    
+    def _fill_schedule_details(self, subjects_by_name, slots):
+        """Ask the model for the topic and activities of each slot, keeping the planner's defaults on failure"""
+        names = list(dict.fromkeys(slot['subject'] for slot in slots))
+        syllabus = '\n'.join(
+            f"{name}:\n" + (self.prompts.module_block(subjects_by_name[name].get('code') or name, 'schedule',
+                                                       subjects_by_name[name].get('modules', [])) or 'No module list')
+            for name in names)
+        sessions = '\n'.join(f"{i}. {slot['date']} {slot['start']}-{slot['end']} | {slot['subject']} | "
+                             f"{slot['module']} | {slot['kind'].replace('_', ' ')}"
+                             for i, slot in enumerate(slots, 1))
+        prompt = self.prompts.render('schedule_details', subjects=', '.join(names),
+                                     syllabus=syllabus, sessions=sessions)
+        try:
+            text = self._generate('create_study_schedule', prompt)
         except Exception as e:
-            return f"mindmap\n  root((Error))\n    {str(e)}"
+            print(f"Error generating schedule details: {e}")
+            return
+        for line in text.splitlines():
+            match = SCHEDULE_DETAIL_LINE.match(line)
+            if match and 1 <= int(match.group(1)) <= len(slots):
+                slot = slots[int(match.group(1)) - 1]
+                slot['topic'] = match.group(2).strip()
+                slot['activities'] = match.group(3).strip()
     
-    def create_study_schedule(self, subjects, start_date, end_date, hours_per_day, stream=False):
-        """Create personalized study timetable with detailed topics and time slots"""
-        
-        # Calculate number of days
-        from datetime import datetime, timedelta
-        start = datetime.strptime(start_date, '%Y-%m-%d')
-        end = datetime.strptime(end_date, '%Y-%m-%d')
-        total_days = (end - start).days + 1
-        
-        prompt = f"""Create a comprehensive day-by-day study timetable for the following:
-
-**Study Period:** {start_date} to {end_date} ({total_days} days)
-**Subjects:** {subjects}
-**Daily Study Hours:** {hours_per_day} hours per day (minimum 2 hours)
-
-Generate a detailed timetable in **MARKDOWN TABLE FORMAT** for each day.
-
-## Format Instructions:
-
-For each day, create a section with:
-- A heading with the date (e.g., "### Monday, October 8, 2024")
-- A markdown table with the following columns:
-
-| Time Slot | Subject | Topic | Activities |
-|-----------|---------|-------|------------|
-| 9:00 - 10:30 | Data Structures | Arrays and Linked Lists | Study concepts, solve 5 problems |
-| 10:30 - 10:45 | Break | - | Rest and refresh |
-| 10:45 - 12:15 | Algorithms | Sorting Algorithms | Understand theory, implement quicksort |
-
-## Important Guidelines:
-1. **Start time:** Begin at 9:00 AM by default (or suggest appropriate times)
-2. **Break periods:** Include 15-minute breaks after every 90 minutes of study
-3. **Subject rotation:** Distribute subjects evenly across days
-4. **Topics:** Be specific - mention actual chapters/topics from each subject
-5. **Activities:** Include concrete tasks (read pages X-Y, solve problems, practice coding, review notes, etc.)
-6. **Realistic pacing:** Allocate appropriate time based on topic difficulty
-7. **Revision days:** Include quick revision sessions for previously covered topics
-
-**Output Format:** Use markdown tables as shown above for EACH day
-
-## Requirements:
-1. **Distribute {hours_per_day} hours across all subjects** each day
-2. **Include specific topics/chapters** for each study session
-3. **Add 15-minute breaks** between subjects
-4. **Rotate subjects** to avoid monotony
-5. **Include revision days** (last 2-3 days)
-6. **Suggest time slots** (e.g., 9:00 AM - 11:00 AM)
-7. **Balance difficulty** - mix hard and easy topics
-8. **Include practice problems/mock tests** in later days
-
-Start the timetable now:"""
-
+    def _references(self, query, subject_code=None):
+        """Syllabus passages relevant to query, formatted for a prompt within the retrieval budget"""
+        if self.retriever is None:
+            return 'None found.'
         try:
-            if stream:
-                # Return streaming response
-                response = self.model.generate_content(prompt, stream=True)
-                for chunk in response:
-                    if chunk.text:
-                        yield chunk.text
-            else:
-                response = self.model.generate_content(prompt)
-                return response.text
+            with tracer.span('retrieval.search') as span:
+                passages = self.retriever.search(query, subject_code, RETRIEVAL_TOP_K, RETRIEVAL_TOKEN_BUDGET)
+                span.set_attribute('passages', len(passages))
         except Exception as e:
-            if stream:
-                yield f"Error generating schedule: {str(e)}"
-            else:
-                return f"Error generating schedule: {str(e)}"
+            print(f"Error searching syllabus: {e}")
+            return 'None found.'
+        if not passages:
+            return 'None found.'
+        return '\n'.join(f"- [{p['source']}] {p['text']}" for p in passages)
     
-    def answer_question(self, question, context):
+    def answer_question(self, question, context, subject_code=None, stream=False):
         """Answer student questions with context"""
-        prompt = f"""You are a helpful study assistant. Answer the following question based on the context provided.
-
-Context: {context}
-
-Question: {question}
-
-Provide a clear, concise, and accurate answer. Include examples if helpful."""
+        prompt = self.prompts.render('answer',
+                                     context=self.prompts.truncate(context, CONTEXT_TOKEN_BUDGET),
+                                     references=self._references(question, subject_code),
+                                     question=question)
 
+        if stream:
+            return self._stream_or_error('answer_question', prompt, "Error answering question: ")
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            return self._generate('answer_question', prompt)
         except Exception as e:
             return f"Error answering question: {str(e)}"
     
-    def chat_response(self, message, chat_history="", stream=False):
+    def chat_response(self, message, chat_history="", stream=False, subject_code=None):
         """General chat response for study assistance"""
-        prompt = f"""You are a helpful AI study assistant. Help the student with their question.
-
-Previous conversation:
-{chat_history}
-
-Student: {message}
-
-Provide a helpful, encouraging, and educational response."""
+        prompt = self.prompts.render('chat',
+                                     references=self._references(message, subject_code),
+                                     chat_history=self.prompts.truncate(chat_history, HISTORY_TOKEN_BUDGET, keep='tail'),
+                                     message=message)
 
+        if stream:
+            return self._stream_or_error('chat_response', prompt, "Error: ")
         try:
-            if stream:
-                # Return streaming response
-                response = self.model.generate_content(prompt, stream=True)
-                for chunk in response:
-                    if chunk.text:
-                        yield chunk.text
-            else:
-                response = self.model.generate_content(prompt)
-                return response.text
+            return self._generate('chat_response', prompt)
         except Exception as e:
-            if stream:
-                yield f"Error: {str(e)}"
-            else:
-                return f"Error: {str(e)}"
+            return f"Error: {str(e)}"
     
     def _markdown_to_pdf_elements(self, md_text, styles):
         """Convert markdown text to PDF elements with proper formatting"""
-        elements = []
-        
-        # Convert markdown to HTML first
-        html = markdown.markdown(md_text, extensions=['extra', 'codehilite', 'fenced_code'])
-        
-        # Parse HTML and create PDF elements
-        lines = md_text.split('\n')
-        i = 0
+        return list(self._iter_pdf_elements(md_text.split('\n'), styles))
+    
+    def _iter_pdf_elements(self, lines, styles):
+        """Yield PDF elements for markdown lines as they are read, from any iterable of lines"""
+        # ReportLab is only needed for PDF export, so import it on first use
+        from reportlab.platypus import Paragraph, Spacer
         
-        while i < len(lines):
-            line = lines[i].strip()
+        lines = iter(lines)
+        for raw_line in lines:
+            line = raw_line.strip()
             
             if not line:
-                elements.append(Spacer(1, 6))
-                i += 1
+                yield Spacer(1, 6)
                 continue
             
             # Handle headings
             if line.startswith('# '):
                 text = line[2:].strip()
-                elements.append(Paragraph(text, styles['Heading1']))
-                elements.append(Spacer(1, 12))
+                yield Paragraph(text, styles['Heading1'])
+                yield Spacer(1, 12)
             elif line.startswith('## '):
                 text = line[3:].strip()
-                elements.append(Paragraph(text, styles['Heading2']))
-                elements.append(Spacer(1, 10))
+                yield Paragraph(text, styles['Heading2'])
+                yield Spacer(1, 10)
             elif line.startswith('### '):
                 text = line[4:].strip()
-                elements.append(Paragraph(text, styles['Heading3']))
-                elements.append(Spacer(1, 8))
+                yield Paragraph(text, styles['Heading3'])
+                yield Spacer(1, 8)
             elif line.startswith('#### '):
                 text = line[5:].strip()
-                elements.append(Paragraph(text, styles['Heading4']))
-                elements.append(Spacer(1, 6))
+                yield Paragraph(text, styles['Heading4'])
+                yield Spacer(1, 6)
             
             # Handle code blocks
             elif line.startswith('```'):
                 code_lines = []
-                i += 1
-                while i < len(lines) and not lines[i].strip().startswith('```'):
-                    code_lines.append(lines[i])
-                    i += 1
+                for code_line in lines:
+                    if code_line.strip().startswith('```'):
+                        break
+                    code_lines.append(code_line.rstrip('\r\n'))
                 if code_lines:
                     code_text = '<br/>'.join(code_lines)
-                    elements.append(Paragraph(f'<font name="Courier" size="9">{code_text}</font>', styles['CustomCode']))
-                    elements.append(Spacer(1, 12))
+                    yield Paragraph(f'<font name="Courier" size="9">{code_text}</font>', styles['CustomCode'])
+                    yield Spacer(1, 12)
             
             # Handle bullet points
             elif line.startswith('- ') or line.startswith('* '):
@@ -378,40 +643,36 @@ Provide a helpful, encouraging, and educational response."""
                 # Convert markdown bold/italic with error handling
                 try:
                     text = self._convert_markdown_inline(text)
-                    elements.append(Paragraph(f'• {text}', styles['Normal']))
+                    yield Paragraph(f'• {text}', styles['Normal'])
                 except Exception as e:
                     # If formatting fails, use plain text
                     from xml.sax.saxutils import escape
-                    elements.append(Paragraph(f'• {escape(line[2:].strip())}', styles['Normal']))
-                elements.append(Spacer(1, 4))
+                    yield Paragraph(f'• {escape(line[2:].strip())}', styles['Normal'])
+                yield Spacer(1, 4)
             
             # Handle numbered lists
             elif re.match(r'^\d+\.\s', line):
                 text = re.sub(r'^\d+\.\s', '', line)
                 try:
                     text = self._convert_markdown_inline(text)
-                    elements.append(Paragraph(text, styles['Normal']))
+                    yield Paragraph(text, styles['Normal'])
                 except Exception:
                     from xml.sax.saxutils import escape
-                    elements.append(Paragraph(escape(text), styles['Normal']))
-                elements.append(Spacer(1, 4))
+                    yield Paragraph(escape(text), styles['Normal'])
+                yield Spacer(1, 4)
             
             # Regular paragraph
             else:
                 try:
                     text = self._convert_markdown_inline(line)
                     if text:
-                        elements.append(Paragraph(text, styles['BodyText']))
-                        elements.append(Spacer(1, 8))
+                        yield Paragraph(text, styles['BodyText'])
+                        yield Spacer(1, 8)
                 except Exception:
                     from xml.sax.saxutils import escape
                     if line:
-                        elements.append(Paragraph(escape(line), styles['BodyText']))
-                        elements.append(Spacer(1, 8))
-            
-            i += 1
-        
-        return elements
+                        yield Paragraph(escape(line), styles['BodyText'])
+                        yield Spacer(1, 8)
     
     def _convert_markdown_inline(self, text):
         """Convert inline markdown (bold, italic, code) to ReportLab format"""
@@ -441,45 +702,24 @@ Provide a helpful, encouraging, and educational response."""
         
         return text
     
-    def _mermaid_to_image(self, mermaid_code):
-        """Convert Mermaid code to HIGH-QUALITY PNG image using Playwright"""
-        try:
-            from playwright.sync_api import sync_playwright
-            
-            print("🎨 Converting mind map to HIGH-QUALITY image using Playwright...")
-            
-            # Create HTML with Mermaid diagram - optimized for quality
-            html_content = f"""
+    def _mermaid_html(self, mermaid_code):
+        """Page that renders Mermaid code to an SVG with plain text labels"""
+        return f"""
             <!DOCTYPE html>
             <html>
             <head>
                 <meta charset="UTF-8">
                 <script src="https://cdn.jsdelivr.net/npm/mermaid@10/dist/mermaid.min.js"></script>
                 <style>
-                    * {{
-                        margin: 0;
-                        padding: 0;
-                        box-sizing: border-box;
-                    }}
                     body {{
                         margin: 0;
-                        padding: 40px;
                         background: white;
-                        display: flex;
-                        justify-content: center;
-                        align-items: center;
-                        min-height: 100vh;
                     }}
                     .mermaid {{
                         background: white;
                         font-family: 'Arial', 'Helvetica', sans-serif;
                         font-size: 16px;
                     }}
-                    /* Ensure high quality text rendering */
-                    svg {{
-                        shape-rendering: geometricPrecision;
-                        text-rendering: geometricPrecision;
-                    }}
                 </style>
             </head>
             <body>
@@ -487,9 +727,12 @@ Provide a helpful, encouraging, and educational response."""
 {mermaid_code}
                 </div>
                 <script>
-                    mermaid.initialize({{ 
-                        startOnLoad: true, 
+                    mermaid.initialize({{
+                        startOnLoad: true,
                         theme: 'default',
+                        // SVG <text> labels instead of HTML in <foreignObject>, so the SVG
+                        // also renders standalone and in PDFs
+                        htmlLabels: false,
                         themeVariables: {{
                             fontSize: '16px',
                             fontFamily: 'Arial, Helvetica, sans-serif'
@@ -503,51 +746,156 @@ Provide a helpful, encouraging, and educational response."""
             </body>
             </html>
             """
+    
+    def _mermaid_to_svg(self, mermaid_code):
+        """Render Mermaid code to an optimized SVG using Playwright"""
+        try:
+            from playwright.sync_api import sync_playwright
             
-            # Use Playwright to render and screenshot at HIGH RESOLUTION
-            with sync_playwright() as p:
-                # Launch browser in headless mode
+            render_start = time.perf_counter()
+            with tracer.span('mindmap.render'), sync_playwright() as p:
                 browser = p.chromium.launch(headless=True)
-                
-                # Create page with HIGH RESOLUTION viewport (2x for retina quality)
-                page = browser.new_page(
-                    viewport={'width': 2400, 'height': 1600},  # 2x resolution for crisp images
-                    device_scale_factor=2  # Retina/HiDPI quality
-                )
-                
-                # Set the HTML content
-                page.set_content(html_content)
-                
-                # Wait for Mermaid to fully render (increased for complex diagrams)
-                page.wait_for_timeout(3000)  # 3 seconds for complete rendering
-                
-                # Take HIGH-QUALITY screenshot of the mermaid element
-                screenshot_bytes = page.locator('.mermaid').screenshot(
-                    type='png',
-                    scale='device',  # Use device scale factor for quality
-                    animations='disabled'  # Ensure stable rendering
-                )
-                
-                browser.close()
-                
-            print("✓ HIGH-QUALITY mind map image created successfully!")
-            print(f"✓ Image size: {len(screenshot_bytes)} bytes")
-            return screenshot_bytes
+                try:
+                    page = browser.new_page()
+                    page.set_content(self._mermaid_html(mermaid_code))
+                    # Mermaid swaps in the finished SVG in one step, so once it exists rendering is done
+                    page.wait_for_selector('.mermaid svg', timeout=MINDMAP_RENDER_TIMEOUT_MS)
+                    svg = page.eval_on_selector('.mermaid svg', 'svg => svg.outerHTML')
+                finally:
+                    browser.close()
+            MINDMAP_RENDER_SECONDS.observe(time.perf_counter() - render_start)
+            
+            if 'aria-roledescription="error"' in svg:
+                print("⚠ Mermaid could not parse the mind map")
+                return None
+            return optimize_svg(svg)
+            
+        except ImportError:
+            print("⚠ Playwright not installed. Installing browsers...")
+            print("ℹ Run: playwright install chromium")
+            return None
+        except Exception as e:
+            print(f"⚠ Mind map rendering failed: {str(e)}")
+            return None
+    
+    def _svg_to_png(self, svg, width):
+        """Rasterize an SVG to a PNG of the given pixel width using Playwright"""
+        try:
+            from playwright.sync_api import sync_playwright
             
+            html_content = f"""<!DOCTYPE html><html><head><style>
+                body {{ margin: 0; background: white; }}
+                svg {{ display: block; width: {width}px !important; height: auto !important; max-width: none !important; }}
+            </style></head><body>{svg}</body></html>"""
+            with tracer.span('mindmap.rasterize', width=width), sync_playwright() as p:
+                browser = p.chromium.launch(headless=True)
+                try:
+                    page = browser.new_page(viewport={'width': width, 'height': 800})
+                    page.set_content(html_content)
+                    return page.locator('svg').first.screenshot(type='png', animations='disabled')
+                finally:
+                    browser.close()
+        
         except ImportError:
             print("⚠ Playwright not installed. Installing browsers...")
             print("ℹ Run: playwright install chromium")
             return None
         except Exception as e:
-            print(f"⚠ Mind map image conversion failed: {str(e)}")
-            print("ℹ Mind map will be included as Mermaid code in PDF")
+            print(f"⚠ Mind map rasterization failed: {str(e)}")
             return None
     
+    def _mermaid_to_image(self, mermaid_code, width=MINDMAP_PNG_WIDTH):
+        """Convert Mermaid code to a PNG image of the given width"""
+        svg = self._mermaid_to_svg(mermaid_code)
+        return self._svg_to_png(svg, width) if svg else None
+    
+    def render_mindmap(self, mermaid_code):
+        """Render a mind map to SVG once and return its content-addressed key, or None on failure.
+        
+        Raises MindmapError for diagrams that cannot be parsed, before any browser is started.
+        """
+        # Diagrams differing only in indentation, ids or fences share one render
+        canonical = normalize_mindmap(mermaid_code)
+        key = ImageStore.key_for(canonical, MINDMAP_RENDER_VARIANT)
+        if self.mindmap_images.get(key, 'svg') is None:
+            svg = self._mermaid_to_svg(canonical)
+            if not svg:
+                return None
+            self.mindmap_images.put(key, 'svg', svg.encode('utf-8'))
+        return key
+    
+    def mindmap_svg_path(self, key):
+        """Path of a rendered mind map SVG, or None if it is not stored"""
+        if not ImageStore.valid_key(key):
+            return None
+        return self.mindmap_images.get(key, 'svg')
+    
+    def mindmap_png_path(self, key, width=MINDMAP_PNG_WIDTH):
+        """Path of a mind map rasterized at width, made from the stored SVG on first request"""
+        if not ImageStore.valid_key(key):
+            return None
+        width = max(MINDMAP_PNG_MIN_WIDTH, min(int(width), MINDMAP_PNG_MAX_WIDTH))
+        ext = f'{width}.png'
+        path = self.mindmap_images.get(key, ext)
+        if path:
+            return path
+        svg_path = self.mindmap_images.get(key, 'svg')
+        if not svg_path:
+            return None
+        with open(svg_path, 'r', encoding='utf-8') as f:
+            png = self._svg_to_png(f.read(), width)
+        if not png:
+            return None
+        return self.mindmap_images.put(key, ext, png)
+    
+    def _mindmap_flowable(self, key):
+        """Mind map for the PDF: vector via svglib when installed, otherwise a raster image"""
+        from reportlab.platypus import Image
+        try:
+            from svglib.svglib import svg2rlg
+            drawing = svg2rlg(self.mindmap_svg_path(key))
+            if drawing is not None and drawing.width and drawing.height:
+                scale = min(PDF_MINDMAP_WIDTH / drawing.width, PDF_MINDMAP_HEIGHT / drawing.height)
+                drawing.scale(scale, scale)
+                drawing.width *= scale
+                drawing.height *= scale
+                drawing.hAlign = 'CENTER'
+                return drawing
+        except ImportError:
+            pass
+        except Exception as e:
+            print(f"⚠ Vector mind map embedding failed, using a raster image: {e}")
+        image_path = self.mindmap_png_path(key, PDF_MINDMAP_RASTER_WIDTH)
+        if not image_path:
+            return None
+        img = Image(image_path, width=PDF_MINDMAP_WIDTH, height=PDF_MINDMAP_HEIGHT, kind='proportional')
+        img.hAlign = 'CENTER'
+        return img
+    
     def generate_pdf_from_notes(self, notes_text, subject_name, exam_type, mindmap_code=None):
         """Generate PDF from study notes with proper markdown formatting and mindmap"""
+        pdf_file = self.write_pdf_from_notes(notes_text.split('\n'), subject_name, exam_type, mindmap_code)
+        if pdf_file is None:
+            return None
+        with pdf_file:
+            return pdf_file.read()
+    
+    def write_pdf_from_notes(self, notes_lines, subject_name, exam_type, mindmap_code=None):
+        """Lay out markdown notes into a spooled temporary file and return it rewound, or None on failure.
+
+        Notes are parsed from notes_lines (any iterable of lines, such as an
+        uploaded file) while the layout consumes them, so neither the notes
+        nor all of their flowables are held in memory at once.
+        """
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
+        from reportlab.lib.enums import TA_CENTER
+        from reportlab.lib import colors
+        
+        pdf_file = tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_BYTES)
         try:
-            buffer = BytesIO()
-            doc = SimpleDocTemplate(buffer, pagesize=A4,
+            doc = SimpleDocTemplate(pdf_file, pagesize=A4,
                                   rightMargin=72, leftMargin=72,
                                   topMargin=72, bottomMargin=36)
             
@@ -612,57 +960,48 @@ Provide a helpful, encouraging, and educational response."""
             elements.append(Paragraph('<hr/>', styles['Normal']))
             elements.append(Spacer(1, 20))
             
-            # Convert markdown notes to PDF elements
-            note_elements = self._markdown_to_pdf_elements(notes_text, styles)
-            elements.extend(note_elements)
-            
-            # Add mindmap if provided
-            # Add mind map section if available
-            temp_img_path = None  # Track temp file for cleanup
+            # Add mind map section if available; notes are parsed in between while the layout runs
+            mindmap_elements = []
             if mindmap_code:
-                elements.append(PageBreak())
-                elements.append(Paragraph("Mind Map", styles['CustomHeading1']))
-                elements.append(Spacer(1, 12))
+                mindmap_elements.append(PageBreak())
+                mindmap_elements.append(Paragraph("Mind Map", styles['CustomHeading1']))
+                mindmap_elements.append(Spacer(1, 12))
                 
-                # Try to convert mermaid to image
-                mindmap_image = self._mermaid_to_image(mindmap_code)
+                # Render once per distinct mind map; later exports reuse the stored SVG
+                try:
+                    image_key = self.render_mindmap(mindmap_code)
+                except MindmapError as e:
+                    print(f"⚠ Invalid mind map skipped: {e}")
+                    image_key = None
+                flowable = self._mindmap_flowable(image_key) if image_key else None
                 
-                if mindmap_image:
-                    # Save HIGH-QUALITY image to temporary file (delete=False so it persists)
-                    with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp_img:
-                        tmp_img.write(mindmap_image)
-                        temp_img_path = tmp_img.name
-                    
-                    # Add HIGH-QUALITY image to PDF with better sizing
-                    # Using larger dimensions and proportional scaling for crisp output
-                    img = Image(temp_img_path, width=500, height=350, kind='proportional')
-                    img.hAlign = 'CENTER'  # Center the image
-                    elements.append(img)
-                    elements.append(Spacer(1, 12))
-                    elements.append(Paragraph(
+                if flowable is not None:
+                    mindmap_elements.append(flowable)
+                    mindmap_elements.append(Spacer(1, 12))
+                    mindmap_elements.append(Paragraph(
                         '<i>High-resolution mind map visualization</i>', 
                         styles['Normal']
                     ))
                 else:
                     # If image conversion failed, add mermaid code as text
-                    elements.append(Paragraph("Mind Map Diagram (Mermaid Code):", styles['Heading3']))
-                    elements.append(Spacer(1, 6))
+                    mindmap_elements.append(Paragraph("Mind Map Diagram (Mermaid Code):", styles['Heading3']))
+                    mindmap_elements.append(Spacer(1, 6))
                     code_text = mindmap_code.replace('\n', '<br/>')
-                    elements.append(Paragraph(f'<font name="Courier" size="8">{code_text}</font>', styles['CustomCode']))
-            
-            # Build PDF (reads the temp image file if it exists)
-            doc.build(elements)
-            
-            # Clean up temp image file AFTER PDF is built
-            if temp_img_path and os.path.exists(temp_img_path):
-                os.unlink(temp_img_path)
+                    mindmap_elements.append(Paragraph(f'<font name="Courier" size="8">{code_text}</font>', styles['CustomCode']))
             
-            # Get the value of the BytesIO buffer
-            pdf = buffer.getvalue()
-            buffer.close()
+            # Build PDF (reads the stored mind map image if there is one). Notes are parsed inside the
+            # layout, so their share of the build is timed separately
+            notes_elements = _TimedIterator(self._iter_pdf_elements(notes_lines, styles))
+            with tracer.span('pdf.build') as span, PDF_BUILD_SECONDS.time():
+                doc.build(_FlowableStream(chain(elements, notes_elements, mindmap_elements)))
+                span.set_attribute('markdown_ms', round(notes_elements.seconds * 1000, 2))
+                span.set_attribute('markdown_elements', notes_elements.count)
+            PDF_MARKDOWN_SECONDS.observe(notes_elements.seconds)
             
-            return pdf
+            pdf_file.seek(0)
+            return pdf_file
         except Exception as e:
+            pdf_file.close()
             print(f"Error generating PDF: {str(e)}")
             import traceback
             traceback.print_exc()
@@ -0,0 +1,61 @@
+import hashlib
+import os
+import re
+import tempfile
+from utils.metrics import CACHE_REQUESTS
+
+KEY_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+class ImageStore:
+    """Content-addressed directory of rendered images, shared by every worker on a node"""
+
+    def __init__(self, directory, max_files=256, name='mindmap_images'):
+        self.directory = directory
+        self.max_files = max_files
+        self._hits = CACHE_REQUESTS.labels(cache=name, result='hit')
+        self._misses = CACHE_REQUESTS.labels(cache=name, result='miss')
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key_for(source, variant=''):
+        """Key identifying the image rendered from source with the given render settings"""
+        return hashlib.sha256(f'{variant}\n{source}'.encode('utf-8')).hexdigest()[:32]
+
+    @staticmethod
+    def valid_key(key):
+        return bool(KEY_PATTERN.match(key))
+
+    def _path(self, key, ext):
+        return os.path.join(self.directory, f'{key}.{ext}')
+
+    def get(self, key, ext):
+        """Path of the stored image, or None if it has not been rendered"""
+        path = self._path(key, ext)
+        if os.path.exists(path):
+            self._hits.inc()
+            return path
+        self._misses.inc()
+        return None
+
+    def put(self, key, ext, data):
+        """Store image bytes atomically and return the file path"""
+        path = self._path(key, ext)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self._prune()
+        return path
+
+    def _prune(self):
+        """Remove the oldest images beyond max_files"""
+        entries = [e for e in os.scandir(self.directory) if e.is_file() and not e.name.endswith('.tmp')]
+        if len(entries) <= self.max_files:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_files]:
+            try:
+                os.unlink(entry.path)
+            except OSError:
+                pass
@@ -0,0 +1,147 @@
+import re
+
+# Node shapes as (open, close) delimiters, longest first so '((' is not read as '('
+SHAPES = (('((', '))'), ('))', '(('), ('{{', '}}'), ('(', ')'), (')', '('), ('[', ']'))
+INDENT = '  '
+TAB_WIDTH = 4
+# A diagram needing more repairs than this is treated as a bad generation, not fixed up
+MAX_REPAIRS = 5
+
+# Characters that would be read as shape delimiters or break the page, as Mermaid entity codes
+_ESCAPES = {'(': '#40;', ')': '#41;', '[': '#91;', ']': '#93;', '{': '#123;', '}': '#125;',
+            '"': '#quot;', '<': '#lt;', '>': '#gt;'}
+_ESCAPE_PATTERN = re.compile('|'.join(re.escape(c) for c in _ESCAPES))
+_NODE_PATTERN = re.compile(r'^(?P<id>[^\s()\[\]{}]*)(?P<open>\(\(|\)\)|\{\{|\(|\)|\[)(?P<text>.*)$')
+_LIST_MARKER = re.compile(r'^(?:[-*+]|\d+[.)])\s+')
+_FENCE = re.compile(r'^```')
+
+
+class MindmapError(ValueError):
+    """Raised when a diagram cannot be read as a Mermaid mindmap"""
+
+
+class MindmapNode:
+    """A mindmap node: its shape delimiters, label and children"""
+
+    def __init__(self, text, shape=None):
+        self.text = text
+        self.shape = shape
+        self.children = []
+        # ::icon(...) and :::class lines that decorate this node
+        self.decorations = []
+
+    def lines(self, depth, counter):
+        """Canonical lines for this node and its subtree"""
+        indent = INDENT * (depth + 1)
+        text = _ESCAPE_PATTERN.sub(lambda m: _ESCAPES[m.group(0)], self.text)
+        if self.shape is None:
+            line = text
+        else:
+            # Ids are not displayed, so they are numbered by position to keep the form canonical
+            counter[0] += 1
+            line = f'n{counter[0]}{self.shape[0]}{text}{self.shape[1]}'
+        result = [indent + line]
+        result.extend(INDENT * (depth + 2) + d for d in self.decorations)
+        for child in self.children:
+            result.extend(child.lines(depth + 1, counter))
+        return result
+
+
+def _parse_node(text):
+    """Node for one line of diagram text, or None if it has no label"""
+    match = _NODE_PATTERN.match(text)
+    if match:
+        rest = match.group('open') + match.group('text')
+        for open_, close in SHAPES:
+            if rest.startswith(open_) and rest.endswith(close) and len(rest) >= len(open_) + len(close):
+                label = rest[len(open_):len(rest) - len(close)].strip()
+                if len(label) >= 2 and label[0] == label[-1] == '"':
+                    label = label[1:-1].strip()
+                label = ' '.join(label.split())
+                if label:
+                    return MindmapNode(label, (open_, close))
+                return MindmapNode(match.group('id')) if match.group('id') else None
+    text = ' '.join(_LIST_MARKER.sub('', text).split())
+    return MindmapNode(text) if text else None
+
+
+def parse_mindmap(code):
+    """Parse Mermaid mindmap text into its root node, repairing what can be repaired.
+
+    Returns (root, repairs) where repairs lists what was changed. Raises
+    MindmapError when there is neither a mindmap header nor a shaped root
+    node (so plain prose is not taken for a diagram), when no nodes remain,
+    or when more than MAX_REPAIRS repairs would be needed.
+    """
+    if not code or not code.strip():
+        raise MindmapError('Mind map is empty')
+    repairs = []
+    lines = [line.expandtabs(TAB_WIDTH).rstrip() for line in code.splitlines()]
+    lines = [line for line in lines if line.strip() and not _FENCE.match(line.strip())
+             and not line.strip().startswith('%%')]
+    headers = [i for i, line in enumerate(lines) if line.strip() == 'mindmap']
+    if headers:
+        if headers[0] > 0:
+            repairs.append('dropped text before the mindmap header')
+        lines = lines[headers[0] + 1:]
+    else:
+        root_line = _parse_node(lines[0].strip()) if lines else None
+        if root_line is None or root_line.shape is None:
+            raise MindmapError('Text has no mindmap header or root node')
+        repairs.append('added missing mindmap header')
+
+    root = None
+    # Stack of (indentation, node) for the current branch
+    stack = []
+    for line in lines:
+        indent = len(line) - len(line.lstrip())
+        text = line.strip()
+        if text.startswith('::'):
+            if stack:
+                stack[-1][1].decorations.append(text)
+            continue
+        node = _parse_node(text)
+        if node is None:
+            repairs.append(f'dropped empty node {text!r}')
+            continue
+        if root is None:
+            root = node
+            root_indent = indent
+            stack = [(indent, node)]
+            continue
+        while stack and stack[-1][0] >= indent:
+            stack.pop()
+        if indent <= root_indent:
+            # Mermaid allows only one root; hang extra top-level nodes under it
+            repairs.append(f'moved second root {node.text!r} under the root')
+        if not stack:
+            stack = [(indent - 1, root)]
+        stack[-1][1].children.append(node)
+        stack.append((indent, node))
+
+    if root is None:
+        raise MindmapError('Mind map has no nodes')
+    if len(repairs) > MAX_REPAIRS:
+        raise MindmapError(f'Mind map needed {len(repairs)} repairs, starting with: {"; ".join(repairs[:3])}')
+    return root, repairs
+
+
+def repair_mindmap(code):
+    """Canonical Mermaid text for a mindmap and the list of repairs made to reach it"""
+    root, repairs = parse_mindmap(code)
+    return '\n'.join(['mindmap'] + root.lines(0, [0])), repairs
+
+
+def normalize_mindmap(code):
+    """Canonical Mermaid text for a mindmap: consistent indentation, escaped labels, positional ids"""
+    return repair_mindmap(code)[0]
+
+
+def build_mindmap(root_text, branches):
+    """Canonical mindmap from a root label and a list of (label, [child labels])"""
+    root = MindmapNode(root_text, ('((', '))'))
+    for label, children in branches:
+        node = MindmapNode(label)
+        node.children = [MindmapNode(child) for child in children if child]
+        root.children.append(node)
+    return '\n'.join(['mindmap'] + root.lines(0, [0]))
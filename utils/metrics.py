@@ -0,0 +1,426 @@
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from fast cache hits up to long model streams
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+BYTE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds between snapshots each worker writes to METRICS_DIR
+FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', '5'))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Base class for metrics with optional labels"""
+
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._new_child()
+
+    def labels(self, **labels):
+        """Child metric for the given label values"""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _items(self):
+        if not self.labelnames:
+            return [((), self._default)]
+        with self._lock:
+            return sorted(self._children.items())
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for labelvalues, child in self._items():
+            lines.extend(child.render(self.name, self.labelnames, labelvalues))
+        return lines
+
+    def snapshot(self):
+        """Label values and state of every child, as JSON-serialisable pairs"""
+        return [[list(labelvalues), child.snapshot()] for labelvalues, child in self._items()]
+
+    def merged(self, snapshots):
+        """Copy of this metric holding the given snapshots added together"""
+        metric = self._copy()
+        for snapshot in snapshots:
+            for labelvalues, state in snapshot:
+                child = metric.labels(**dict(zip(self.labelnames, labelvalues))) if self.labelnames \
+                    else metric._default
+                metric._merge_child(child, state)
+        return metric
+
+    def _merge_child(self, child, state):
+        child.merge(state)
+
+    def _copy(self):
+        return type(self)(self.name, self.documentation, self.labelnames)
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+    def merge(self, value):
+        self.inc(value)
+
+    def render(self, name, labelnames, labelvalues):
+        return [f'{name}{_format_labels(labelnames, labelvalues)} {_format_value(self.value)}']
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+
+class _GaugeChild(_CounterChild):
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+
+class Gauge(_Metric):
+    """Value that can go up and down
+
+    Across worker processes the values of running workers are summed, or with
+    aggregate='max' the largest is kept (for values every worker sets alike).
+    Workers that have exited drop out.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), aggregate='sum'):
+        self.aggregate = aggregate
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def _copy(self):
+        return Gauge(self.name, self.documentation, self.labelnames, self.aggregate)
+
+    def _merge_child(self, child, state):
+        if self.aggregate == 'max':
+            child.set(max(child.value, state))
+        else:
+            child.merge(state)
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def dec(self, amount=1):
+        self._default.dec(amount)
+
+    def set(self, value):
+        self._default.set(value)
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {'counts': list(self.counts), 'sum': self.sum, 'count': self.count}
+
+    def merge(self, state):
+        with self._lock:
+            self.counts = [a + b for a, b in zip(self.counts, state['counts'])]
+            self.sum += state['sum']
+            self.count += state['count']
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def render(self, name, labelnames, labelvalues):
+        with self._lock:
+            counts = list(self.counts)
+            total, count = self.sum, self.count
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            labels = _format_labels(labelnames, labelvalues, ('le', _format_value(float(bound))))
+            lines.append(f'{name}_bucket{labels} {cumulative}')
+        plain = _format_labels(labelnames, labelvalues)
+        lines.append(f'{name}_sum{plain} {_format_value(total)}')
+        lines.append(f'{name}_count{plain} {count}')
+        return lines
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _copy(self):
+        return Histogram(self.name, self.documentation, self.labelnames, self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+
+def metrics_directory():
+    """Directory worker processes share their metrics through, or None"""
+    return os.getenv('METRICS_DIR') or None
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered in the Prometheus text format
+
+    Metrics live in each process's memory. When METRICS_DIR is set, every
+    worker writes a snapshot to <pid>.json there (on each scrape and every
+    FLUSH_SECONDS in the background) and /metrics renders the sum over all
+    snapshots, so any worker answers a scrape with totals for the whole server.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._flusher_pid = None
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), aggregate='sum'):
+        return self.register(Gauge(name, documentation, labelnames, aggregate))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        directory = metrics_directory()
+        if directory:
+            self.start_flusher()
+            self.flush()
+            snapshots = _load_snapshots(directory)
+            return self._render([metric.merged([snapshot[metric.name] for snapshot in snapshots
+                                                if metric.name in snapshot])
+                                 for metric in self._metrics])
+        return self._render(self._metrics)
+
+    @staticmethod
+    def _render(metrics):
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        return {metric.name: metric.snapshot() for metric in self._metrics}
+
+    def flush(self):
+        """Write this process's snapshot to METRICS_DIR"""
+        directory = metrics_directory()
+        if not directory:
+            return
+        try:
+            os.makedirs(directory, exist_ok=True)
+            _write_json(os.path.join(directory, f'{os.getpid()}.json'), self.snapshot())
+        except OSError as e:
+            print(f"⚠ Could not write metrics snapshot: {e}")
+
+    def start_flusher(self):
+        """Flush every FLUSH_SECONDS on a daemon thread; once per process, so call it after forking"""
+        if not metrics_directory() or self._flusher_pid == os.getpid():
+            return
+        self._flusher_pid = os.getpid()
+
+        def run():
+            while True:
+                time.sleep(FLUSH_SECONDS)
+                self.flush()
+
+        threading.Thread(target=run, name='metrics-flush', daemon=True).start()
+
+    def mark_process_dead(self, pid):
+        """Keep an exited worker's counters and histograms, but drop its gauges"""
+        directory = metrics_directory()
+        if not directory:
+            return
+        path = os.path.join(directory, f'{pid}.json')
+        try:
+            with open(path, encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return
+        gauges = {metric.name for metric in self._metrics if metric.kind == 'gauge'}
+        kept = {name: state for name, state in snapshot.items() if name not in gauges}
+        try:
+            _write_json(os.path.join(directory, f'dead-{pid}-{time.time_ns()}.json'), kept)
+            os.remove(path)
+        except OSError as e:
+            print(f"⚠ Could not retire metrics of worker {pid}: {e}")
+
+
+def clear_directory():
+    """Remove snapshots left by an earlier run of the server"""
+    directory = metrics_directory()
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        os.remove(path)
+
+
+def _load_snapshots(directory):
+    snapshots = []
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        try:
+            with open(path, encoding='utf-8') as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            # A worker retired between listing and reading
+            continue
+    return snapshots
+
+
+def _write_json(path, data):
+    # Write then rename so a scrape never reads a half-written snapshot
+    tmp_path = f'{path}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+REGISTRY = MetricsRegistry()
+
+# HTTP
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Time to produce a response (excluding streamed bodies)',
+    ('route', 'method', 'status'))
+
+# Gemini
+GEMINI_TTFT_SECONDS = REGISTRY.histogram(
+    'gemini_time_to_first_token_seconds', 'Time from model call to first response chunk', ('method',))
+GEMINI_DURATION_SECONDS = REGISTRY.histogram(
+    'gemini_request_duration_seconds', 'Total duration of a model call', ('method',))
+GEMINI_ERRORS = REGISTRY.counter(
+    'gemini_errors_total', 'Model calls that raised an error', ('method',))
+GEMINI_RATE_LIMIT_WAIT_SECONDS = REGISTRY.histogram(
+    'gemini_rate_limit_wait_seconds', 'Time a model call waited for the request rate limit', ('method',))
+PROMPT_TOKENS = REGISTRY.histogram(
+    'prompt_tokens', 'Estimated tokens per rendered prompt', ('template',), TOKEN_BUCKETS)
+PROMPT_TEMPLATE_INFO = REGISTRY.gauge(
+    'prompt_template_info', 'Version hash of each prompt template, always 1', ('template', 'version'),
+    aggregate='max')
+
+# Rendering and PDF export
+MINDMAP_RENDER_SECONDS = REGISTRY.histogram(
+    'mindmap_render_seconds', 'Time to render a mind map in the headless browser')
+MINDMAP_GENERATIONS = REGISTRY.counter(
+    'mindmap_generations_total', 'Model-generated mind maps by outcome: clean, repaired or rejected',
+    ('outcome',))
+PDF_BUILD_SECONDS = REGISTRY.histogram(
+    'pdf_build_seconds', 'Time spent laying out and writing a study notes PDF')
+PDF_MARKDOWN_SECONDS = REGISTRY.histogram(
+    'pdf_markdown_seconds', 'Part of a PDF build spent reading and parsing the markdown notes')
+
+# Server-sent event streams
+SSE_ACTIVE_STREAMS = REGISTRY.gauge(
+    'sse_active_streams', 'Server-sent event streams currently open', ('route',))
+SSE_STREAM_CHUNKS = REGISTRY.histogram(
+    'sse_stream_chunks', 'Frames sent per server-sent event stream', ('route',), COUNT_BUCKETS)
+SSE_STREAM_BYTES = REGISTRY.histogram(
+    'sse_stream_bytes', 'Bytes sent per server-sent event stream', ('route',), BYTE_BUCKETS)
+
+# Caches and data access
+CACHE_REQUESTS = REGISTRY.counter(
+    'cache_requests_total', 'Cache lookups by cache and result', ('cache', 'result'))
+DB_LOAD_SECONDS = REGISTRY.histogram(
+    'db_load_seconds', 'Time to load a JSON data file', ('file',))
+
+# Study sessions
+SESSION_WRITE_BATCH = REGISTRY.histogram(
+    'session_write_batch_size', 'Study sessions written per batch', buckets=COUNT_BUCKETS)
+
+# Speculative prefetching
+PREFETCH_TASKS = REGISTRY.counter(
+    'prefetch_tasks_total', 'Prefetch intents by outcome', ('outcome',))
+PREFETCH_GENERATED = REGISTRY.counter(
+    'prefetch_generated_total', 'Study content pieces generated ahead of a request')
@@ -0,0 +1,154 @@
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+
+DEFAULT_MODEL_NAME = 'gemini-2.5-flash'
+
+
+class GeminiBackend:
+    """Google Gemini model backend"""
+
+    def __init__(self, model_name=DEFAULT_MODEL_NAME):
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate_content(self, prompt, stream=False):
+        return self.model.generate_content(prompt, stream=stream)
+
+
+class FakeBackendError(RuntimeError):
+    """Error injected by the fake backend"""
+
+
+class FakeChunk:
+    """Response chunk mirroring the shape of a Gemini response"""
+
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeBackend:
+    """Deterministic local stand-in for the Gemini API
+
+    Responses are derived from the prompt, so the same prompt always yields
+    the same text. Latency is modelled as a fixed time to first token plus a
+    token rate, and errors are injected at a configurable rate.
+    """
+
+    def __init__(self, latency=0.05, tokens_per_second=400.0, chunk_tokens=8,
+                 response_tokens=300, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.chunk_tokens = max(1, chunk_tokens)
+        self.response_tokens = response_tokens
+        self.error_rate = error_rate
+        self.seed = seed
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Build a fake backend configured from FAKE_MODEL_* environment variables"""
+        return cls(
+            latency=float(os.getenv('FAKE_MODEL_LATENCY', '0.05')),
+            tokens_per_second=float(os.getenv('FAKE_MODEL_TOKENS_PER_SECOND', '400')),
+            chunk_tokens=int(os.getenv('FAKE_MODEL_CHUNK_TOKENS', '8')),
+            response_tokens=int(os.getenv('FAKE_MODEL_RESPONSE_TOKENS', '300')),
+            error_rate=float(os.getenv('FAKE_MODEL_ERROR_RATE', '0')),
+            seed=int(os.getenv('FAKE_MODEL_SEED', '0'))
+        )
+
+    def generate_content(self, prompt, stream=False):
+        with self._lock:
+            call_index = self.calls
+            self.calls += 1
+        if self.error_rate and random.Random(f'{self.seed}:{call_index}').random() < self.error_rate:
+            raise FakeBackendError(f'Injected fake backend error (call {call_index})')
+
+        text = self._response_text(prompt)
+        if stream:
+            return self._stream(text)
+        time.sleep(self.latency + self._token_count(text) / self.tokens_per_second)
+        return FakeChunk(text)
+
+    def _stream(self, text):
+        """Yield the response in chunks paced by the configured token rate"""
+        time.sleep(self.latency)
+        tokens = re.findall(r'\S+\s*', text)
+        for start in range(0, len(tokens), self.chunk_tokens):
+            piece = tokens[start:start + self.chunk_tokens]
+            time.sleep(len(piece) / self.tokens_per_second)
+            yield FakeChunk(''.join(piece))
+
+    @staticmethod
+    def _token_count(text):
+        return len(text.split())
+
+    def _response_text(self, prompt):
+        """Deterministic response text shaped like what the prompt asks for"""
+        digest = hashlib.sha256(f'{self.seed}:{prompt}'.encode('utf-8')).hexdigest()
+        rng = random.Random(digest)
+        subject = self._prompt_field(prompt, 'Subject') or 'Subject'
+
+        if 'one line per session' in prompt:
+            sessions = re.findall(r'^(\d+)\. ', prompt, re.MULTILINE)
+            return '\n'.join(f'{n} | {self._phrase(rng, 3).title()} | {self._phrase(rng, 8)}' for n in sessions)
+
+        if 'JSON array' in prompt:
+            match = re.search(r'EXACTLY (\d+) flashcards', prompt)
+            count = int(match.group(1)) if match else 5
+            cards = [{'question': f'What is {self._phrase(rng, 3)}?', 'answer': self._phrase(rng, 20)}
+                     for _ in range(count)]
+            return json.dumps(cards)
+
+        if 'Mermaid' in prompt:
+            lines = ['mindmap', f'  root(({subject}))']
+            for module in re.findall(r'^Module: \d+: ([^-\n]+)', prompt, re.MULTILINE) or ['Overview']:
+                lines.append(f'    {module.strip()}')
+                for _ in range(3):
+                    lines.append(f'      {self._phrase(rng, 2).title()}')
+            return '\n'.join(lines)
+
+        parts = [f'## {subject}\n']
+        words = 0
+        while words < self.response_tokens:
+            parts.append(f'### {self._phrase(rng, 3).title()}\n')
+            paragraph = self._phrase(rng, 40)
+            parts.append(f'{paragraph} **{self._phrase(rng, 2)}** and `{self._phrase(rng, 1)}`.\n')
+            for _ in range(3):
+                parts.append(f'- {self._phrase(rng, 10)}')
+            parts.append('')
+            words += 60
+        return '\n'.join(parts)
+
+    @staticmethod
+    def _prompt_field(prompt, name):
+        match = re.search(rf'^{name}: (.+)$', prompt, re.MULTILINE)
+        return match.group(1).strip() if match else None
+
+    @staticmethod
+    def _phrase(rng, length):
+        return ' '.join(rng.choice(FAKE_WORDS) for _ in range(length))
+
+
+FAKE_WORDS = (
+    'array list stack queue tree graph node edge pointer index hash table key value '
+    'search sort merge insert delete traverse balance rotate heap priority memory '
+    'complexity algorithm recursion iteration invariant boundary example definition '
+    'property theorem proof query schema relation join transaction lock process thread'
+).split()
+
+
+def create_backend(name=None):
+    """Create the model backend selected by MODEL_BACKEND ('gemini' or 'fake')"""
+    name = (name or os.getenv('MODEL_BACKEND', 'gemini')).lower()
+    if name == 'fake':
+        return FakeBackend.from_env()
+    if name == 'gemini':
+        return GeminiBackend(os.getenv('GEMINI_MODEL', DEFAULT_MODEL_NAME))
+    raise ValueError(f"Unknown model backend: {name}")
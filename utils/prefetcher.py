@@ -0,0 +1,190 @@
+"""Speculative generation of study content a user has just selected.
+
+Each user's current selection (intent) and every running task are recorded
+in the state table of the SQLite shared cache when SHARED_CACHE_PATH is set,
+apart from cached content, so trimming or clearing the cache never drops them.
+Under several gunicorn workers a selection or cancel handled by one worker
+stops a task running in another, and a subject already being prefetched
+elsewhere is joined rather than started twice. Without a shared cache this state lives in
+the process only, which is correct for a single worker. PREFETCH_MAX_PENDING
+always caps the tasks of one worker process.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils.metrics import PREFETCH_TASKS, PREFETCH_GENERATED
+
+# Speculative work gets its own small pool so it never occupies the model workers real requests use
+PREFETCH_WORKERS = int(os.getenv('PREFETCH_WORKERS', '1'))
+# Intents beyond this many queued or running are dropped rather than queued
+PREFETCH_MAX_PENDING = int(os.getenv('PREFETCH_MAX_PENDING', '4'))
+# Running tasks re-read shared intents at most this often
+SHARED_CHECK_SECONDS = 0.5
+# A task marker older than this belongs to a worker that died mid-prefetch
+TASK_MARKER_TTL_SECONDS = 300
+# Stored intent of a user who cancelled, so it cannot be mistaken for a missing record
+NO_INTENT = 'none'
+
+
+class PrefetchTask:
+    """One subject and exam type being prefetched for the users who asked for it"""
+
+    def __init__(self, key, user_id):
+        self.key = key
+        self.users = {user_id}
+        self.cancelled = threading.Event()
+
+
+class _Cancellation:
+    """Event-like view of a task that also counts as set once no user wants it in the shared intents"""
+
+    def __init__(self, prefetcher, task):
+        self.prefetcher = prefetcher
+        self.task = task
+        self._checked = time.monotonic()
+
+    def is_set(self):
+        if not self.task.cancelled.is_set() and time.monotonic() - self._checked >= SHARED_CHECK_SECONDS:
+            self._checked = time.monotonic()
+            if not self.prefetcher._wanted(self.task):
+                with self.prefetcher._lock:
+                    self.prefetcher._cancel(self.task)
+        return self.task.cancelled.is_set()
+
+    def wait(self, timeout):
+        self.task.cancelled.wait(timeout)
+        return self.is_set()
+
+
+class Prefetcher:
+    """Low-priority background generation of the study content a user has just selected"""
+
+    def __init__(self, gemini, shared=None, workers=PREFETCH_WORKERS, max_pending=PREFETCH_MAX_PENDING):
+        self.gemini = gemini
+        self.shared = shared
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='prefetch')
+        self._tasks = {}
+        self._intents = {}
+        self._lock = threading.Lock()
+
+    def request(self, user_id, subject_code, exam_type, subject_info):
+        """Start prefetching for a user's selection, cancelling their previous one; returns the outcome"""
+        key = (subject_code, exam_type)
+        self._publish_intent(user_id, key)
+        with self._lock:
+            previous = self._intents.get(user_id)
+            if previous is not None and previous != key:
+                self._release(user_id, previous)
+            self._intents[user_id] = key
+            task = self._tasks.get(key)
+            if task is not None and not task.cancelled.is_set():
+                task.users.add(user_id)
+                outcome = 'joined'
+            elif self._join_elsewhere(user_id, key):
+                del self._intents[user_id]
+                outcome = 'joined'
+            elif len(self._tasks) - (key in self._tasks) >= self.max_pending:
+                # A cancelled task for the same key is replaced, so it does not count
+                del self._intents[user_id]
+                outcome = 'dropped'
+            else:
+                task = self._tasks[key] = PrefetchTask(key, user_id)
+                self._set_marker(key, [user_id])
+                outcome = 'queued'
+        if outcome == 'queued':
+            self._executor.submit(self._run, task, subject_info)
+        PREFETCH_TASKS.labels(outcome=outcome).inc()
+        return outcome
+
+    def cancel(self, user_id):
+        """Stop prefetching for a user who has moved on"""
+        self._publish_intent(user_id, None)
+        with self._lock:
+            key = self._intents.pop(user_id, None)
+            if key is not None:
+                self._release(user_id, key)
+
+    def _release(self, user_id, key):
+        # Called with the lock held; the task stops once nobody wants it
+        task = self._tasks.get(key)
+        if task is not None:
+            task.users.discard(user_id)
+            if not task.users and not self._wanted(task):
+                self._cancel(task)
+
+    def _cancel(self, task):
+        # Called with the lock held; the marker goes at once so a quick reselect starts a new task
+        if task.cancelled.is_set():
+            return
+        task.cancelled.set()
+        PREFETCH_TASKS.labels(outcome='cancelled').inc()
+        if self._tasks.get(task.key) is task:
+            self._clear_marker(task.key)
+
+    def _publish_intent(self, user_id, key):
+        if self.shared is not None:
+            self.shared.set_state(('prefetch_intent', user_id), list(key) if key else NO_INTENT)
+
+    def _intent(self, user_id):
+        intent = self.shared.get_state(('prefetch_intent', user_id), NO_INTENT)
+        return None if intent == NO_INTENT else tuple(intent)
+
+    def _marker(self, key):
+        """Users of a task running in any worker, or None when no live task has the key"""
+        if self.shared is None:
+            return None
+        marker = self.shared.get_state(('prefetch_task',) + key)
+        if marker is None or time.time() - marker['started'] > TASK_MARKER_TTL_SECONDS:
+            return None
+        return marker
+
+    def _set_marker(self, key, users, started=None):
+        if self.shared is not None:
+            self.shared.set_state(('prefetch_task',) + key, {'owner': self._owner(), 'users': sorted(users),
+                                                             'started': started or time.time()})
+
+    def _owner(self):
+        # Differs between forked workers and between prefetchers in one process
+        return f'{os.getpid()}:{id(self)}'
+
+    def _clear_marker(self, key):
+        if self.shared is not None:
+            self.shared.delete_state(('prefetch_task',) + key)
+
+    def _join_elsewhere(self, user_id, key):
+        """Add the user to a task another worker is running for key; False when there is none"""
+        marker = self._marker(key)
+        # A marker of our own can only belong to a cancelled task that is still winding down
+        if marker is None or marker.get('owner') == self._owner():
+            return False
+        self.shared.set_state(('prefetch_task',) + key, dict(marker, users=sorted(set(marker['users']) | {user_id})))
+        return True
+
+    def _wanted(self, task):
+        """Whether any user of the task, in this worker or another, still has it as their intent"""
+        if self.shared is None:
+            return bool(task.users)
+        marker = self._marker(task.key) or {}
+        users = set(task.users) | set(marker.get('users', []))
+        return any(self._intent(u) == task.key for u in users)
+
+    def _run(self, task, subject_info):
+        try:
+            if not task.cancelled.is_set():
+                subject_code, exam_type = task.key
+                generated = self.gemini.prefetch_study_content(subject_code, exam_type, subject_info,
+                                                               _Cancellation(self, task))
+                PREFETCH_GENERATED.inc(generated)
+        except Exception as e:
+            print(f"Error prefetching {task.key}: {e}")
+        finally:
+            with self._lock:
+                # A task replaced after a cancel leaves the marker and intents to its replacement
+                if self._tasks.get(task.key) is task:
+                    del self._tasks[task.key]
+                    self._clear_marker(task.key)
+                    for user_id in task.users:
+                        if self._intents.get(user_id) == task.key:
+                            del self._intents[user_id]
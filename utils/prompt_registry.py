@@ -0,0 +1,206 @@
+import hashlib
+import string
+from utils.metrics import PROMPT_TOKENS, PROMPT_TEMPLATE_INFO
+
+EXAM_TYPE_TEXT = {
+    'internal1': 'Internal 1 (Modules 1-2)',
+    'internal2': 'Internal 2 (Modules 1-4)',
+    'internal3': 'Internal 3 (Modules 5-6)',
+    'semester': 'Semester Exam (All Modules)'
+}
+
+# Rough characters-per-token ratio used for prompt size estimates
+CHARS_PER_TOKEN = 4
+
+TEMPLATES = {
+    'module_notes': """Generate comprehensive study notes for {module_line}.
+
+Subject: {subject_name}
+Module: {module_name}
+
+Please provide:
+1. Key concepts and definitions
+2. Important formulas and algorithms (if applicable)
+3. Real-world examples and applications
+4. Important points to remember
+5. Common mistakes to avoid
+
+Start with a level-2 markdown heading containing the module name.
+Format the response in markdown with clear headings, bullet points, and code examples where applicable.
+Make it comprehensive but concise, suitable for exam preparation.""",
+
+    'module_flashcards': """Create EXACTLY {count} flashcards for {subject_name}.
+
+Subject: {subject_name}
+Module:
+{module_line}
+
+Generate flashcards covering:
+- Important concepts and definitions
+- Key formulas and algorithms
+- Important facts and figures
+- Common interview questions
+
+Return ONLY a valid JSON array with this exact format (no additional text):
+[
+  {{"question": "What is...", "answer": "..."}},
+  {{"question": "Explain...", "answer": "..."}}
+]
+
+IMPORTANT: Generate EXACTLY {count} flashcards, no more, no less.
+Make sure questions are clear and answers are concise but complete.""",
+
+    'mindmap': """Create a mind map in Mermaid.js syntax for {subject_name} - {exam_type_text}.
+
+Subject: {subject_name}
+Modules:
+{modules_text}
+
+Generate a Mermaid.js mindmap diagram with the following structure:
+- Root node: Subject name
+- Child nodes: Module names
+- Sub-child nodes: Key topics from each module
+
+Return ONLY the Mermaid.js code (no additional text, no markdown code blocks).
+Start with: mindmap
+Use proper indentation for hierarchy.
+
+Example format:
+mindmap
+  root((Subject Name))
+    Module 1
+      Topic 1
+      Topic 2
+    Module 2
+      Topic 3
+      Topic 4
+
+Generate a comprehensive mind map covering all important topics.""",
+
+    'schedule_details': """Fill in a study timetable for {subjects}. The dates, times, subjects and modules are fixed; for each numbered session, name the specific topic to cover and concrete activities.
+
+Syllabus:
+{syllabus}
+
+Sessions:
+{sessions}
+
+Guidelines:
+- Topics: be specific - actual chapters or topics from the session's module(s)
+- Activities: concrete tasks (read a section, solve N problems, implement an algorithm, review notes), under 15 words
+- Revision sessions revisit earlier topics; mock test sessions use exam-style questions
+
+Reply with exactly one line per session and nothing else, in this format:
+<session number> | <topic> | <activities>""",
+
+    'answer': """You are a helpful study assistant. Answer the following question based on the context and syllabus references provided.
+
+Context: {context}
+
+Syllabus references:
+{references}
+
+Question: {question}
+
+Provide a clear, concise, and accurate answer. Include examples if helpful.""",
+
+    'chat': """You are a helpful AI study assistant. Help the student with their question.
+
+Relevant syllabus material:
+{references}
+
+Previous conversation:
+{chat_history}
+
+Student: {message}
+
+Provide a helpful, encouraging, and educational response.""",
+}
+
+
+class PromptTemplate:
+    """A prompt template parsed once and rendered by joining its pieces"""
+
+    def __init__(self, name, text):
+        self.name = name
+        self.text = text
+        # Stable short hash of the template text, used in cache keys
+        self.version = hashlib.sha256(text.encode('utf-8')).hexdigest()[:12]
+        self._pieces = [(literal, field) for literal, field, _, _ in string.Formatter().parse(text)]
+        self.fields = {field for _, field in self._pieces if field is not None}
+
+    def render(self, **values):
+        """Fill the template fields with the given values"""
+        parts = []
+        for literal, field in self._pieces:
+            parts.append(literal)
+            if field is not None:
+                parts.append(str(values[field]))
+        return ''.join(parts)
+
+
+class PromptRegistry:
+    """Versioned prompt templates with preformatted module blocks and token accounting"""
+
+    def __init__(self, templates=None):
+        self.templates = {name: PromptTemplate(name, text)
+                          for name, text in (templates or TEMPLATES).items()}
+        self._module_blocks = {}
+        # Template versions are published on /metrics so a deploy's prompts can be identified
+        for name, version in self.versions().items():
+            PROMPT_TEMPLATE_INFO.labels(template=name, version=version).set(1)
+
+    def version(self, name):
+        """Version hash of a template"""
+        return self.templates[name].version
+
+    def versions(self):
+        """Version hashes of all templates"""
+        return {name: template.version for name, template in self.templates.items()}
+
+    def render(self, name, **values):
+        """Render a template and record its estimated token count"""
+        prompt = self.templates[name].render(**values)
+        PROMPT_TOKENS.labels(template=name).observe(self.estimate_tokens(prompt))
+        return prompt
+
+    @staticmethod
+    def estimate_tokens(text):
+        """Estimate the token count of a prompt"""
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+    @staticmethod
+    def truncate(text, max_tokens, keep='head'):
+        """Trim text to about max_tokens, keeping its start ('head') or its end ('tail')"""
+        limit = max_tokens * CHARS_PER_TOKEN
+        if len(text) <= limit:
+            return text
+        return text[:limit] if keep == 'head' else text[-limit:]
+
+    @staticmethod
+    def exam_type_text(exam_type):
+        """Human readable description of an exam type"""
+        return EXAM_TYPE_TEXT.get(exam_type, exam_type)
+
+    @staticmethod
+    def module_line(module):
+        """Format a single module as a prompt line"""
+        return f"{module.get('module', 'Module')}: {module.get('name', 'Unknown')} - Topics: {', '.join(module.get('topics', []))}"
+
+    @classmethod
+    def module_hash(cls, module):
+        """Short hash of a module's prompt line, so cache keys change when its name or topics do"""
+        return hashlib.sha256(cls.module_line(module).encode('utf-8')).hexdigest()[:12]
+
+    def module_block(self, subject_code, exam_type, modules):
+        """Preformatted module list for a (subject, exam type), built once"""
+        key = (subject_code, exam_type)
+        block = self._module_blocks.get(key)
+        if block is None:
+            block = "\n".join(self.module_line(m) for m in modules)
+            self._module_blocks[key] = block
+        return block
+
+    def clear(self):
+        """Drop preformatted module blocks, e.g. after subject data changes"""
+        self._module_blocks.clear()
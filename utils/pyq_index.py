@@ -0,0 +1,108 @@
+import os
+import re
+import threading
+import zipfile
+
+# SUBJECT_YEAR.docx, or SUBJECT_EXAMTYPE_YEAR.docx for a single exam's paper
+PYQ_FILENAME = re.compile(r'^(?P<subject>[A-Za-z0-9]+)_(?:(?P<exam_type>[A-Za-z0-9]+)_)?(?P<year>\d{4})\.docx$')
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+class _ZipOutput:
+    """Write-only buffer that zipfile writes into and the response drains"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class PyqIndex:
+    """Index of the PYQ files on disk, rebuilt only when the directory changes"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._files = []
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Rescan the directory if it changed since the last scan"""
+        try:
+            mtime = os.path.getmtime(self.directory)
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            files = []
+            if mtime is not None:
+                for entry in os.scandir(self.directory):
+                    match = PYQ_FILENAME.match(entry.name)
+                    if match and entry.is_file():
+                        files.append({
+                            'subject_code': match.group('subject').upper(),
+                            'exam_type': (match.group('exam_type') or '').lower() or None,
+                            'year': int(match.group('year')),
+                            'filename': entry.name,
+                            'path': entry.path,
+                            'size': entry.stat().st_size,
+                        })
+            files.sort(key=lambda f: (f['subject_code'], f['year'], f['exam_type'] or ''))
+            self._files = files
+            self._mtime = mtime
+
+    def find(self, subject_code, year):
+        """Path of the whole-year PYQ file for a subject, or None"""
+        self.refresh()
+        filename = f"{subject_code}_{year}.docx"
+        for f in self._files:
+            if f['filename'] == filename:
+                return f['path']
+        return None
+
+    def select(self, subject_codes, exam_type=None, year_from=None, year_to=None):
+        """Files for any of the subjects within the year range; whole-year papers match every exam type"""
+        self.refresh()
+        subject_codes = {code.upper() for code in subject_codes}
+        exam_type = exam_type.lower() if exam_type else None
+        return [f for f in self._files
+                if f['subject_code'] in subject_codes
+                and (exam_type is None or f['exam_type'] in (None, exam_type))
+                and (year_from is None or f['year'] >= year_from)
+                and (year_to is None or f['year'] <= year_to)]
+
+    @staticmethod
+    def stream_zip(files):
+        """Yield a zip archive of the files chunk by chunk, without buffering it on disk"""
+        return (chunk for chunk in PyqIndex._zip_chunks(files) if chunk)
+
+    @staticmethod
+    def _zip_chunks(files):
+        output = _ZipOutput()
+        # .docx files are already deflated, so storing them is as small and much cheaper
+        with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_STORED) as archive:
+            for f in files:
+                info = zipfile.ZipInfo.from_file(f['path'], arcname=f['filename'])
+                info.compress_type = zipfile.ZIP_STORED
+                with open(f['path'], 'rb') as src, archive.open(info, 'w') as dest:
+                    while True:
+                        chunk = src.read(COPY_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        dest.write(chunk)
+                        yield output.drain()
+                yield output.drain()
+        yield output.drain()
@@ -0,0 +1,228 @@
+import json
+import math
+import os
+import threading
+import zlib
+from collections import Counter, defaultdict
+from datetime import datetime
+import numpy as np
+from utils.retrieval import tokenize
+
+# MinHash signature length and LSH banding; 16 bands of 4 rows make pairs above
+# ~0.6 Jaccard similarity very likely to share a bucket
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16
+SHINGLE_SIZE = 4
+# Candidate pairs from LSH are kept when their estimated Jaccard similarity reaches this
+DUPLICATE_THRESHOLD = 0.5
+# Questions scoring below this against every topic are reported as unmapped
+MIN_TOPIC_SIMILARITY = 0.1
+MINHASH_SEED = 1
+MAX_EXAMPLES = 3
+_MERSENNE_PRIME = (1 << 31) - 1
+# Acronyms are only formed from runs of this many content words; two-letter ones collide too often
+_ACRONYM_WINDOWS = (3, 4)
+
+
+def _stem(term):
+    """Crude plural folding so 'trees' matches 'tree'"""
+    if len(term) > 3 and term.endswith('s') and not term.endswith('ss'):
+        return term[:-1]
+    return term
+
+
+def topic_terms(text):
+    """Terms for topic matching: stemmed tokens plus acronyms of short word runs ('binary search tree' -> 'bst')"""
+    words = tokenize(text)
+    terms = [_stem(t) for t in words]
+    for size in _ACRONYM_WINDOWS:
+        for i in range(len(words) - size + 1):
+            terms.append(''.join(w[0] for w in words[i:i + size]))
+    return terms
+
+
+def _tfidf_rows(term_lists, vocabulary, idf):
+    """Dense unit-length TF-IDF rows for term_lists over a fixed vocabulary"""
+    rows = np.zeros((len(term_lists), len(vocabulary)), dtype=np.float32)
+    for i, terms in enumerate(term_lists):
+        for term, count in Counter(t for t in terms if t in vocabulary).items():
+            rows[i, vocabulary[term]] = 1 + math.log(count)
+    rows *= idf
+    norms = np.linalg.norm(rows, axis=1, keepdims=True)
+    return np.divide(rows, norms, out=np.zeros_like(rows), where=norms > 0)
+
+
+def map_topics(questions, topics):
+    """Index of the best topic for each question and its cosine similarity.
+
+    topics is a list of (module_name, topic) pairs; a question matches the
+    topic text and, more weakly, the name of the module it belongs to.
+    """
+    topic_lists = [topic_terms(f'{topic} {topic} {module}') for module, topic in topics]
+    question_lists = [topic_terms(q) for q in questions]
+    df = Counter(t for terms in topic_lists + question_lists for t in set(terms))
+    vocabulary = {term: i for i, term in enumerate(sorted(df))}
+    n = len(topic_lists) + len(question_lists)
+    idf = np.array([math.log((1 + n) / (1 + df[t])) + 1 for t in sorted(df)], dtype=np.float32)
+    similarity = _tfidf_rows(question_lists, vocabulary, idf) @ _tfidf_rows(topic_lists, vocabulary, idf).T
+    best = similarity.argmax(axis=1)
+    return best, similarity[np.arange(len(questions)), best]
+
+
+def _shingles(text):
+    """Hashed character shingles of the question's normalized terms"""
+    normalized = ' '.join(tokenize(text))
+    if len(normalized) <= SHINGLE_SIZE:
+        return {zlib.crc32(normalized.encode('utf-8'))}
+    return {zlib.crc32(normalized[i:i + SHINGLE_SIZE].encode('utf-8'))
+            for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+
+def minhash_signatures(texts):
+    """MinHash signatures, one row of NUM_PERMUTATIONS values per text"""
+    rng = np.random.default_rng(MINHASH_SEED)
+    a = rng.integers(1, _MERSENNE_PRIME, NUM_PERMUTATIONS, dtype=np.uint64)
+    b = rng.integers(0, _MERSENNE_PRIME, NUM_PERMUTATIONS, dtype=np.uint64)
+    signatures = np.empty((len(texts), NUM_PERMUTATIONS), dtype=np.uint64)
+    for i, text in enumerate(texts):
+        hashes = np.fromiter(_shingles(text), dtype=np.uint64) % _MERSENNE_PRIME
+        signatures[i] = ((a[:, None] * hashes[None, :] + b[:, None]) % _MERSENNE_PRIME).min(axis=1)
+    return signatures
+
+
+def near_duplicate_clusters(texts):
+    """Groups of indices into texts that are near-duplicates of each other, via MinHash LSH"""
+    parent = list(range(len(texts)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    if texts:
+        signatures = minhash_signatures(texts)
+        rows = NUM_PERMUTATIONS // LSH_BANDS
+        for band in range(LSH_BANDS):
+            buckets = defaultdict(list)
+            for i, key in enumerate(signatures[:, band * rows:(band + 1) * rows]):
+                buckets[key.tobytes()].append(i)
+            for members in buckets.values():
+                for other in members[1:]:
+                    first, j = find(members[0]), find(other)
+                    if first != j and np.mean(signatures[members[0]] == signatures[other]) >= DUPLICATE_THRESHOLD:
+                        parent[j] = first
+
+    clusters = defaultdict(list)
+    for i in range(len(texts)):
+        clusters[find(i)].append(i)
+    return sorted(clusters.values())
+
+
+def _subject_topics(subject_info):
+    """(module_name, topic) pairs of a subject, using the module name when it lists no topics"""
+    topics = []
+    for module in (subject_info or {}).get('modules', []):
+        name = module.get('name') or module.get('module', 'Module')
+        for topic in module.get('topics') or [name]:
+            topics.append((name, topic))
+    return topics
+
+
+def subject_topic_frequencies(subject_info, exams):
+    """Per-topic frequency table and repeated questions for one subject's PYQs"""
+    asked = [(q, exam_type, str(paper.get('year', '')))
+             for exam_type, papers in exams.items() for paper in papers for q in paper.get('questions', [])]
+    questions = [q for q, _, _ in asked]
+    topics = _subject_topics(subject_info)
+    if topics and questions:
+        best, scores = map_topics(questions, topics)
+    else:
+        best, scores = [0] * len(questions), [0.0] * len(questions)
+
+    table = {}
+    repeated = []
+    unmapped = 0
+    for members in near_duplicate_clusters(questions):
+        # The most recent wording stands for the cluster, and its members vote on the topic
+        members.sort(key=lambda i: (asked[i][2], -i), reverse=True)
+        votes = Counter(int(best[i]) for i in members if scores[i] >= MIN_TOPIC_SIMILARITY)
+        years = sorted({asked[i][2] for i in members})
+        if len(years) > 1:
+            repeated.append({'question': questions[members[0]], 'times_asked': len(members), 'years': years})
+        if not votes:
+            unmapped += len(members)
+            continue
+        topic_index = max(votes, key=lambda t: (votes[t], max(scores[i] for i in members if best[i] == t)))
+        entry = table.setdefault(topic_index, {'module': topics[topic_index][0], 'topic': topics[topic_index][1],
+                                               'occurrences': 0, 'distinct_questions': 0, 'years': set(),
+                                               'exam_types': Counter(), 'examples': []})
+        entry['occurrences'] += len(members)
+        entry['distinct_questions'] += 1
+        entry['years'].update(years)
+        entry['exam_types'].update(asked[i][1] for i in members)
+        entry['examples'].append((len(members), questions[members[0]]))
+
+    rows = []
+    for entry in table.values():
+        entry['examples'] = [q for _, q in sorted(entry['examples'], key=lambda e: -e[0])[:MAX_EXAMPLES]]
+        entry['years'] = sorted(entry['years'])
+        entry['last_asked'] = entry['years'][-1]
+        entry['exam_types'] = dict(sorted(entry['exam_types'].items()))
+        rows.append(entry)
+    rows.sort(key=lambda e: (-e['occurrences'], -len(e['years']), e['topic']))
+    repeated.sort(key=lambda r: (-r['times_asked'], r['question']))
+    return {'total_questions': len(questions), 'unmapped_questions': unmapped,
+            'topics': rows, 'repeated_questions': repeated}
+
+
+def build_topic_index(subjects, pyqs):
+    """Topic frequency tables for every subject with PYQs"""
+    index = {}
+    for code, exams in sorted(pyqs.items()):
+        subject_info = subjects.get(code)
+        stats = subject_topic_frequencies(subject_info, exams)
+        stats['subject_name'] = subject_info.get('title', code) if subject_info else code
+        index[code] = stats
+    return {'generated_at': datetime.now().isoformat(timespec='seconds'), 'subjects': index}
+
+
+def save_topic_index(index, path):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+class PyqTopics:
+    """Serves the precomputed topic index at path, or builds one from the data files when there is none"""
+
+    def __init__(self, path, db):
+        self.path = path
+        self.db = db
+        self.version = None
+        self._subjects = {}
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Reload when the index file or, without one, the data files change"""
+        try:
+            version = ('file', os.path.getmtime(self.path))
+        except OSError:
+            version = ('data',) + self.db.data_version('subjects', 'pyqs')
+        if version != self.version:
+            with self._lock:
+                if version != self.version:
+                    if version[0] == 'file':
+                        with open(self.path, 'r', encoding='utf-8') as f:
+                            index = json.load(f)
+                    else:
+                        index = build_topic_index(self.db.load_subjects(), self.db.load_pyqs())
+                    self._subjects = index.get('subjects', {})
+                    self.version = version
+        return self.version
+
+    def get(self, subject_code):
+        """Topic frequencies for a subject, or None if it has no PYQs"""
+        self.refresh()
+        return self._subjects.get(subject_code)
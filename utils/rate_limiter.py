@@ -0,0 +1,37 @@
+import os
+import threading
+import time
+
+# Free-tier quota for gemini-2.5-flash; raise it to match a paid quota, or set 0 to turn the limiter off
+DEFAULT_REQUESTS_PER_MINUTE = 10
+
+
+class RateLimiter:
+    """Token bucket limiting requests per minute across threads; callers are served in arrival order"""
+
+    def __init__(self, requests_per_minute, burst=None):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self.burst = max(1, burst or 1)
+        self._lock = threading.Lock()
+        # Earliest start time of the next request
+        self._next = 0.0
+
+    @classmethod
+    def from_env(cls):
+        """Limiter for the model API from GEMINI_REQUESTS_PER_MINUTE (0 disables it) and GEMINI_REQUEST_BURST"""
+        return cls(float(os.getenv('GEMINI_REQUESTS_PER_MINUTE', str(DEFAULT_REQUESTS_PER_MINUTE))),
+                   int(os.getenv('GEMINI_REQUEST_BURST', '1')))
+
+    def acquire(self):
+        """Block until a request may be made; returns the seconds waited"""
+        if not self.interval:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            # Reserve the next slot; unused allowance accumulates up to the burst size
+            slot = max(self._next, now - (self.burst - 1) * self.interval)
+            self._next = slot + self.interval
+        wait = slot - now
+        if wait > 0:
+            time.sleep(wait)
+        return max(0.0, wait)
@@ -0,0 +1,195 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+import numpy as np
+from utils.prompt_registry import PromptRegistry
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how in is it its of on or that the their this to was
+what when where which who why will with you your explain describe discuss write give define state
+""".split())
+# Notes are split into passages of roughly this many estimated prompt tokens
+NOTES_PASSAGE_TOKENS = 120
+
+
+def tokenize(text):
+    """Lowercased terms of text, without stopwords"""
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS and len(t) > 1]
+
+
+def _notes_passages(text):
+    """Split generated notes into heading-sized passages of bounded length"""
+    passages = []
+    heading = ''
+    current = []
+
+    def emit():
+        body = ' '.join(current).strip()
+        if body:
+            passages.append(f'{heading}: {body}' if heading else body)
+        current.clear()
+
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith('#'):
+            emit()
+            heading = line.lstrip('#').strip()
+        elif line and not line.startswith('```'):
+            current.append(line.lstrip('-*0123456789. ').strip())
+            if PromptRegistry.estimate_tokens(' '.join(current)) >= NOTES_PASSAGE_TOKENS:
+                emit()
+    emit()
+    return passages
+
+
+def collect_passages(subjects, pyqs, notes=None):
+    """Passages from subject modules, PYQ questions and generated notes.
+
+    notes is an iterable of (subject_code, module_label, notes_text).
+    """
+    passages = []
+    for code, info in subjects.items():
+        title = info.get('title', code)
+        for module in info.get('modules', []):
+            label = module.get('module', 'Module')
+            topics = ', '.join(module.get('topics', []))
+            passages.append({'subject_code': code, 'source': f"{code} {label}",
+                             'text': f"{title} - {label} {module.get('name', '')}: {topics}"})
+    for code, exams in pyqs.items():
+        for exam_type, papers in exams.items():
+            for paper in papers:
+                for question in paper.get('questions', []):
+                    passages.append({'subject_code': code, 'source': f"PYQ {code} {exam_type} {paper.get('year', '')}",
+                                     'text': question})
+    for code, label, text in notes or ():
+        for passage in _notes_passages(text):
+            passages.append({'subject_code': code, 'source': f"Notes {code} {label}", 'text': passage})
+    return passages
+
+
+class RetrievalIndex:
+    """TF-IDF index over syllabus passages, stored as NumPy postings lists per term"""
+
+    def __init__(self, passages, vocabulary, idf, term_ptr, doc_ids, weights):
+        self.passages = passages
+        self.vocabulary = vocabulary
+        self.idf = idf
+        # Postings of term t are doc_ids/weights[term_ptr[t]:term_ptr[t + 1]]
+        self.term_ptr = term_ptr
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.subject_codes = np.array([p['subject_code'] for p in passages]) if passages else np.array([], dtype=str)
+        self.token_counts = np.array([PromptRegistry.estimate_tokens(p['text']) for p in passages], dtype=np.int32)
+
+    @classmethod
+    def build(cls, passages):
+        """Index passages with sublinear tf, smoothed idf and unit-length document vectors"""
+        counts = [Counter(tokenize(p['text'])) for p in passages]
+        df = Counter(term for c in counts for term in c)
+        vocabulary = {term: i for i, term in enumerate(sorted(df))}
+        n = len(passages)
+        idf = np.array([math.log((1 + n) / (1 + df[term])) + 1 for term in sorted(df)], dtype=np.float32)
+
+        postings = [[] for _ in vocabulary]
+        for doc, c in enumerate(counts):
+            if not c:
+                continue
+            terms = [vocabulary[t] for t in c]
+            values = np.array([1 + math.log(c[t]) for t in c], dtype=np.float32) * idf[terms]
+            values /= np.linalg.norm(values)
+            for term, value in zip(terms, values):
+                postings[term].append((doc, value))
+
+        term_ptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        term_ptr[1:] = np.cumsum([len(p) for p in postings])
+        doc_ids = np.array([d for p in postings for d, _ in p], dtype=np.int32)
+        weights = np.array([w for p in postings for _, w in p], dtype=np.float32)
+        return cls(passages, vocabulary, idf, term_ptr, doc_ids, weights)
+
+    def save(self, path):
+        meta = json.dumps({'passages': self.passages, 'vocabulary': sorted(self.vocabulary, key=self.vocabulary.get)})
+        tmp_path = f'{path}.tmp.npz'
+        np.savez_compressed(tmp_path, meta=np.array(meta), idf=self.idf, term_ptr=self.term_ptr,
+                            doc_ids=self.doc_ids, weights=self.weights)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            vocabulary = {term: i for i, term in enumerate(meta['vocabulary'])}
+            return cls(meta['passages'], vocabulary, data['idf'], data['term_ptr'], data['doc_ids'], data['weights'])
+
+    def scores(self, query):
+        """Cosine similarity of every passage to the query"""
+        scores = np.zeros(len(self.passages), dtype=np.float32)
+        counts = Counter(t for t in tokenize(query) if t in self.vocabulary)
+        if not counts:
+            return scores
+        terms = [self.vocabulary[t] for t in counts]
+        query_weights = np.array([1 + math.log(counts[t]) for t in counts], dtype=np.float32) * self.idf[terms]
+        query_weights /= np.linalg.norm(query_weights)
+        for term, q in zip(terms, query_weights):
+            start, end = self.term_ptr[term], self.term_ptr[term + 1]
+            # A term lists each passage once, so fancy-index addition is safe
+            scores[self.doc_ids[start:end]] += q * self.weights[start:end]
+        return scores
+
+    def search(self, query, subject_code=None, k=6, token_budget=600, min_score=0.05):
+        """Top-k passages for the query that fit within token_budget, best first"""
+        if not self.passages:
+            return []
+        scores = self.scores(query)
+        if subject_code:
+            scores[self.subject_codes != subject_code] = 0
+        candidates = np.flatnonzero(scores >= min_score)
+        if candidates.size == 0:
+            return []
+        if candidates.size > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+
+        results = []
+        used = 0
+        for doc in candidates:
+            tokens = int(self.token_counts[doc])
+            if used + tokens > token_budget:
+                continue
+            used += tokens
+            results.append(dict(self.passages[doc], score=round(float(scores[doc]), 4)))
+        return results
+
+
+class Retriever:
+    """Serves the prebuilt index at path, or builds one from the data files when there is none"""
+
+    def __init__(self, path, db):
+        self.path = path
+        self.db = db
+        self._index = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def index(self):
+        """Current index, reloaded when the index file or, without one, the data files change"""
+        try:
+            version = ('file', os.path.getmtime(self.path))
+        except OSError:
+            version = ('data',) + self.db.data_version('subjects', 'pyqs')
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    if version[0] == 'file':
+                        self._index = RetrievalIndex.load(self.path)
+                    else:
+                        self._index = RetrievalIndex.build(collect_passages(self.db.load_subjects(), self.db.load_pyqs()))
+                    self._version = version
+        return self._index
+
+    def search(self, query, subject_code=None, k=6, token_budget=600):
+        return self.index().search(query, subject_code, k, token_budget)
+
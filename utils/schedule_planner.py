@@ -0,0 +1,162 @@
+from datetime import date, timedelta
+
+# Study days start at 9:00 with sessions of at most 90 minutes and a 15-minute break between them
+DAY_START_MINUTES = 9 * 60
+SESSION_MINUTES = 90
+BREAK_MINUTES = 15
+# The last days of a long enough range are kept for revision and mock tests
+REVISION_DAYS = 2
+MIN_DAYS_FOR_REVISION = 5
+MAX_DAYS = 366
+MIN_HOURS_PER_DAY = 2
+# 13 hours of sessions plus their eight breaks fill 9:00 to 24:00 exactly; more would run past midnight
+MAX_HOURS_PER_DAY = 13
+
+DEFAULT_ACTIVITIES = {
+    'study': 'Study concepts, solve practice problems',
+    'revision': 'Review notes and flashcards, re-solve weak problems',
+    'mock_test': 'Timed mock test from PYQs, then review mistakes',
+}
+
+
+def _clock(minutes):
+    return f'{minutes // 60}:{minutes % 60:02d}'
+
+
+def hours_per_day_value(value):
+    """Study hours per day as a float; raises ValueError unless it is a number in the allowed range"""
+    try:
+        hours = float(value)
+    except (TypeError, ValueError):
+        raise ValueError('Study hours per day must be a number')
+    # NaN fails both comparisons, so it is rejected too
+    if not MIN_HOURS_PER_DAY <= hours <= MAX_HOURS_PER_DAY:
+        raise ValueError(f'Study hours must be between {MIN_HOURS_PER_DAY} and {MAX_HOURS_PER_DAY} per day')
+    return hours
+
+
+def session_lengths(hours_per_day):
+    """Minutes of each study session in a day"""
+    remaining = int(hours_per_day * 60)
+    lengths = []
+    while remaining > 0:
+        lengths.append(min(SESSION_MINUTES, remaining))
+        remaining -= lengths[-1]
+    return lengths
+
+
+def _module_text(module):
+    return module.get('name') or module.get('module', 'Module')
+
+
+def plan_schedule(subjects, start_date, end_date, hours_per_day):
+    """Day-by-day timetable with time slots, breaks, subject rotation and revision days.
+
+    subjects is a list of dicts with 'name' and 'modules' (as in subject info);
+    each study slot names the module(s) it covers, spreading every subject's
+    modules evenly over its study sessions. Returns a list of days, each a
+    dict with 'date', 'revision' and 'slots'.
+    """
+    start = date.fromisoformat(start_date)
+    end = date.fromisoformat(end_date)
+    if end < start:
+        raise ValueError('End date must be on or after start date')
+    total_days = (end - start).days + 1
+    if total_days > MAX_DAYS:
+        raise ValueError(f'Schedules are limited to {MAX_DAYS} days')
+    if not subjects:
+        raise ValueError('Please provide at least one subject')
+
+    lengths = session_lengths(hours_per_day_value(hours_per_day))
+    revision_days = REVISION_DAYS if total_days >= MIN_DAYS_FOR_REVISION else 0
+    study_days = total_days - revision_days
+    per_day = len(lengths)
+    # When sessions per day divide evenly by subjects, shift each day so the same subject does not always go first
+    shift = per_day % len(subjects) == 0
+
+    def subject_at(day, session):
+        return (day * per_day + session + (day if shift else 0)) % len(subjects)
+
+    totals = [0] * len(subjects)
+    for day in range(study_days):
+        for session in range(per_day):
+            totals[subject_at(day, session)] += 1
+
+    seen = [0] * len(subjects)
+    days = []
+    for day in range(total_days):
+        revision = day >= study_days
+        minute = DAY_START_MINUTES
+        slots = []
+        for session, length in enumerate(lengths):
+            if session:
+                slots.append({'start': _clock(minute), 'end': _clock(minute + BREAK_MINUTES), 'kind': 'break'})
+                minute += BREAK_MINUTES
+            index = subject_at(day, session)
+            subject = subjects[index]
+            modules = [_module_text(m) for m in subject.get('modules', [])]
+            if revision:
+                kind = 'mock_test' if session == per_day - 1 and per_day > 1 else 'revision'
+                module = 'All modules'
+            else:
+                kind = 'study'
+                k, count = seen[index], totals[index]
+                seen[index] += 1
+                if modules:
+                    # The k-th of count sessions covers its share of the module list
+                    first = k * len(modules) // count
+                    last = max(first + 1, (k + 1) * len(modules) // count)
+                    module = ', '.join(modules[first:last])
+                else:
+                    module = 'Core topics'
+            slots.append({'start': _clock(minute), 'end': _clock(minute + length), 'kind': kind,
+                          'subject': subject['name'], 'module': module})
+            minute += length
+        day_text = (start + timedelta(days=day)).isoformat()
+        for slot in slots:
+            slot['date'] = day_text
+        days.append({'date': day_text, 'revision': revision, 'slots': slots})
+    return days
+
+
+def study_slots(days):
+    """Every non-break slot of a plan, in order"""
+    return [slot for day in days for slot in day['slots'] if slot['kind'] != 'break']
+
+
+def week_segments(days):
+    """Planned days split into calendar weeks (Monday to Sunday)"""
+    weeks = []
+    for day in days:
+        if not weeks or date.fromisoformat(day['date']).weekday() == 0:
+            weeks.append([])
+        weeks[-1].append(day)
+    return weeks
+
+
+def _cell(text):
+    return ' '.join(str(text).replace('|', '/').split())
+
+
+def render_day(day):
+    """Markdown heading and table for one planned day"""
+    d = date.fromisoformat(day['date'])
+    title = f'{d:%A, %B} {d.day}, {d.year}' + (' (Revision)' if day['revision'] else '')
+    lines = [f'### {title}', '', '| Time Slot | Subject | Topic | Activities |',
+             '|-----------|---------|-------|------------|']
+    for slot in day['slots']:
+        time_slot = f"{slot['start']} - {slot['end']}"
+        if slot['kind'] == 'break':
+            lines.append(f'| {time_slot} | Break | - | Rest and refresh |')
+        else:
+            topic = slot.get('topic') or slot['module']
+            activities = slot.get('activities') or DEFAULT_ACTIVITIES[slot['kind']]
+            lines.append(f"| {time_slot} | {_cell(slot['subject'])} | {_cell(topic)} | {_cell(activities)} |")
+    return '\n'.join(lines) + '\n\n'
+
+
+def render_week(number, days):
+    """Markdown for one week of planned days under a week heading"""
+    first, last = date.fromisoformat(days[0]['date']), date.fromisoformat(days[-1]['date'])
+    heading = f'## Week {number}: {first:%b} {first.day} - {last:%b} {last.day}\n\n'
+    return heading + ''.join(render_day(day) for day in days)
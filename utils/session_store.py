@@ -0,0 +1,201 @@
+import atexit
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from utils.metrics import SESSION_WRITE_BATCH
+
+# Pending sessions are written together once this many queue up, or after FLUSH_INTERVAL_SECONDS
+BATCH_SIZE = 100
+FLUSH_INTERVAL_SECONDS = 1.0
+# A single session can last at most a day
+MAX_SESSION_MINUTES = 24 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    duration INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    day TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_user_time ON sessions (user_id, timestamp);
+CREATE INDEX IF NOT EXISTS sessions_user_subject_time ON sessions (user_id, subject, timestamp);
+CREATE TABLE IF NOT EXISTS daily_totals (
+    user_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    minutes INTEGER NOT NULL,
+    sessions INTEGER NOT NULL,
+    PRIMARY KEY (user_id, day, subject)
+);
+CREATE TABLE IF NOT EXISTS weekly_totals (
+    user_id TEXT NOT NULL,
+    week TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    minutes INTEGER NOT NULL,
+    sessions INTEGER NOT NULL,
+    PRIMARY KEY (user_id, week, subject)
+);
+"""
+
+UPSERT_DAILY = """
+INSERT INTO daily_totals (user_id, day, subject, minutes, sessions) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (user_id, day, subject) DO UPDATE SET
+    minutes = minutes + excluded.minutes, sessions = sessions + excluded.sessions
+"""
+
+UPSERT_WEEKLY = """
+INSERT INTO weekly_totals (user_id, week, subject, minutes, sessions) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (user_id, week, subject) DO UPDATE SET
+    minutes = minutes + excluded.minutes, sessions = sessions + excluded.sessions
+"""
+
+
+def week_start(day):
+    """Monday of the ISO week containing day (YYYY-MM-DD)"""
+    d = date.fromisoformat(day)
+    return (d - timedelta(days=d.weekday())).isoformat()
+
+
+class SessionStore:
+    """SQLite store of Pomodoro sessions with daily and weekly rollups kept up to date on write"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._writer = None
+        self._writer_pid = None
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().executescript(SCHEMA)
+        atexit.register(self.flush)
+
+    def _connection(self):
+        # Connections are per thread and per process; never reuse one across a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def add(self, user_id, subject, duration, timestamp, day):
+        """Queue a completed session; it is written with the next batch"""
+        session = {'user_id': user_id, 'subject': subject, 'duration': duration,
+                   'timestamp': timestamp, 'day': day}
+        with self._lock:
+            self._pending.append(session)
+            full = len(self._pending) >= BATCH_SIZE
+            if self._writer is None or self._writer_pid != os.getpid():
+                self._writer = threading.Thread(target=self._write_loop, name='session-writer', daemon=True)
+                self._writer_pid = os.getpid()
+                self._writer.start()
+        if full:
+            self._wakeup.set()
+        return session
+
+    def _write_loop(self):
+        while True:
+            self._wakeup.wait(FLUSH_INTERVAL_SECONDS)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error writing study sessions: {e}")
+
+    def flush(self):
+        """Write all pending sessions and their rollups in one transaction"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            daily = {}
+            weekly = {}
+            for s in batch:
+                for totals, period in ((daily, s['day']), (weekly, week_start(s['day']))):
+                    key = (s['user_id'], period, s['subject'])
+                    minutes, count = totals.get(key, (0, 0))
+                    totals[key] = (minutes + s['duration'], count + 1)
+            conn = self._connection()
+            with conn:
+                conn.executemany('INSERT INTO sessions (user_id, subject, duration, timestamp, day) '
+                                 'VALUES (:user_id, :subject, :duration, :timestamp, :day)', batch)
+                conn.executemany(UPSERT_DAILY, [k + v for k, v in daily.items()])
+                conn.executemany(UPSERT_WEEKLY, [k + v for k, v in weekly.items()])
+            SESSION_WRITE_BATCH.observe(len(batch))
+
+    def recent_sessions(self, user_id, limit=10):
+        """A user's latest sessions, newest first"""
+        self.flush()
+        rows = self._connection().execute(
+            'SELECT subject, duration, timestamp, day FROM sessions WHERE user_id = ? '
+            'ORDER BY timestamp DESC LIMIT ?', (user_id, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def daily_totals(self, user_id, since_day):
+        """Minutes and session counts per day and subject from since_day onwards"""
+        self.flush()
+        rows = self._connection().execute(
+            'SELECT day, subject, minutes, sessions FROM daily_totals WHERE user_id = ? AND day >= ? '
+            'ORDER BY day, subject', (user_id, since_day)).fetchall()
+        return [dict(row) for row in rows]
+
+    def weekly_totals(self, user_id, since_week):
+        """Minutes and session counts per ISO week (by its Monday) and subject"""
+        self.flush()
+        rows = self._connection().execute(
+            'SELECT week, subject, minutes, sessions FROM weekly_totals WHERE user_id = ? AND week >= ? '
+            'ORDER BY week, subject', (user_id, since_week)).fetchall()
+        return [dict(row) for row in rows]
+
+    def streak(self, user_id, today):
+        """Consecutive days with a session, ending today or yesterday"""
+        self.flush()
+        rows = self._connection().execute(
+            'SELECT DISTINCT day FROM daily_totals WHERE user_id = ? AND day <= ? ORDER BY day DESC',
+            (user_id, today)).fetchall()
+        expected = date.fromisoformat(today)
+        streak = 0
+        for row in rows:
+            day = date.fromisoformat(row['day'])
+            if streak == 0 and day == expected - timedelta(days=1):
+                expected = day
+            if day != expected:
+                break
+            streak += 1
+            expected -= timedelta(days=1)
+        return streak
+
+
+def session_day(timestamp, day=None):
+    """Local calendar day for a session, preferring the client's own date"""
+    if day:
+        try:
+            return date.fromisoformat(day).isoformat()
+        except ValueError:
+            pass
+    try:
+        return datetime.fromisoformat(timestamp.replace('Z', '+00:00')).date().isoformat()
+    except (AttributeError, ValueError):
+        return date.today().isoformat()
+
+
+def session_duration(value):
+    """Session length in whole minutes; raises ValueError unless it is a positive number of at most a day"""
+    try:
+        minutes = float(value)
+    except (TypeError, ValueError):
+        raise ValueError('Session duration must be a number of minutes')
+    # NaN fails both comparisons, so it is rejected too
+    if not 0 < minutes <= MAX_SESSION_MINUTES:
+        raise ValueError(f'Session duration must be more than 0 and at most {MAX_SESSION_MINUTES} minutes')
+    return max(1, round(minutes))
@@ -0,0 +1,132 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from utils.metrics import CACHE_REQUESTS
+
+# Oldest entries are trimmed once every this many writes
+TRIM_EVERY_WRITES = 64
+# Coordination state not updated for this long is dropped; it is never trimmed by size
+STATE_TTL_SECONDS = 24 * 3600
+
+
+class SharedCache:
+    """SQLite-backed cache shared by every worker process on a node"""
+
+    def __init__(self, path, name='shared', max_entries=4096):
+        self.path = path
+        self.name = name
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        self._state_writes = 0
+        self._hits = CACHE_REQUESTS.labels(cache=name, result='hit')
+        self._misses = CACHE_REQUESTS.labels(cache=name, result='miss')
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS cache ('
+                         'key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS cache_created ON cache (created)')
+            # Small records workers coordinate through, kept apart from cached content
+            conn.execute('CREATE TABLE IF NOT EXISTS state ('
+                         'key TEXT PRIMARY KEY, value TEXT NOT NULL, updated REAL NOT NULL)')
+
+    @classmethod
+    def from_env(cls):
+        """Shared cache at SHARED_CACHE_PATH, or None when it is not configured"""
+        path = os.getenv('SHARED_CACHE_PATH')
+        if not path:
+            return None
+        return cls(path, max_entries=int(os.getenv('SHARED_CACHE_MAX_ENTRIES', '4096')))
+
+    def _connection(self):
+        # Connections are per thread and per process; never reuse one across a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _key(key):
+        return json.dumps(key, separators=(',', ':'))
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing"""
+        try:
+            row = self._connection().execute('SELECT value FROM cache WHERE key = ?', (self._key(key),)).fetchone()
+        except sqlite3.Error as e:
+            print(f"Error reading shared cache: {e}")
+            row = None
+        if row is None:
+            self._misses.inc()
+            return None
+        self._hits.inc()
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        """Store a JSON-serializable value under key"""
+        try:
+            conn = self._connection()
+            conn.execute('INSERT OR REPLACE INTO cache (key, value, created) VALUES (?, ?, ?)',
+                         (self._key(key), json.dumps(value), time.time()))
+            self._writes += 1
+            if self._writes % TRIM_EVERY_WRITES == 0:
+                self._trim(conn)
+        except sqlite3.Error as e:
+            print(f"Error writing shared cache: {e}")
+
+    def items(self, kind):
+        """(key, value) pairs for every entry whose key tuple starts with kind"""
+        prefix = json.dumps([kind], separators=(',', ':'))[:-1] + ','
+        try:
+            rows = self._connection().execute('SELECT key, value FROM cache WHERE key LIKE ? ESCAPE ?',
+                                              (prefix.replace('%', '\\%').replace('_', '\\_') + '%', '\\')).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error reading shared cache: {e}")
+            return []
+        return [(tuple(json.loads(key)), json.loads(value)) for key, value in rows]
+
+    def _trim(self, conn):
+        """Drop the oldest entries beyond max_entries"""
+        conn.execute('DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY created DESC LIMIT -1 OFFSET ?)',
+                     (self.max_entries,))
+
+    def get_state(self, key, default=None):
+        """Return the coordination state stored under key, or default if there is none"""
+        try:
+            row = self._connection().execute('SELECT value FROM state WHERE key = ?', (self._key(key),)).fetchone()
+        except sqlite3.Error as e:
+            print(f"Error reading shared state: {e}")
+            row = None
+        return default if row is None else json.loads(row[0])
+
+    def set_state(self, key, value):
+        """Store JSON-serializable coordination state under key; it is not trimmed or cleared with the cache"""
+        try:
+            conn = self._connection()
+            conn.execute('INSERT OR REPLACE INTO state (key, value, updated) VALUES (?, ?, ?)',
+                         (self._key(key), json.dumps(value), time.time()))
+            self._state_writes += 1
+            if self._state_writes % TRIM_EVERY_WRITES == 0:
+                conn.execute('DELETE FROM state WHERE updated < ?', (time.time() - STATE_TTL_SECONDS,))
+        except sqlite3.Error as e:
+            print(f"Error writing shared state: {e}")
+
+    def delete_state(self, key):
+        try:
+            self._connection().execute('DELETE FROM state WHERE key = ?', (self._key(key),))
+        except sqlite3.Error as e:
+            print(f"Error writing shared state: {e}")
+
+    def clear(self):
+        """Drop all cached entries"""
+        try:
+            self._connection().execute('DELETE FROM cache')
+        except sqlite3.Error as e:
+            print(f"Error clearing shared cache: {e}")
@@ -0,0 +1,47 @@
+import re
+
+# Decimal places kept for coordinates; a tenth of a pixel is invisible at any zoom we use
+COORDINATE_PRECISION = 1
+
+_COMMENT = re.compile(r'<!--.*?-->', re.S)
+# Only line breaks between tags; spaces between <tspan>s separate words
+_BETWEEN_TAGS = re.compile(r'>\s*\n\s*<')
+_STYLE_BLOCK = re.compile(r'(<style[^>]*>)(.*?)(</style>)', re.S)
+_NUMBER = re.compile(r'-?\d+\.\d+')
+_NUMERIC_ATTRIBUTES = re.compile(r'\s(d|transform|x|y|x1|y1|x2|y2|cx|cy|r|rx|ry|width|height|points|viewBox)="([^"]*)"')
+_EMPTY_GROUP = re.compile(r'<g(?:\s[^>]*)?>\s*</g>')
+_EMPTY_STYLE_ATTRIBUTE = re.compile(r'\sstyle=""')
+
+
+def _round_numbers(value):
+    def shorten(match):
+        number = round(float(match.group(0)), COORDINATE_PRECISION)
+        if number.is_integer():
+            return str(int(number))
+        return repr(number)
+    return _NUMBER.sub(shorten, value)
+
+
+def _minify_css(css):
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    # Spaces around ':' and '>' can be descendant combinators, so they stay
+    return re.sub(r'\s*([{};,])\s*', r'\1', css).strip()
+
+
+def optimize_svg(svg):
+    """Shrink a rendered SVG without changing how it looks"""
+    svg = _COMMENT.sub('', svg)
+    svg = _BETWEEN_TAGS.sub('><', svg.strip())
+    svg = _NUMERIC_ATTRIBUTES.sub(lambda m: f' {m.group(1)}="{_round_numbers(m.group(2))}"', svg)
+    svg = _EMPTY_STYLE_ATTRIBUTE.sub('', svg)
+    svg = _STYLE_BLOCK.sub(lambda m: m.group(1) + _minify_css(m.group(2)) + m.group(3), svg)
+    # Removing one empty group can leave its parent empty
+    previous = None
+    while previous != svg:
+        previous = svg
+        svg = _EMPTY_GROUP.sub('', svg)
+    if 'xmlns="http://www.w3.org/2000/svg"' not in svg:
+        # Required when the SVG is served as a standalone image rather than inline HTML
+        svg = svg.replace('<svg', '<svg xmlns="http://www.w3.org/2000/svg"', 1)
+    return svg
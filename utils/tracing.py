@@ -0,0 +1,259 @@
+import contextvars
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+SERVICE_NAME = 'study-assistant'
+# How often the background exporter flushes, and the largest batch it sends
+EXPORT_INTERVAL_SECONDS = 1.0
+EXPORT_BATCH_SIZE = 256
+
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+_SERVER_TIMING_INVALID = re.compile(r"[^A-Za-z0-9!#$%&'*+\-.^_`|~]")
+
+
+def _attribute_value(value):
+    """Encode an attribute value in OTLP JSON form"""
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+class TraceState:
+    """Per-trace sampling decision, shared by every span in the trace"""
+
+    def __init__(self, trace_id, debug=False):
+        self.trace_id = trace_id
+        self.debug = debug
+        # Finished spans, kept only for debug timing breakdowns
+        self.finished = []
+
+
+class Span:
+    """A timed operation within a trace"""
+
+    def __init__(self, tracer, name, trace, parent_id=None, attributes=None):
+        self.tracer = tracer
+        self.name = name
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.status = STATUS_OK
+        self.status_message = ''
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self._start = time.perf_counter()
+        self.duration = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_error(self, error):
+        self.status = STATUS_ERROR
+        self.status_message = str(error)
+
+    def elapsed(self):
+        """Seconds since the span started, or its duration once ended"""
+        if self.duration is not None:
+            return self.duration
+        return time.perf_counter() - self._start
+
+    def end(self):
+        if self.end_ns is not None:
+            return
+        self.duration = time.perf_counter() - self._start
+        self.end_ns = self.start_ns + int(self.duration * 1e9)
+        if self.trace.debug:
+            self.trace.finished.append(self)
+        self.tracer._export(self)
+
+    def to_otlp(self):
+        span = {
+            'traceId': self.trace.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': 1,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [{'key': k, 'value': _attribute_value(v)} for k, v in self.attributes.items()],
+            'status': {'code': self.status, 'message': self.status_message},
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+
+class _NoopSpan:
+    """Span returned when a trace is not sampled; every operation is free"""
+
+    trace = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def record_error(self, error):
+        pass
+
+    def end(self):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class FileSpanExporter:
+    """Append batches of spans as OTLP JSON lines to a local file"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def export(self, payload):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(payload) + '\n')
+
+
+class CollectorSpanExporter:
+    """POST batches of spans as OTLP JSON to a collector's /v1/traces endpoint"""
+
+    def __init__(self, url, timeout=5):
+        self.url = url
+        self.timeout = timeout
+
+    def export(self, payload):
+        import urllib.request
+        request = urllib.request.Request(self.url, data=json.dumps(payload).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'}, method='POST')
+        urllib.request.urlopen(request, timeout=self.timeout).close()
+
+
+class Tracer:
+    """Creates spans, samples traces at the root and exports finished spans in the background"""
+
+    def __init__(self, sample_rate=0.0, exporter=None):
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Tracer configured by TRACE_SAMPLE_RATE, TRACE_EXPORT_FILE and TRACE_COLLECTOR_URL"""
+        exporter = None
+        if os.getenv('TRACE_COLLECTOR_URL'):
+            exporter = CollectorSpanExporter(os.getenv('TRACE_COLLECTOR_URL'))
+        elif os.getenv('TRACE_EXPORT_FILE'):
+            exporter = FileSpanExporter(os.getenv('TRACE_EXPORT_FILE'))
+        default_rate = '1.0' if exporter else '0.0'
+        return cls(float(os.getenv('TRACE_SAMPLE_RATE', default_rate)), exporter)
+
+    def start_trace(self, name, debug=False, **attributes):
+        """Start a root span, sampled by the configured rate or forced by debug"""
+        if not debug and (self.sample_rate <= 0 or random.random() >= self.sample_rate):
+            return NOOP_SPAN
+        trace = TraceState(os.urandom(16).hex(), debug=debug)
+        return Span(self, name, trace, attributes=attributes)
+
+    def start_span(self, name, parent=None, **attributes):
+        """Start a child of `parent` or the current span without making it current"""
+        parent = parent or _current_span.get()
+        if parent is None or parent.trace is None:
+            return NOOP_SPAN
+        return Span(self, name, parent.trace, parent.span_id, attributes)
+
+    @contextmanager
+    def span(self, name, parent=None, **attributes):
+        """Child span made current for the duration of the block"""
+        span = self.start_span(name, parent, **attributes)
+        if span is NOOP_SPAN:
+            yield span
+            return
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.record_error(e)
+            raise
+        finally:
+            self.deactivate(token)
+            span.end()
+
+    def activate(self, span):
+        """Make span the current span, returning a token for deactivate"""
+        return _current_span.set(span)
+
+    def deactivate(self, token):
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # Generators may be closed from a different context than they ran in
+            pass
+
+    def current_span(self):
+        return _current_span.get() or NOOP_SPAN
+
+    def _export(self, span):
+        if self.exporter is None:
+            return
+        self._queue.put(span)
+        if self._worker is None:
+            with self._worker_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._export_loop, name='trace-exporter', daemon=True)
+                    self._worker.start()
+
+    def _export_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + EXPORT_INTERVAL_SECONDS
+            while len(batch) < EXPORT_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            payload = {'resourceSpans': [{
+                'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': SERVICE_NAME}}]},
+                'scopeSpans': [{'scope': {'name': SERVICE_NAME}, 'spans': [s.to_otlp() for s in batch]}],
+            }]}
+            try:
+                self.exporter.export(payload)
+            except Exception as e:
+                print(f"Error exporting {len(batch)} spans: {e}")
+
+
+def timing_breakdown(root):
+    """Durations in milliseconds of the finished spans in a debug trace, plus the root so far"""
+    if root.trace is None:
+        return []
+    entries = [{'name': span.name, 'ms': round(span.duration * 1000, 2)} for span in root.trace.finished]
+    entries.append({'name': root.name, 'ms': round(root.elapsed() * 1000, 2)})
+    return entries
+
+
+def server_timing_header(entries):
+    """Format a timing breakdown as a Server-Timing header value"""
+    parts = []
+    for entry in entries:
+        token = _SERVER_TIMING_INVALID.sub('_', entry['name'])
+        description = entry['name'].replace('"', "'")
+        parts.append(f'{token};desc="{description}";dur={entry["ms"]}')
+    return ', '.join(parts)
+
+
+tracer = Tracer.from_env()
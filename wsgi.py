@@ -0,0 +1,9 @@
+"""WSGI entry point for multi-process servers.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+from app import app, preload_app
+
+# Runs once in the master when the server preloads the app, so every forked
+# worker shares the parsed data instead of loading its own copy
+preload_app(app)